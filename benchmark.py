@@ -0,0 +1,1025 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the archive pipeline against a local mock site.
+
+Starts an HTTP server that generates a synthetic Kling & Bang archive in
+the site's ISO-8859-1 markup (archive_list.php, archive_view.php in
+Icelandic and English, image_view.php, thumbnails and full-size images),
+then runs the real tools against it, each in its own process:
+
+    scrape      main.py scrape
+    images      main.py images
+    highres     scrape_highres.py
+    export      main.py export
+
+or, with --stages sync,export, `main.py sync` in place of the first three,
+which does their work as one pipelined pass (see pipeline.py).
+
+and reports wall time, pages/sec, MB/s, peak RSS and time spent in
+database writes (from the run's scrape_runs row) for every stage. The
+archive is deterministic for a given --seed, so runs are comparable;
+--baseline compares against an earlier --output file and exits non-zero
+when a stage got slower than --tolerance allows.
+
+--speedup skips the pipeline and instead crawls the mock site with
+`main.py scrape` twice, with one worker and with --workers, reporting
+the wall-clock speedup and checking that both runs saved the same
+exhibitions, artists and exhibition_artists rows.
+
+--memory skips the pipeline and instead downloads 4 x --workers
+full-size images of --image-mb each through HighResScraper, once
+streaming them to the blob store and once reading each whole body into
+memory first (as before streaming), and reports each run's peak RSS.
+
+--parse skips the pipeline and instead times page parsing and
+extraction over a corpus of exhibition pages (Icelandic and English):
+the BeautifulSoup html.parser scans the scrapers used before parsers.py
+(if beautifulsoup4 is installed) against each parsers.py backend's
+single pass. The corpus is the newest pages in a snapshot store
+(--snapshots, as written by `main.py scrape`), or else the mock site's
+pages at --scale.
+
+--export skips the pipeline and instead fills a database from the mock
+archive at --scale (parsed by the scraper, without fetching) and times
+`main.py export` in each output mode, and the N+1-query, whole-document
+export it replaced, with each run's peak RSS.
+
+--search skips the pipeline and instead fills a database the same way
+and times a set of queries through search.py's FTS5 index and through
+the LIKE '%word%' scan over the same columns it replaces, with the
+number of results each finds. Both return the first 20 results, but
+FTS5 ranks every match by bm25 first, so a word found in nearly every
+exhibition (as most of the mock archive's small vocabulary is) costs
+time in proportion to the matches, while LIKE stops after 20 rows.
+LIKE's cost shows on rare words and misses, which scan every row, and
+on accent-folded queries ("asdis"), which it cannot match at all.
+
+--db-overhead N skips the pipeline and instead times the database work
+the scraper does per page (an existence check and a scraping_log
+commit) N times, opening a default sqlite3 connection per page, a tuned
+get_connection() per page, and reusing shared_connection().
+
+Usage:
+    python benchmark.py                              # Real archive size, 20 ms latency
+    python benchmark.py --scale 10 --workers 8       # 10x the archive
+    python benchmark.py --error-rate 0.05            # 5% of requests fail with 503
+    python benchmark.py --output base.json           # Save results...
+    python benchmark.py --baseline base.json         # ... and check a later run against them
+    python benchmark.py --db-overhead 2000           # Per-page database overhead only
+    python benchmark.py --stages sync,export         # One pipelined sync instead of the phases
+    python benchmark.py --speedup --workers 8        # Serial vs concurrent scrape
+    python benchmark.py --memory --image-mb 64       # Peak RSS of full-size downloads
+    python benchmark.py --parse --snapshots snapshots.db  # Parse throughput on saved pages
+    python benchmark.py --export --scale 50          # Export time and memory
+    python benchmark.py --search --scale 50          # Search latency, LIKE vs FTS5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urljoin, urlparse
+
+FIRST_YEAR = 2003
+LAST_YEAR = 2025
+EXHIBITIONS_PER_YEAR = 9  # the real archive averages just under 9
+IMAGES_PER_EXHIBITION = (4, 12)
+THUMBNAIL_KB = 13  # average size of the real archive's images
+FULL_IMAGE_KB = 150
+DEFAULT_LATENCY = 0.02
+DEFAULT_TOLERANCE = 0.2
+STAGES = ('scrape', 'images', 'highres', 'sync', 'export')
+DEFAULT_STAGES = ('scrape', 'images', 'highres', 'export')
+HERE = Path(__file__).resolve().parent
+
+MONTHS = ['janúar', 'febrúar', 'mars', 'apríl', 'maí', 'júní', 'júlí',
+          'ágúst', 'september', 'október', 'nóvember', 'desember']
+WORDS_IS = ('sýning verk listamaður rými ljós hljóð efni tími saga form litur '
+            'þögn hreyfing náttúra borg minni líkami skúlptúr málverk gjörningur '
+            'innsetning myndband teikning ljósmynd textíll').split()
+WORDS_EN = ('exhibition work artist space light sound material time history form '
+            'colour silence movement nature city memory body sculpture painting '
+            'performance installation video drawing photograph textile').split()
+NAMES = ('Ásdís Sif Gunnarsdóttir', 'Jón Þór Birgisson', 'Guðrún Hrönn Ragnarsdóttir',
+         'Ragnar Kjartansson', 'Erling Klingenberg', 'Sigrún Hrólfsdóttir',
+         'Hildigunnur Birgisdóttir', 'Snorri Páll Jónsson', 'Þóra Sigurðardóttir',
+         'Egill Sæbjörnsson', 'Katrín Inga Jónsdóttir Hjördísardóttir', 'Örn Alexander Ámundason')
+
+
+class MockArchive:
+    """Deterministic synthetic archive: which exhibitions exist and what they contain."""
+
+    def __init__(self, scale: float = 1.0, seed: int = 1, full_image_kb: float = FULL_IMAGE_KB):
+        self.seed = seed
+        self.full_image_kb = full_image_kb
+        per_year = max(1, round(EXHIBITIONS_PER_YEAR * scale))
+        self.years: dict[int, list[int]] = {}
+        next_id = 1
+        for year in range(FIRST_YEAR, LAST_YEAR + 1):
+            self.years[year] = list(range(next_id, next_id + per_year))
+            next_id += per_year
+        self.year_of = {ex_id: year for year, ids in self.years.items() for ex_id in ids}
+
+    def _rng(self, *key) -> random.Random:
+        return random.Random(f"{self.seed}:{':'.join(map(str, key))}")
+
+    def image_ids(self, ex_id: int) -> list[int]:
+        count = self._rng('images', ex_id).randint(*IMAGES_PER_EXHIBITION)
+        return [ex_id * 100 + idx for idx in range(count)]
+
+    @property
+    def totals(self) -> dict:
+        exhibitions = len(self.year_of)
+        images = sum(len(self.image_ids(ex_id)) for ex_id in self.year_of)
+        return {'years': len(self.years), 'exhibitions': exhibitions, 'images': images}
+
+    def year_page(self, year: int) -> str:
+        rows = ''.join(
+            f'<tr><td class="arc_list_name">{self._title(ex_id)}</td>'
+            f'<td><a href="archive_view.php?id={ex_id}">meira</a></td></tr>'
+            for ex_id in self.years.get(year, [])
+        )
+        return self._layout(f'<table class="arc_list">{rows}</table>')
+
+    def exhibition_page(self, ex_id: int, english: bool) -> str:
+        rng = self._rng('text', ex_id, english)
+        year = self.year_of[ex_id]
+        artists = rng.sample(NAMES, rng.randint(1, 3))
+        start_month = rng.randrange(12)
+        dates = (f"{rng.randint(1, 28)}. {MONTHS[start_month]} {year} - "
+                 f"{rng.randint(1, 28)}. {MONTHS[(start_month + 1) % 12]} "
+                 f"{year + (start_month == 11)}")
+        words = WORDS_EN if english else WORDS_IS
+        paragraphs = ''.join(
+            '<p>' + ' '.join(rng.choice(words) for _ in range(rng.randint(40, 90))).capitalize() + '.</p>'
+            for _ in range(rng.randint(3, 6))
+        )
+        thumbnails = ''.join(
+            f'<a href="image_view.php?id={image_id}">'
+            f'<img src="files/archive/{year}/t_{image_id}.jpg" alt="{self._title(ex_id)} {idx + 1}"></a>'
+            for idx, image_id in enumerate(self.image_ids(ex_id))
+        )
+        title = f"Exhibition {ex_id}" if english else self._title(ex_id)
+        return self._layout(
+            '<table class="arc_view">'
+            f'<tr><td class="arc_view_head">{", ".join(artists[:-1])}'
+            f'{" og " if len(artists) > 1 else ""}{artists[-1]}</td></tr>'
+            f'<tr><td class="arc_view_name">{title}</td></tr>'
+            f'<tr><td class="arc_view_date">{dates}</td></tr>'
+            f'<tr><td class="arc_view_text">{paragraphs}</td></tr>'
+            '<tr><td class="arc_view_text">&nbsp;</td></tr>'
+            f'</table><div class="gallery">{thumbnails}</div>'
+        )
+
+    def image_view_page(self, image_id: int) -> str:
+        year = self.year_of.get(image_id // 100, FIRST_YEAR)
+        return self._layout(f'<img class="img_main" src="files/archive/{year}/full_{image_id}.jpg" alt="">')
+
+    def image(self, image_id: int, full: bool) -> bytes:
+        """A structurally valid JPEG of pseudo-random content, unique per image."""
+        rng = self._rng('image', image_id, full)
+        kb = self.full_image_kb if full else THUMBNAIL_KB
+        size = int(kb * 1024 * rng.uniform(0.5, 1.5))
+        width, height = (rng.choice((1600, 2048)), rng.choice((1067, 1365))) if full else (300, 200)
+        app0 = b'\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+        sof = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+        sos = b'\xff\xda\x00\x08\x01\x01\x00\x00\x3f\x00'
+        # Entropy-coded data never contains a bare 0xFF
+        scan = rng.randbytes(size).replace(b'\xff', b'\xfe')
+        return b'\xff\xd8' + app0 + sof + sos + scan + b'\xff\xd9'
+
+    def _title(self, ex_id: int) -> str:
+        rng = self._rng('title', ex_id)
+        return ' '.join(rng.choice(WORDS_IS) for _ in range(rng.randint(1, 4))).capitalize()
+
+    @staticmethod
+    def _layout(body: str) -> str:
+        return (
+            '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1">'
+            '<title>Kling &amp; Bang</title></head><body>'
+            '<div id="nav"><img src="img/logo.gif" alt="Kling &amp; Bang"><img src="head.jpg" alt="">'
+            '<a href="archive.php">Sýningar</a> <a href="about.php">Um</a></div>'
+            f'{body}</body></html>'
+        )
+
+
+class MockSite:
+    """Threaded HTTP server for a MockArchive, with latency and error injection."""
+
+    def __init__(self, archive: MockArchive, latency: float = DEFAULT_LATENCY, error_rate: float = 0.0):
+        self.archive = archive
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats = {'requests': 0, 'errors': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+        self._rng = random.Random(archive.seed)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-site", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/klingogbang/"
+
+    def __enter__(self) -> "MockSite":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def take_stats(self) -> dict:
+        """Counters since the last call."""
+        with self._lock:
+            stats = dict(self.stats)
+            self.stats = dict.fromkeys(self.stats, 0)
+        return stats
+
+    def respond(self, path: str) -> tuple[int, str, bytes]:
+        """(status, content type, body) for a request path."""
+        with self._lock:
+            self.stats['requests'] += 1
+            fail = self._rng.random() < self.error_rate
+        if fail:
+            return 503, 'text/html', b'<html><body>Service Unavailable</body></html>'
+
+        url = urlparse(path)
+        page = url.path.rsplit('/', 1)[-1]
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        archive = self.archive
+        try:
+            if page == 'archive_list.php':
+                return self._html(archive.year_page(int(query['year'])))
+            if page == 'archive_view.php' and int(query['id']) in archive.year_of:
+                return self._html(archive.exhibition_page(int(query['id']), query.get('lang') == 'en'))
+            if page == 'image_view.php':
+                return self._html(archive.image_view_page(int(query['id'])))
+            if page == 'head.jpg':  # the site banner, on every page
+                return 200, 'image/jpeg', archive.image(0, False)
+            if page.startswith(('t_', 'full_')) and page.endswith('.jpg'):
+                kind, image_id = page[:-4].split('_')
+                return 200, 'image/jpeg', archive.image(int(image_id), kind == 'full')
+        except (KeyError, ValueError):
+            pass
+        return 404, 'text/html', b'<html><body>Not found</body></html>'
+
+    @staticmethod
+    def _html(text: str) -> tuple[int, str, bytes]:
+        return 200, 'text/html; charset=iso-8859-1', text.encode('iso-8859-1')
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if site.latency:
+                    time.sleep(site.latency)
+                status, content_type, body = site.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with site._lock:
+                    site.stats['bytes'] += len(body)
+                    site.stats['errors'] += status >= 500
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def run_stage(name: str, command: list[str], log_path: Path) -> dict:
+    """Run one pipeline stage as a child process; wall time and peak RSS."""
+    start = time.monotonic()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        proc = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, cwd=HERE)
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        else:
+            proc.wait()
+            peak = None
+    wall = time.monotonic() - start
+    if proc.returncode:
+        raise RuntimeError(f"{name} exited with status {proc.returncode}; see {log_path}")
+    return {'wall_seconds': wall, 'peak_rss': peak}
+
+
+def last_run(db_path: Path, tool: str) -> Optional[dict]:
+    """The newest scrape_runs metrics recorded by a tool."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT metrics FROM scrape_runs WHERE tool = ? ORDER BY id DESC LIMIT 1", (tool,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+def run_benchmark(args, work_dir: Path) -> dict:
+    archive = MockArchive(args.scale, args.seed)
+    db = work_dir / 'bench.db'
+    images_dir = work_dir / 'images'
+    cache_dir = work_dir / 'http_cache'
+    export_path = work_dir / 'export.json'
+    python = sys.executable
+    totals = archive.totals
+    print(f"Mock archive: {totals['exhibitions']} exhibitions, {totals['images']} images "
+          f"(scale {args.scale:g}); latency {args.latency * 1000:g} ms, "
+          f"error rate {args.error_rate:.0%}, {args.workers} workers")
+
+    results = {'config': {**vars(args), **totals}, 'stages': {}}
+    with MockSite(archive, args.latency, args.error_rate) as site:
+        common = [
+            '--db', str(db), '--images-dir', str(images_dir), '--cache-dir', str(cache_dir),
+            '--base-url', site.base_url, '--delay', '0',
+        ]
+        rate = ['--max-rps', str(args.max_rps)] if args.max_rps else []
+        commands = {
+            'scrape': [python, 'main.py', *common, '--snapshots', str(work_dir / 'snapshots.db'),
+                       'scrape', '--workers', str(args.workers), *rate],
+            'images': [python, 'main.py', *common, 'images', '--workers', str(args.workers), *rate],
+            'highres': [python, 'scrape_highres.py', *common, '--workers', str(args.workers), *rate],
+            'sync': [python, 'main.py', *common, '--snapshots', str(work_dir / 'snapshots.db'),
+                     'sync', '--workers', str(args.workers), *rate],
+            'export': [python, 'main.py', '--db', str(db), 'export', '--output', str(export_path)],
+        }
+        for stage in args.stages:
+            print(f"  {stage}...", end=' ', flush=True)
+            site.take_stats()
+            result = run_stage(stage, commands[stage], work_dir / f'{stage}.log')
+            served = site.take_stats()
+            wall = result['wall_seconds']
+            result.update(served)
+            result['pages_per_sec'] = served['requests'] / wall
+            result['mb_per_sec'] = served['bytes'] / 1024 / 1024 / wall
+            # The fetching tools record their runs (see metrics.py); export does not
+            metrics = last_run(db, stage) if stage != 'export' else None
+            if metrics:
+                result['db_seconds'] = metrics['phases']['db_write']['seconds']
+                result['phases'] = {phase: entry['seconds'] for phase, entry in metrics['phases'].items()}
+            if stage == 'export':
+                result['bytes'] = export_path.stat().st_size
+                result['mb_per_sec'] = result['bytes'] / 1024 / 1024 / wall
+            results['stages'][stage] = result
+            print(f"{wall:.1f}s")
+    return results
+
+
+def scraped_rows(db_path: Path) -> tuple[list, list]:
+    """A scrape's exhibitions and artist links, independent of insertion order."""
+    conn = sqlite3.connect(db_path)
+    try:
+        exhibitions = sorted(conn.execute("""
+            SELECT exhibition_id, title_is, title_en, start_date, end_date,
+                   description_is, description_en, year, source_url
+            FROM exhibitions
+        """))
+        artists = sorted(conn.execute("""
+            SELECT e.exhibition_id, a.name, ea.display_order
+            FROM exhibition_artists ea
+            JOIN artists a ON a.id = ea.artist_id
+            JOIN exhibitions e ON e.id = ea.exhibition_id
+        """))
+    finally:
+        conn.close()
+    return exhibitions, artists
+
+
+def scrape_speedup(args, work_dir: Path) -> dict:
+    """Wall time of `main.py scrape` with one worker and with --workers, on one mock site."""
+    archive = MockArchive(args.scale, args.seed)
+    totals = archive.totals
+    print(f"Mock archive: {totals['exhibitions']} exhibitions (scale {args.scale:g}); "
+          f"latency {args.latency * 1000:g} ms")
+    runs = {}
+    with MockSite(archive, args.latency) as site:
+        for workers in sorted({1, args.workers}):
+            db = work_dir / f'speedup-{workers}.db'
+            print(f"  scrape --workers {workers}...", end=' ', flush=True)
+            site.take_stats()
+            result = run_stage(f'scrape --workers {workers}', [
+                sys.executable, 'main.py', '--db', str(db), '--base-url', site.base_url, '--delay', '0',
+                '--no-cache', '--no-snapshots', 'scrape', '--workers', str(workers),
+            ], work_dir / f'speedup-{workers}.log')
+            result.update(site.take_stats())
+            result['rows'] = scraped_rows(db)
+            runs[workers] = result
+            print(f"{result['wall_seconds']:.1f}s")
+    serial = runs[1]
+    return {
+        workers: {
+            'wall_seconds': run['wall_seconds'],
+            'requests': run['requests'],
+            'speedup': serial['wall_seconds'] / run['wall_seconds'],
+            'same_rows': run['rows'] == serial['rows'],
+        }
+        for workers, run in runs.items()
+    }
+
+
+# Runs a script (or -c code) and prints its own peak RSS on exit, for
+# measure_stage(). ru_maxrss from wait4 also counts the parent's high-water
+# mark, inherited across exec, and the parent may be a mock site serving
+# large images or holding a freshly built database.
+PEAK_RSS_WRAPPER = """
+import atexit, runpy, sys
+
+def report():
+    try:
+        with open('/proc/self/status') as status:
+            peak = next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmHWM:'))
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    print('peak_rss', peak)
+
+atexit.register(report)
+if sys.argv[1] == '-c':
+    code = sys.argv[2]
+    sys.argv = ['-c', *sys.argv[3:]]
+    exec(compile(code, '<string>', 'exec'), {'__name__': '__main__'})
+else:
+    sys.argv = sys.argv[1:]
+    runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+
+def measure_stage(name: str, script: list[str], log_path: Path) -> dict:
+    """run_stage() for a Python script or -c code, with the child's own peak RSS."""
+    result = run_stage(name, [sys.executable, '-c', PEAK_RSS_WRAPPER, *script], log_path)
+    result['peak_rss'] = int(log_path.read_text(encoding='utf-8').split()[-1])
+    return result
+
+
+# Child code for --memory: fetch image_view pages and save their images
+# (argv: mode, base URL, images dir, workers, image_view IDs)
+MEMORY_CHILD = """
+import hashlib, sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import scrape_highres
+
+mode, base_url, images_dir, workers, *ids = sys.argv[1:]
+scrape_highres.BASE_URL = base_url
+scraper = scrape_highres.HighResScraper(
+    str(Path(images_dir) / 'unused.db'), images_dir, delay=0, workers=int(workers)
+)
+
+def fetch(image_view_id):
+    image_data = scraper.fetch_full_res_image(image_view_id)
+    if mode == 'streaming':
+        return scraper.save_image(2003, 1, image_view_id, '', image_data) is not None
+    content = image_data['response'].content
+    hashlib.sha256(content).hexdigest()
+    (Path(images_dir) / f'{image_view_id}.jpg').write_bytes(content)
+    return True
+
+with ThreadPoolExecutor(int(workers)) as pool:
+    saved = sum(pool.map(fetch, map(int, ids)))
+sys.exit(0 if saved == len(ids) else 1)
+"""
+
+
+def download_memory(args, work_dir: Path) -> dict:
+    """Peak RSS of full-size downloads, streamed to disk vs read whole into memory."""
+    archive = MockArchive(1, args.seed, full_image_kb=args.image_mb * 1024)
+    count = 4 * args.workers
+    image_ids = [image_id for ex_id in sorted(archive.year_of) for image_id in archive.image_ids(ex_id)][:count]
+    print(f"{count} full-size images of ~{args.image_mb:g} MB, {args.workers} workers")
+    results = {}
+    with MockSite(archive, 0) as site:
+        modes = {'imports only': [], 'full body': image_ids, 'streaming': image_ids}
+        for idx, (mode, ids) in enumerate(modes.items()):
+            images_dir = work_dir / f'memory-{idx}'
+            images_dir.mkdir()
+            print(f"  {mode}...", end=' ', flush=True)
+            site.take_stats()
+            result = measure_stage(mode, [
+                '-c', MEMORY_CHILD, mode.split()[0], site.base_url,
+                str(images_dir), str(args.workers), *map(str, ids),
+            ], work_dir / f'memory-{idx}.log')
+            result.update(site.take_stats())
+            results[mode] = result
+            print(f"{result['wall_seconds']:.1f}s")
+            shutil.rmtree(images_dir)
+    return results
+
+
+def parse_corpus(args, scraper) -> list[tuple[int, int, bool, str, str]]:
+    """(exhibition_id, year, english, url, html) for every page to parse."""
+    if args.snapshots:
+        from snapshots import SnapshotStore, decompress
+
+        with SnapshotStore(args.snapshots) as store:
+            year_of = {
+                ex_id: year
+                for year, body in store.year_pages()
+                for ex_id in scraper.extract_exhibition_ids(scraper.parse(decompress(body).decode('iso-8859-1')))
+            }
+            return [
+                (ex_id, year_of.get(ex_id, FIRST_YEAR), lang == 'en', url,
+                 decompress(body).decode('iso-8859-1'))
+                for ex_id, pages in sorted(store.exhibition_pages().items())
+                for lang, (url, body) in sorted(pages.items(), reverse=True)
+            ]
+    archive = MockArchive(args.scale, args.seed)
+    return [
+        (ex_id, year, english,
+         f"https://this.is/klingogbang/archive_view.php?id={ex_id}{'&lang=en' if english else ''}",
+         archive.exhibition_page(ex_id, english))
+        for ex_id, year in sorted(archive.year_of.items())
+        for english in (False, True)
+    ]
+
+
+def _soup_extract(scraper, html: str, ex_id: int, year: int, english: bool, url: str) -> dict:
+    """The BeautifulSoup scans the scrapers made before the single-pass parsers."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    data = {}
+    name = soup.find(class_='arc_view_name')
+    if english:
+        if name:
+            data['title_en'] = name.get_text(strip=True)
+        text_elem = soup.find(class_='arc_view_text')
+        if text_elem:
+            paragraphs = text_elem.find_all('p')
+            data['description_en'] = '\n\n'.join(
+                p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)
+            ) if paragraphs else text_elem.get_text(strip=True)
+        return data
+
+    head = soup.find(class_='arc_view_head')
+    if head:
+        data['artists'] = [a.strip() for a in re.split(r',|\s+og\s+', head.get_text(strip=True)) if a.strip()]
+    data['title_is'] = name.get_text(strip=True) if name else f"Exhibition {ex_id}"
+    date_elem = soup.find(class_='arc_view_date')
+    if date_elem:
+        data['start_date'], data['end_date'] = scraper.parse_date_range(date_elem.get_text(strip=True))
+    data['description_is'] = '\n\n'.join(
+        text for elem in soup.find_all(class_='arc_view_text')
+        if len(text := elem.get_text(separator='\n', strip=True)) > 1 and text != '\xa0'
+    )
+    data['images'] = [
+        {'original_url': urljoin(url, img['src']), 'alt_text': img.get('alt', ''), 'display_order': idx}
+        for idx, img in enumerate(soup.find_all('img'))
+        if img.get('src') and not img['src'].endswith(('.gif', 'spacer'))
+        and not any(x in img['src'].lower() for x in ['logo', 'nav', 'button', 'arrow', 'icon'])
+    ]
+    # scrape_highres.py's gallery scan, over the same page
+    data['gallery'] = [
+        link['href'] for link in soup.find_all('a', href=re.compile(r'image_view\.php\?id=\d+'))
+    ]
+    return data
+
+
+def parse_throughput(args, work_dir: Path) -> dict:
+    """Pages/sec of BeautifulSoup extraction and of each parsers.py backend."""
+    from parsers import BACKENDS
+    from scrape_highres import HighResScraper
+    from scraper import KoBScraper
+
+    db = str(work_dir / 'parse.db')
+    corpus = parse_corpus(args, KoBScraper(db))
+    source = args.snapshots or f"mock site, scale {args.scale:g}"
+    print(f"{len(corpus)} exhibition pages ({source}), "
+          f"{sum(len(page[4]) for page in corpus) / 1024 / 1024:.1f} MB")
+    paths = {}
+    try:
+        import bs4  # noqa: F401
+        scraper = KoBScraper(db)
+        paths['BeautifulSoup'] = lambda ex_id, year, english, url, html: _soup_extract(
+            scraper, html, ex_id, year, english, url
+        )
+    except ImportError:
+        print("  beautifulsoup4 is not installed; timing parsers.py backends only")
+    for backend in BACKENDS:
+        scraper = KoBScraper(db, parser=backend)
+        highres = HighResScraper(db, str(work_dir), parser=backend)
+
+        def extract(ex_id, year, english, url, html, scraper=scraper, highres=highres):
+            page = scraper.parse(html)
+            if english:
+                return scraper.extract_english(page)
+            return scraper.extract_exhibition(page, ex_id, year, url), highres.extract_gallery_links(page)
+        paths[backend] = extract
+
+    results = {}
+    for name, extract in paths.items():
+        print(f"  {name}...", end=' ', flush=True)
+        start = time.perf_counter()
+        for ex_id, year, english, url, html in corpus:
+            extract(ex_id, year, english, url, html)
+        seconds = time.perf_counter() - start
+        results[name] = {'seconds': seconds, 'pages': len(corpus), 'pages_per_sec': len(corpus) / seconds}
+        print(f"{seconds:.2f}s")
+    return results
+
+
+def build_archive_db(db_path: Path, archive: MockArchive) -> None:
+    """Fill a database with a mock archive, parsed by the scraper but not fetched."""
+    from database import KnownKeys, get_connection, init_database, insert_exhibitions_batch
+    from scraper import KoBScraper
+
+    init_database(str(db_path))
+    scraper = KoBScraper(str(db_path))
+    conn = get_connection(str(db_path))
+    known = KnownKeys(conn)
+    batch = []
+    for ex_id, year in sorted(archive.year_of.items()):
+        url = f"https://this.is/klingogbang/archive_view.php?id={ex_id}"
+        data = scraper.extract_exhibition(scraper.parse(archive.exhibition_page(ex_id, False)), ex_id, year, url)
+        data.update(scraper.extract_english(scraper.parse(archive.exhibition_page(ex_id, True))) or {})
+        batch.append(data)
+        if len(batch) == 500:
+            insert_exhibitions_batch(conn, batch, known)
+            conn.commit()
+            batch = []
+    insert_exhibitions_batch(conn, batch, known)
+    conn.commit()
+    conn.close()
+
+
+def legacy_export(db_path: str, output_path: str) -> None:
+    """The export main.py ran before streaming: a query per exhibition, one json.dump."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT e.*, GROUP_CONCAT(a.name, '|||') as artist_names
+        FROM exhibitions e
+        LEFT JOIN exhibition_artists ea ON e.id = ea.exhibition_id
+        LEFT JOIN artists a ON ea.artist_id = a.id
+        GROUP BY e.id
+        ORDER BY e.year DESC, e.start_date DESC
+    """)
+    exhibitions = []
+    for row in cursor.fetchall():
+        cursor.execute("SELECT * FROM images WHERE exhibition_id = ? ORDER BY display_order", (row['id'],))
+        images = [
+            {'url': img['original_url'], 'local_path': img['local_path'],
+             'caption': img['caption'], 'alt_text': img['alt_text']}
+            for img in cursor.fetchall()
+        ]
+        exhibitions.append({
+            'id': row['exhibition_id'],
+            'title': {'is': row['title_is'], 'en': row['title_en']},
+            'artists': row['artist_names'].split('|||') if row['artist_names'] else [],
+            'dates': {'start': row['start_date'], 'end': row['end_date']},
+            'description': {'is': row['description_is'], 'en': row['description_en']},
+            'year': row['year'],
+            'images': images,
+        })
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'exhibitions': exhibitions}, f, ensure_ascii=False, indent=2)
+    conn.close()
+
+
+def export_benchmark(args, work_dir: Path) -> dict:
+    """Wall time, output size and peak RSS of each export mode on a scaled database."""
+    archive = MockArchive(args.scale, args.seed)
+    totals = archive.totals
+    db = work_dir / 'export.db'
+    print(f"Building a database of {totals['exhibitions']} exhibitions, {totals['images']} images "
+          f"(scale {args.scale:g})...", end=' ', flush=True)
+    start = time.monotonic()
+    build_archive_db(db, archive)
+    print(f"{time.monotonic() - start:.1f}s")
+
+    modes = {
+        'before streaming': ('export.json', ['-c', 'import sys, benchmark; benchmark.legacy_export(*sys.argv[1:])',
+                                             str(db)]),
+        'json': ('export.json', []),
+        'json --compact': ('export.json', ['--compact']),
+        'ndjson': ('export.ndjson', ['--ndjson']),
+        'ndjson --gzip': ('export.ndjson.gz', ['--ndjson', '--gzip']),
+    }
+    results = {}
+    for idx, (mode, (filename, options)) in enumerate(modes.items()):
+        output = work_dir / f'{idx}-{filename}'
+        if options[:1] == ['-c']:
+            script = [*options, str(output)]
+        else:
+            script = ['main.py', '--db', str(db), 'export', '--output', str(output), *options]
+        print(f"  {mode}...", end=' ', flush=True)
+        result = measure_stage(mode, script, work_dir / f'export-{idx}.log')
+        result['bytes'] = output.stat().st_size
+        opener = gzip.open if filename.endswith('.gz') else open
+        with opener(output, 'rt', encoding='utf-8') as f:
+            result['exhibitions'] = (len(json.load(f)['exhibitions']) if filename.endswith('.json')
+                                     else sum(1 for _ in f))
+        results[mode] = result
+        print(f"{result['wall_seconds']:.1f}s")
+        output.unlink()
+    return results
+
+
+SEARCH_QUERIES = ('ljós', 'skúlptúr hljóð', 'installation video', 'asdis', 'Ragnar Kjartansson', 'xylophone')
+SEARCH_REPEAT = 20  # timed runs per query; the median is reported
+SEARCH_LIMIT = 20
+
+
+def like_search(conn: sqlite3.Connection, query: str, limit: int = SEARCH_LIMIT) -> list:
+    """Every word anywhere in the searchable columns, by LIKE scan (no index)."""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    condition = """(
+        e.title_is LIKE ? OR e.title_en LIKE ? OR e.description_is LIKE ? OR e.description_en LIKE ?
+        OR EXISTS (SELECT 1 FROM exhibition_artists ea JOIN artists a ON a.id = ea.artist_id
+                   WHERE ea.exhibition_id = e.id AND a.name LIKE ?)
+        OR EXISTS (SELECT 1 FROM images i WHERE i.exhibition_id = e.id AND i.alt_text LIKE ?)
+    )"""
+    params = [f'%{word}%' for word in words for _ in range(6)]
+    return conn.execute(f"""
+        SELECT e.exhibition_id FROM exhibitions e
+        WHERE {' AND '.join([condition] * len(words))}
+        ORDER BY e.year DESC, e.start_date DESC
+        LIMIT ?
+    """, params + [limit]).fetchall()
+
+
+def search_benchmark(args, work_dir: Path) -> dict:
+    """Median latency of each query by LIKE scan and by the FTS5 index."""
+    from database import get_connection
+    from search import search_exhibitions
+
+    archive = MockArchive(args.scale, args.seed)
+    totals = archive.totals
+    db = work_dir / 'search.db'
+    print(f"Building a database of {totals['exhibitions']} exhibitions, {totals['images']} images "
+          f"(scale {args.scale:g})...", end=' ', flush=True)
+    start = time.monotonic()
+    build_archive_db(db, archive)
+    print(f"{time.monotonic() - start:.1f}s")
+
+    conn = get_connection(str(db))
+    methods = {
+        'LIKE': like_search,
+        'FTS5': lambda conn, query: search_exhibitions(conn, query, limit=SEARCH_LIMIT),
+    }
+    results = {}
+    try:
+        for query in SEARCH_QUERIES:
+            results[query] = {}
+            for name, search in methods.items():
+                hits = len(search(conn, query))  # warm the page cache
+                times = []
+                for _ in range(SEARCH_REPEAT):
+                    start = time.perf_counter()
+                    search(conn, query)
+                    times.append(time.perf_counter() - start)
+                results[query][name] = {'ms': sorted(times)[len(times) // 2] * 1000, 'hits': hits}
+    finally:
+        conn.close()
+    return results
+
+
+def db_overhead(requests: int, work_dir: Path) -> dict:
+    """Microseconds per page of the scraper's database bookkeeping, by connection strategy."""
+    from database import (
+        close_shared_connections, exhibition_exists, get_connection, init_database, log_scrape,
+        shared_connection,
+    )
+
+    def plain(db: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(db)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    strategies = {
+        'connect per page (rollback journal)': (plain, 'DELETE'),
+        'get_connection per page (WAL)': (get_connection, 'WAL'),
+        'shared_connection (WAL)': (shared_connection, 'WAL'),
+    }
+    results = {}
+    for name, (connect, journal_mode) in strategies.items():
+        db = str(work_dir / f"overhead-{journal_mode.lower()}-{len(results)}.db")
+        init_database(db)
+        conn = sqlite3.connect(db)
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.executemany(
+            "INSERT INTO exhibitions (exhibition_id, title_is, year, source_url) VALUES (?, ?, ?, ?)",
+            [(ex_id, f"Sýning {ex_id}", 2003 + ex_id % 23, f"archive_view.php?id={ex_id}")
+             for ex_id in range(1, 301)]
+        )
+        conn.commit()
+        conn.close()
+
+        start = time.perf_counter()
+        for idx in range(requests):
+            conn = connect(db)
+            exhibition_exists(conn, idx % 600)
+            log_scrape(conn, f"archive_view.php?id={idx % 600}", 'success', None, 200)
+            if connect is not shared_connection:
+                conn.close()
+        results[name] = (time.perf_counter() - start) / requests * 1e6
+    close_shared_connections()
+    return results
+
+
+def print_report(results: dict) -> None:
+    print(f"\n{'stage':<9}{'wall':>9}{'requests':>10}{'pages/s':>9}{'MB/s':>8}"
+          f"{'errors':>8}{'peak RSS':>10}{'DB time':>9}")
+    for stage, result in results['stages'].items():
+        peak = f"{result['peak_rss'] / 1024 / 1024:.0f} MB" if result['peak_rss'] else '-'
+        db = f"{result['db_seconds']:.2f}s" if 'db_seconds' in result else '-'
+        print(f"{stage:<9}{result['wall_seconds']:>8.1f}s{result['requests']:>10}"
+              f"{result['pages_per_sec']:>9.1f}{result['mb_per_sec']:>8.2f}"
+              f"{result['errors']:>8}{peak:>10}{db:>9}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Stages whose wall time grew by more than `tolerance` over the baseline."""
+    regressions = []
+    settings = ('scale', 'latency', 'error_rate', 'workers', 'max_rps', 'seed')
+    changed = [key for key in settings
+               if baseline.get('config', {}).get(key) != results['config'].get(key)]
+    if changed:
+        print(f"  Warning: settings differ from the baseline ({', '.join(changed)})")
+    for stage, result in results['stages'].items():
+        before = baseline.get('stages', {}).get(stage)
+        if not before:
+            continue
+        change = result['wall_seconds'] / before['wall_seconds'] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"  {stage}: {before['wall_seconds']:.1f}s -> {result['wall_seconds']:.1f}s ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+
+def _stage_list(value: str) -> list[str]:
+    stages = [stage.strip() for stage in value.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the archive pipeline against a local mock site",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__
+    )
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Archive size relative to the real one (default: %(default)s)')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help='Seconds the mock site waits before each response (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 503 (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=4, help='Workers for scrape, images, highres and sync')
+    parser.add_argument('--max-rps', type=float, help='Cap the request rate (default: unlimited)')
+    parser.add_argument('--stages', type=_stage_list, default=list(DEFAULT_STAGES),
+                        help=f"Comma-separated stages to run, from {','.join(STAGES)} "
+                             f"(default: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic archive')
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Compare against an earlier --output file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed slowdown per stage before --baseline fails (default: %(default)s)')
+    parser.add_argument('--keep', metavar='DIR',
+                        help='Run in DIR and keep the database, images and logs')
+    parser.add_argument('--speedup', action='store_true',
+                        help='Only compare a one-worker scrape with a --workers scrape')
+    parser.add_argument('--memory', action='store_true',
+                        help='Only compare peak RSS of streamed and fully buffered image downloads')
+    parser.add_argument('--image-mb', type=float, default=32.0,
+                        help='Full-size image size for --memory (default: %(default)s)')
+    parser.add_argument('--parse', action='store_true',
+                        help='Only compare parse throughput of BeautifulSoup and the parsers.py backends')
+    parser.add_argument('--snapshots', metavar='PATH',
+                        help='Snapshot store to take --parse pages from (default: mock site pages)')
+    parser.add_argument('--export', action='store_true',
+                        help='Only time each export mode, and the export it replaced, at --scale')
+    parser.add_argument('--search', action='store_true',
+                        help='Only compare search latency by LIKE scan and by the FTS5 index, at --scale')
+    parser.add_argument('--db-overhead', type=int, metavar='N',
+                        help='Only time the per-page database overhead, over N pages')
+    args = parser.parse_args()
+
+    if args.speedup:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            speedup = scrape_speedup(args, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"\n{'workers':<9}{'wall':>9}{'requests':>10}{'pages/s':>9}{'speedup':>9}  rows")
+        for workers, result in speedup.items():
+            print(f"{workers:<9}{result['wall_seconds']:>8.1f}s{result['requests']:>10}"
+                  f"{result['requests'] / result['wall_seconds']:>9.1f}{result['speedup']:>8.1f}x"
+                  f"  {'same' if result['same_rows'] else 'DIFFERENT'}")
+        if not all(result['same_rows'] for result in speedup.values()):
+            sys.exit(1)
+        return
+
+    if args.memory:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            memory = download_memory(args, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"\n{'mode':<14}{'wall':>8}{'MB read':>9}{'peak RSS':>10}")
+        for mode, result in memory.items():
+            peak = f"{result['peak_rss'] / 1024 / 1024:.0f} MB" if result['peak_rss'] else '-'
+            print(f"{mode:<14}{result['wall_seconds']:>7.1f}s{result['bytes'] / 1024 / 1024:>9.0f}{peak:>10}")
+        return
+
+    if args.parse:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            parsed = parse_throughput(args, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        slowest = min(result['pages_per_sec'] for result in parsed.values())
+        print(f"\n{'parser':<15}{'time':>8}{'pages/s':>10}{'speedup':>9}")
+        for name, result in parsed.items():
+            print(f"{name:<15}{result['seconds']:>7.2f}s{result['pages_per_sec']:>10.0f}"
+                  f"{result['pages_per_sec'] / slowest:>8.1f}x")
+        return
+
+    if args.export:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            exported = export_benchmark(args, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"\n{'mode':<18}{'wall':>8}{'output':>10}{'peak RSS':>10}{'exhibitions':>13}")
+        for mode, result in exported.items():
+            print(f"{mode:<18}{result['wall_seconds']:>7.1f}s{result['bytes'] / 1024 / 1024:>7.1f} MB"
+                  f"{result['peak_rss'] / 1024 / 1024:>7.0f} MB{result['exhibitions']:>13}")
+        return
+
+    if args.search:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            searched = search_benchmark(args, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(f"\n{'query':<22}{'LIKE':>10}{'FTS5':>10}{'speedup':>9}{'hits (LIKE/FTS5)':>18}")
+        for query, result in searched.items():
+            like, fts = result['LIKE'], result['FTS5']
+            print(f"{query:<22}{like['ms']:>7.2f} ms{fts['ms']:>7.2f} ms{like['ms'] / fts['ms']:>8.1f}x"
+                  f"{like['hits']:>11}/{fts['hits']}")
+        return
+
+    if args.db_overhead:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+        try:
+            overhead = db_overhead(args.db_overhead, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        baseline = next(iter(overhead.values()))
+        print(f"Database overhead per page ({args.db_overhead} pages):")
+        for name, micros in overhead.items():
+            print(f"  {name:<38}{micros:>9.0f} µs  ({baseline / micros:.1f}x)")
+        return
+
+    if args.keep:
+        work_dir = Path(args.keep)
+        work_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        work_dir = Path(tempfile.mkdtemp(prefix='kob-bench-'))
+    try:
+        results = run_benchmark(args, work_dir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        print(f"\nCompared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
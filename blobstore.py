@@ -0,0 +1,140 @@
+"""Content-addressed blob store for downloaded images.
+
+Every image body is stored once under images/blobs/<ab>/<cdef...>, named
+by its SHA-256. The per-exhibition paths the website serves
+(images/<year>/<exhibition_id>/<file>) are hardlinks to those blobs, and
+images.content_hash points at the blob from the database.
+"""
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """Store image bodies by content hash and link them into place."""
+
+    def __init__(self, images_dir: str = "images"):
+        self.root = Path(images_dir) / "blobs"
+        self._hints: dict[str, tuple[str, int]] = {}
+        self._hints_loaded = False
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:]
+
+    def has(self, digest: str) -> bool:
+        return self.blob_path(digest).exists()
+
+    def load_hints(self, conn: sqlite3.Connection) -> None:
+        """Load ETag -> (hash, size) hints for images already held."""
+        if self._hints_loaded:
+            return
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT etag, content_hash, file_size FROM images
+            WHERE etag IS NOT NULL AND content_hash IS NOT NULL
+        """)
+        with self._lock:
+            for etag, digest, size in cursor.fetchall():
+                self._hints[etag] = (digest, size)
+            self._hints_loaded = True
+
+    def match_hint(self, headers) -> Optional[str]:
+        """Return the hash of a held blob the response headers identify, if any.
+
+        A hint matches when the ETag was seen before and, if the server
+        sent a Content-Length, the stored size agrees with it.
+        """
+        etag = headers.get('ETag')
+        if not etag:
+            return None
+        with self._lock:
+            hint = self._hints.get(etag)
+        if not hint:
+            return None
+        digest, size = hint
+        length = headers.get('Content-Length')
+        if length and length.isdigit() and size is not None and int(length) != size:
+            return None
+        return digest if self.has(digest) else None
+
+    def remember(self, etag: Optional[str], digest: str, size: int) -> None:
+        if etag:
+            with self._lock:
+                self._hints[etag] = (digest, size)
+
+    def ingest(self, response) -> tuple[str, int, bool]:
+        """Stream a response into the store.
+
+        Returns (hash, size, is_new). When the bytes are already held the
+        new copy is discarded and nothing else is written.
+        """
+        staging = self.root / "tmp" / uuid.uuid4().hex
+        size, digest = stream_to_file(response, staging)
+        blob = self.blob_path(digest)
+        if blob.exists():
+            staging.unlink()
+            return digest, size, False
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staging, blob)
+        return digest, size, True
+
+    def link(self, digest: str, dest: Path) -> None:
+        """Point `dest` at a blob, by hardlink where the filesystem allows."""
+        blob = self.blob_path(digest)
+        if dest.exists():
+            if os.path.samefile(blob, dest):
+                return
+            dest.unlink()
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(blob, dest)
+        except OSError:
+            shutil.copyfile(blob, dest)
+
+    def holds(self, digest: str, path: Path) -> bool:
+        """True if `path` is already linked to the given blob."""
+        return path.exists() and self.has(digest) and os.path.samefile(self.blob_path(digest), path)
+
+
+def stream_to_file(response, path: Path, chunk_size: Optional[int] = None) -> tuple[int, str]:
+    """Stream a response body to `path` atomically.
+
+    The body goes to a temp file in the target directory and is renamed
+    into place once complete, so a partial download never appears under
+    the final name. Returns (size in bytes, SHA-256 hex digest).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.part")
+    chunk_size = chunk_size or _chunk_size(response.headers.get('Content-Length'))
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        response.close()
+    return size, digest.hexdigest()
+
+
+def _chunk_size(content_length: Optional[str]) -> int:
+    """Pick a streaming chunk size proportional to the expected file size."""
+    if not content_length or not content_length.isdigit():
+        return MIN_CHUNK_SIZE
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, int(content_length) // 8))
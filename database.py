@@ -1,18 +1,146 @@
 """Database module for Kling & Bang gallery archive scraper."""
 
+import atexit
+import gzip
+import json
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional
-
-
-def get_connection(db_path: str = "kob_archive.db") -> sqlite3.Connection:
+from typing import Callable, Iterable, Iterator, Optional
+
+from search import init_search_index
+
+INSERT_EXHIBITION_SQL = """
+    INSERT INTO exhibitions (
+        exhibition_id, title_is, title_en, start_date, end_date,
+        description_is, description_en, excerpt_is, year, source_url,
+        page_fingerprint, page_fingerprint_en
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Exhibition fields a refresh compares and updates
+REFRESH_FIELDS = (
+    'title_is', 'title_en', 'start_date', 'end_date', 'description_is', 'description_en',
+)
+
+INSERT_IMAGE_SQL = """
+    INSERT INTO images (
+        exhibition_id, filename, original_url, local_path, alt_text,
+        caption, width, height, file_size, mime_type, display_order, downloaded_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Exhibition order of the export; the artist and image queries sort by the
+# same key so all three result sets can be merged in a single pass
+EXPORT_ORDER = "e.year DESC, e.start_date DESC, e.id"
+# Export is one sequential pass: the page cache, memory map and in-memory
+# sorts CONNECTION_PRAGMAS set up would each grow with the database file
+EXPORT_PRAGMAS = {'mmap_size': 0, 'cache_size': -2000, 'temp_store': 'FILE'}
+
+
+# Applied to every connection. The journal mode is left alone: it is
+# stored in the database file, and only write runs switch it (wal_mode).
+CONNECTION_PRAGMAS = (
+    "PRAGMA cache_size = -65536",  # KiB, i.e. 64 MB of page cache
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+BUSY_TIMEOUT = 30.0  # seconds to wait for another writer's lock
+STATEMENT_CACHE_SIZE = 256  # prepared statements kept per connection
+
+# (thread ID, database path) -> that thread's shared connection. Kept in
+# one registry rather than thread-local storage so close_shared_connections
+# can reach every thread's connections, not just the caller's.
+_shared: dict[tuple[int, str], sqlite3.Connection] = {}
+_shared_lock = threading.Lock()
+
+
+def get_connection(db_path: str = "kob_archive.db", check_same_thread: bool = True) -> sqlite3.Connection:
     """Create database connection with row factory."""
-    conn = sqlite3.connect(db_path)
+    conn = sqlite3.connect(
+        db_path, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=check_same_thread,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+        # Durable in WAL mode except for the last commits before a power
+        # loss; in rollback mode it could corrupt the file, so only here
+        conn.execute("PRAGMA synchronous = NORMAL")
     return conn
 
 
+def shared_connection(db_path: str = "kob_archive.db") -> sqlite3.Connection:
+    """This thread's long-lived connection to a database.
+
+    Opened on first use and kept until close_shared_connections() runs
+    (at the latest, at exit), so code called once per page or image
+    reuses one connection and its prepared statements instead of
+    connecting each time. Only the calling thread uses it; a later thread
+    that gets the same ID takes it over. Callers commit their own writes
+    and must not close it.
+    """
+    key = (threading.get_ident(), db_path)
+    with _shared_lock:
+        conn = _shared.get(key)
+        if conn is None:
+            # Opened for any thread so close_shared_connections can close it
+            conn = _shared[key] = get_connection(db_path, check_same_thread=False)
+    return conn
+
+
+@atexit.register
+def close_shared_connections() -> None:
+    """Close every thread's shared connections.
+
+    Call it once the threads using them are done; a thread that asks for
+    its connection again afterwards gets a new one.
+    """
+    with _shared_lock:
+        connections = list(_shared.values())
+        _shared.clear()
+    for conn in connections:
+        conn.close()
+
+
+@contextmanager
+def wal_mode(db_path: str = "kob_archive.db") -> Iterator[None]:
+    """Put the database in WAL mode for a write run, then switch it back.
+
+    WAL lets readers (the website, a second tool) keep reading while a
+    scrape writes. The mode is stored in the file, though, and the
+    website opens it read-only, which in WAL mode fails unless it can
+    create the -shm file next to it; a copied .db file also lacks what is
+    still in the -wal. So on the way out the log is folded back into the
+    file and the previous mode restored. Closes the shared connections
+    first; if another connection is still reading or writing the mode
+    cannot change and the database is left in WAL mode.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        previous = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+    try:
+        yield
+    finally:
+        if previous != 'wal':
+            close_shared_connections()
+            conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+            try:
+                conn.execute(f"PRAGMA journal_mode = {previous}")
+            except sqlite3.OperationalError:
+                print(f"  {db_path} is in use; left in WAL mode")
+            finally:
+                conn.close()
+
+
 def init_database(db_path: str = "kob_archive.db") -> None:
     """Initialize database with all required tables."""
     conn = get_connection(db_path)
@@ -32,10 +160,14 @@ def init_database(db_path: str = "kob_archive.db") -> None:
             excerpt_is TEXT,
             year INTEGER NOT NULL,
             source_url TEXT NOT NULL,
+            page_fingerprint TEXT,
+            page_fingerprint_en TEXT,
             scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    _ensure_column(cursor, "exhibitions", "page_fingerprint", "TEXT")
+    _ensure_column(cursor, "exhibitions", "page_fingerprint_en", "TEXT")
 
     # Artists table
     cursor.execute("""
@@ -77,6 +209,36 @@ def init_database(db_path: str = "kob_archive.db") -> None:
             mime_type TEXT,
             display_order INTEGER,
             downloaded_at TIMESTAMP,
+            content_hash TEXT,
+            etag TEXT,
+            FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id)
+        )
+    """)
+    # Columns added after the first release
+    _ensure_column(cursor, "images", "content_hash", "TEXT")
+    _ensure_column(cursor, "images", "etag", "TEXT")
+
+    # Resized copies of downloaded images, shared by every image with the same bytes
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS image_derivatives (
+            content_hash TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            format TEXT NOT NULL,
+            path TEXT NOT NULL,
+            file_size INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, width, format)
+        )
+    """)
+
+    # Changes picked up by refresh runs, one JSON diff per update
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS exhibition_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exhibition_id INTEGER NOT NULL,
+            diff TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (exhibition_id) REFERENCES exhibitions(id)
         )
     """)
@@ -93,17 +255,78 @@ def init_database(db_path: str = "kob_archive.db") -> None:
         )
     """)
 
+    # Pages still to fetch and their state, shared by every crawler (see frontier.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            url TEXT NOT NULL,
+            payload TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_retry_at REAL,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            last_error TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (kind, url)
+        )
+    """)
+
+    # Per-year crawl summaries; a year with completed_at set is not crawled again
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS year_checkpoints (
+            year INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            success INTEGER NOT NULL DEFAULT 0,
+            updated INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            listed_at TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    """)
+
+    # One row per scrape/images/highres run, with its timing breakdown (see metrics.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tool TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            wall_seconds REAL,
+            requests INTEGER,
+            bytes INTEGER,
+            errors INTEGER,
+            stats TEXT,
+            metrics TEXT
+        )
+    """)
+
     # Create indexes for common queries
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_exhibitions_year ON exhibitions(year)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_exhibitions_exhibition_id ON exhibitions(exhibition_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_artists_normalized ON artists(normalized_name)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_images_exhibition ON images(exhibition_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_images_exhibition_filename ON images(exhibition_id, filename)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images(content_hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_frontier_state ON crawl_frontier(kind, state)")
+
+    # Full-text search index, kept in sync by triggers (see search.py)
+    init_search_index(cursor)
 
     conn.commit()
     conn.close()
     print(f"Database initialized: {db_path}")
 
 
+def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, decl: str) -> None:
+    """Add a column to an existing table if an older schema lacks it."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
 def exhibition_exists(conn: sqlite3.Connection, exhibition_id: int) -> bool:
     """Check if an exhibition already exists in the database."""
     cursor = conn.cursor()
@@ -111,15 +334,62 @@ def exhibition_exists(conn: sqlite3.Connection, exhibition_id: int) -> bool:
     return cursor.fetchone() is not None
 
 
+class KnownKeys:
+    """In-memory copy of the keys already in the archive, for skip and dedup checks.
+
+    Loaded with one query per table, so a crawl decides what to skip and
+    which artists exist without a round-trip per ID. Pass it to
+    insert_exhibitions_batch and refresh_exhibition to keep it in sync
+    with their inserts; after a rollback it may be ahead of the database
+    and should be reloaded. Rows another process adds after loading are
+    not seen here; the UNIQUE constraints on exhibitions and artists still
+    reject those duplicates, but images have no such constraint.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, images: bool = False):
+        # exhibition_id (the site's ID) -> database ID
+        self.exhibitions: dict[int, int] = dict(
+            conn.execute("SELECT exhibition_id, id FROM exhibitions").fetchall()
+        )
+        # normalized_name -> artist ID
+        self.artists: dict[str, int] = dict(
+            conn.execute("SELECT normalized_name, id FROM artists").fetchall()
+        )
+        # (exhibition database ID, filename) of every image, if asked for
+        self.images: Optional[set[tuple[int, str]]] = (
+            {tuple(row) for row in conn.execute("SELECT exhibition_id, filename FROM images")}
+            if images else None
+        )
+
+    def has_exhibition(self, exhibition_id: int) -> bool:
+        return exhibition_id in self.exhibitions
+
+    def has_image(self, conn: sqlite3.Connection, exhibition_db_id: int, filename: str) -> bool:
+        if self.images is None:
+            # Not loaded: ask the database (images have no UNIQUE constraint
+            # to fall back on)
+            return conn.execute(
+                "SELECT 1 FROM images WHERE exhibition_id = ? AND filename = ?",
+                (exhibition_db_id, filename)
+            ).fetchone() is not None
+        return (exhibition_db_id, filename) in self.images
+
+    def add_images(self, keys: Iterable[tuple[int, str]]) -> None:
+        if self.images is not None:
+            self.images.update(keys)
+
+
 def insert_exhibition(conn: sqlite3.Connection, data: dict) -> int:
     """Insert an exhibition record and return its database ID."""
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO exhibitions (
-            exhibition_id, title_is, title_en, start_date, end_date,
-            description_is, description_en, excerpt_is, year, source_url
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    cursor.execute(INSERT_EXHIBITION_SQL, _exhibition_row(data))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def _exhibition_row(data: dict) -> tuple:
+    """Build the INSERT_EXHIBITION_SQL parameters for a scraped exhibition."""
+    return (
         data['exhibition_id'],
         data['title_is'],
         data.get('title_en'),
@@ -129,10 +399,28 @@ def insert_exhibition(conn: sqlite3.Connection, data: dict) -> int:
         data.get('description_en'),
         data.get('excerpt_is'),
         data['year'],
-        data['source_url']
-    ))
-    conn.commit()
-    return cursor.lastrowid
+        data['source_url'],
+        data.get('page_fingerprint'),
+        data.get('page_fingerprint_en')
+    )
+
+
+def _image_row(data: dict, exhibition_db_id: int) -> tuple:
+    """Build the INSERT_IMAGE_SQL parameters for an image record."""
+    return (
+        exhibition_db_id,
+        data['filename'],
+        data['original_url'],
+        data.get('local_path'),
+        data.get('alt_text'),
+        data.get('caption'),
+        data.get('width'),
+        data.get('height'),
+        data.get('file_size'),
+        data.get('mime_type'),
+        data.get('display_order', 0),
+        data.get('downloaded_at')
+    )
 
 
 def get_or_create_artist(conn: sqlite3.Connection, name: str) -> int:
@@ -184,29 +472,208 @@ def link_artist_to_exhibition(
 def insert_image(conn: sqlite3.Connection, data: dict) -> int:
     """Insert an image record."""
     cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO images (
-            exhibition_id, filename, original_url, local_path, alt_text,
-            caption, width, height, file_size, mime_type, display_order, downloaded_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        data['exhibition_id'],
-        data['filename'],
-        data['original_url'],
-        data.get('local_path'),
-        data.get('alt_text'),
-        data.get('caption'),
-        data.get('width'),
-        data.get('height'),
-        data.get('file_size'),
-        data.get('mime_type'),
-        data.get('display_order', 0),
-        data.get('downloaded_at')
-    ))
+    cursor.execute(INSERT_IMAGE_SQL, _image_row(data, data['exhibition_id']))
     conn.commit()
     return cursor.lastrowid
 
 
+def insert_exhibitions_batch(
+    conn: sqlite3.Connection,
+    batch: list[dict],
+    known: Optional[KnownKeys] = None
+) -> dict[int, int]:
+    """Insert scraped exhibitions with their artists and images in bulk.
+
+    Exhibitions that already exist, or repeat within the batch, are skipped.
+    With `known`, existing exhibitions and artists are looked up there
+    instead of in the database, and the new rows are added to it.
+    Returns a map of exhibition_id to database ID for the inserted rows.
+    Does not commit; the caller owns the transaction.
+    """
+    cursor = conn.cursor()
+
+    if known:
+        seen = {data['exhibition_id'] for data in batch if known.has_exhibition(data['exhibition_id'])}
+    else:
+        seen = set(_select_in(
+            cursor,
+            "SELECT exhibition_id FROM exhibitions WHERE exhibition_id IN ({})",
+            [data['exhibition_id'] for data in batch]
+        ))
+    new = []
+    for data in batch:
+        if data['exhibition_id'] not in seen:
+            seen.add(data['exhibition_id'])
+            new.append(data)
+    if not new:
+        return {}
+
+    cursor.executemany(INSERT_EXHIBITION_SQL, [_exhibition_row(data) for data in new])
+    cursor.execute(
+        "SELECT exhibition_id, id FROM exhibitions WHERE exhibition_id IN ({})".format(
+            ','.join('?' * len(new))
+        ),
+        [data['exhibition_id'] for data in new]
+    )
+    db_ids = {row[0]: row[1] for row in cursor.fetchall()}
+
+    artist_ids = _resolve_artists(
+        cursor, [name for data in new for name in data.get('artists', [])], known
+    )
+
+    cursor.executemany("""
+        INSERT OR IGNORE INTO exhibition_artists (exhibition_id, artist_id, display_order)
+        VALUES (?, ?, ?)
+    """, [
+        (db_ids[data['exhibition_id']], artist_ids[normalize_artist_name(name)], idx)
+        for data in new
+        for idx, name in enumerate(data.get('artists', []))
+    ])
+
+    cursor.executemany(INSERT_IMAGE_SQL, [
+        _image_row(img_data, db_ids[data['exhibition_id']])
+        for data in new
+        for img_data in data.get('images', [])
+    ])
+
+    saved = {data['exhibition_id']: db_ids[data['exhibition_id']] for data in new}
+    if known:
+        known.exhibitions.update(saved)
+        known.add_images(
+            (db_ids[data['exhibition_id']], img_data['filename'])
+            for data in new
+            for img_data in data.get('images', [])
+        )
+    return saved
+
+
+def refresh_exhibition(
+    conn: sqlite3.Connection,
+    data: dict,
+    force: bool = False,
+    known: Optional[KnownKeys] = None
+) -> Optional[dict]:
+    """Update a stored exhibition from freshly scraped data if its pages changed.
+
+    Pages whose fingerprints match the stored ones are left alone unless
+    `force` is set (re-parsing unchanged pages with fixed extraction). Changed
+    fields, artist lists and newly listed images are written, updated_at is
+    bumped and the diff is recorded in exhibition_changes. New artists and
+    images are added to `known`. Returns the diff, or None when nothing
+    changed. Does not commit.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM exhibitions WHERE exhibition_id = ?", (data['exhibition_id'],))
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    fingerprints = {
+        key: data[key] for key in ('page_fingerprint', 'page_fingerprint_en') if data.get(key)
+    }
+    if not force and all(row[key] == value for key, value in fingerprints.items()):
+        return None
+
+    diff = {}
+    for field in REFRESH_FIELDS:
+        if field in data and data[field] != row[field]:
+            diff[field] = {'old': row[field], 'new': data[field]}
+
+    cursor.execute("""
+        SELECT a.name FROM artists a
+        JOIN exhibition_artists ea ON a.id = ea.artist_id
+        WHERE ea.exhibition_id = ?
+        ORDER BY ea.display_order
+    """, (row['id'],))
+    old_artists = [r[0] for r in cursor.fetchall()]
+    new_artists = data.get('artists', [])
+    if [normalize_artist_name(n) for n in old_artists] != [normalize_artist_name(n) for n in new_artists]:
+        diff['artists'] = {'old': old_artists, 'new': new_artists}
+        artist_ids = _resolve_artists(cursor, new_artists, known)
+        cursor.execute("DELETE FROM exhibition_artists WHERE exhibition_id = ?", (row['id'],))
+        cursor.executemany("""
+            INSERT OR IGNORE INTO exhibition_artists (exhibition_id, artist_id, display_order)
+            VALUES (?, ?, ?)
+        """, [
+            (row['id'], artist_ids[normalize_artist_name(name)], idx)
+            for idx, name in enumerate(new_artists)
+        ])
+
+    # New images are added; ones no longer listed are kept and only reported
+    cursor.execute("SELECT original_url FROM images WHERE exhibition_id = ?", (row['id'],))
+    old_urls = {r[0] for r in cursor.fetchall()}
+    new_images = [img for img in data.get('images', []) if img['original_url'] not in old_urls]
+    removed = sorted(old_urls - {img['original_url'] for img in data.get('images', [])})
+    if new_images:
+        diff['images_added'] = [img['original_url'] for img in new_images]
+        cursor.executemany(INSERT_IMAGE_SQL, [_image_row(img, row['id']) for img in new_images])
+        if known:
+            known.add_images((row['id'], img['filename']) for img in new_images)
+    if removed:
+        diff['images_removed'] = removed
+
+    changed = [field for field in REFRESH_FIELDS if field in diff]
+    assignments = [f"{field} = ?" for field in changed + list(fingerprints)]
+    if diff:
+        assignments.append("updated_at = CURRENT_TIMESTAMP")
+    cursor.execute(
+        f"UPDATE exhibitions SET {', '.join(assignments)} WHERE id = ?",
+        [data[field] for field in changed] + list(fingerprints.values()) + [row['id']]
+    )
+
+    if not diff:
+        return None
+    cursor.execute(
+        "INSERT INTO exhibition_changes (exhibition_id, diff) VALUES (?, ?)",
+        (row['id'], json.dumps(diff, ensure_ascii=False))
+    )
+    return diff
+
+
+def _select_in(cursor: sqlite3.Cursor, sql: str, values: list) -> list:
+    """Run a single-column SELECT with an IN (...) list and return the column."""
+    if not values:
+        return []
+    cursor.execute(sql.format(','.join('?' * len(values))), values)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _resolve_artists(
+    cursor: sqlite3.Cursor,
+    names: list[str],
+    known: Optional[KnownKeys] = None
+) -> dict[str, int]:
+    """Map artist names to IDs by normalized name, creating missing artists."""
+    by_normalized = {}
+    for name in names:
+        by_normalized.setdefault(normalize_artist_name(name), name.strip())
+    if known:
+        artist_ids = {n: known.artists[n] for n in by_normalized if n in known.artists}
+    else:
+        artist_ids = _artist_ids(cursor, list(by_normalized))
+    missing = [(by_normalized[n], n) for n in by_normalized if n not in artist_ids]
+    if missing:
+        cursor.executemany("INSERT INTO artists (name, normalized_name) VALUES (?, ?)", missing)
+        created = _artist_ids(cursor, [n for _, n in missing])
+        artist_ids.update(created)
+        if known:
+            known.artists.update(created)
+    return artist_ids
+
+
+def _artist_ids(cursor: sqlite3.Cursor, normalized_names: list[str]) -> dict[str, int]:
+    """Map normalized artist names to existing artist IDs."""
+    if not normalized_names:
+        return {}
+    cursor.execute(
+        "SELECT normalized_name, id FROM artists WHERE normalized_name IN ({})".format(
+            ','.join('?' * len(normalized_names))
+        ),
+        normalized_names
+    )
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
 def log_scrape(
     conn: sqlite3.Connection,
     url: str,
@@ -223,6 +690,73 @@ def log_scrape(
     conn.commit()
 
 
+def log_scrapes_batch(conn: sqlite3.Connection, entries: list[tuple]) -> None:
+    """Log many (url, status, error_message, response_code) tuples.
+
+    Does not commit; the caller owns the transaction.
+    """
+    conn.executemany("""
+        INSERT INTO scraping_log (url, status, error_message, response_code)
+        VALUES (?, ?, ?, ?)
+    """, entries)
+
+
+def get_year_checkpoints(conn: sqlite3.Connection, start_year: int, end_year: int) -> dict[int, sqlite3.Row]:
+    """The year_checkpoints rows for a range of years, by year."""
+    cursor = conn.execute(
+        "SELECT * FROM year_checkpoints WHERE year BETWEEN ? AND ?", (start_year, end_year)
+    )
+    return {row['year']: row for row in cursor}
+
+
+def start_year_checkpoint(conn: sqlite3.Connection, year: int, total: int, skipped: int) -> None:
+    """Record a crawled year list page, restarting the year's summary.
+
+    `total` is the number of exhibitions listed and `skipped` those already
+    archived; the rest are counted as the writer saves them.
+    """
+    conn.execute("""
+        INSERT INTO year_checkpoints (year, total, skipped, listed_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (year) DO UPDATE SET
+            total = excluded.total, success = 0, updated = 0, skipped = excluded.skipped,
+            failed = 0, listed_at = excluded.listed_at, completed_at = NULL
+    """, (year, total, skipped))
+    conn.commit()
+
+
+def add_year_counts(conn: sqlite3.Connection, counts: dict[int, dict[str, int]]) -> None:
+    """Add success/updated/skipped counts to years still being crawled.
+
+    Does not commit; the caller owns the transaction.
+    """
+    conn.executemany("""
+        UPDATE year_checkpoints SET
+            success = success + ?, updated = updated + ?, skipped = skipped + ?
+        WHERE year = ? AND completed_at IS NULL
+    """, [
+        (count.get('success', 0), count.get('updated', 0), count.get('skipped', 0), year)
+        for year, count in counts.items()
+    ])
+
+
+def finish_year_checkpoint(conn: sqlite3.Connection, year: int, failed: int) -> Optional[sqlite3.Row]:
+    """Record a listed year's failures, completing it only if there were none.
+
+    A year with failed pages stays open, so the next crawl lists it again
+    and its failed exhibitions go back in the queue. Returns the summary,
+    or None if the year was never listed.
+    """
+    row = conn.execute("""
+        UPDATE year_checkpoints SET
+            failed = ?, completed_at = CASE WHEN ? = 0 THEN CURRENT_TIMESTAMP END
+        WHERE year = ? AND completed_at IS NULL
+        RETURNING *
+    """, (failed, failed, year)).fetchone()
+    conn.commit()
+    return row
+
+
 def get_statistics(conn: sqlite3.Connection) -> dict:
     """Get database statistics."""
     cursor = conn.cursor()
@@ -249,65 +783,168 @@ def get_statistics(conn: sqlite3.Connection) -> dict:
     return stats
 
 
-def export_to_json(conn: sqlite3.Connection, output_path: str = "export.json") -> None:
-    """Export all data to JSON format for new website."""
-    import json
+def export_to_json(
+    conn: sqlite3.Connection,
+    output_path: str = "export.json",
+    ndjson: bool = False,
+    compact: bool = False,
+    compress: bool = False
+) -> int:
+    """Export all data to JSON format for new website.
+
+    Exhibitions, artists and images are read with one query each, sorted
+    the same way, and merged while streaming, so memory stays flat however
+    large the archive grows. `ndjson` writes one exhibition per line
+    instead of a single document, `compact` drops the indentation and
+    `compress` gzips the output. Returns the number of exhibitions written.
+
+    Artists are listed in page order (exhibition_artists.display_order).
+    The export before streaming listed them by artist ID, i.e. in the
+    order each artist first appeared anywhere in the archive, which for a
+    few exhibitions (8 of 204 in the current archive) differed from the
+    page's credits.
+    """
+    with _pragmas(conn, EXPORT_PRAGMAS):
+        return _export_to_json(conn, output_path, ndjson, compact, compress)
+
+
+@contextmanager
+def _pragmas(conn: sqlite3.Connection, settings: dict) -> Iterator[None]:
+    """Apply connection pragmas for a block, then restore the previous values."""
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in settings}
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+def _export_to_json(
+    conn: sqlite3.Connection,
+    output_path: str,
+    ndjson: bool,
+    compact: bool,
+    compress: bool
+) -> int:
+    exhibitions = conn.cursor()
+    exhibitions.execute(f"""
+        SELECT e.id, e.exhibition_id, e.title_is, e.title_en, e.start_date, e.end_date,
+               e.description_is, e.description_en, e.year
+        FROM exhibitions e
+        ORDER BY {EXPORT_ORDER}
+    """)
 
-    cursor = conn.cursor()
+    artists = conn.cursor()
+    artists.execute(f"""
+        SELECT ea.exhibition_id, a.name
+        FROM exhibitions e
+        JOIN exhibition_artists ea ON e.id = ea.exhibition_id
+        JOIN artists a ON ea.artist_id = a.id
+        ORDER BY {EXPORT_ORDER}, ea.display_order
+    """)
 
-    # Get all exhibitions with their artists
-    cursor.execute("""
-        SELECT e.*, GROUP_CONCAT(a.name, '|||') as artist_names
+    images = conn.cursor()
+    images.execute(f"""
+        SELECT i.exhibition_id, i.original_url, i.local_path, i.caption, i.alt_text
         FROM exhibitions e
-        LEFT JOIN exhibition_artists ea ON e.id = ea.exhibition_id
-        LEFT JOIN artists a ON ea.artist_id = a.id
-        GROUP BY e.id
-        ORDER BY e.year DESC, e.start_date DESC
+        JOIN images i ON e.id = i.exhibition_id
+        ORDER BY {EXPORT_ORDER}, i.display_order
     """)
 
-    exhibitions = []
-    for row in cursor.fetchall():
-        # Get images for this exhibition
-        cursor.execute("""
-            SELECT * FROM images WHERE exhibition_id = ? ORDER BY display_order
-        """, (row['id'],))
-        images = [
-            {
-                'url': img['original_url'],
-                'local_path': img['local_path'],
-                'caption': img['caption'],
-                'alt_text': img['alt_text']
-            }
-            for img in cursor.fetchall()
-        ]
-
-        artists = row['artist_names'].split('|||') if row['artist_names'] else []
-
-        exhibitions.append({
-            'id': row['exhibition_id'],
-            'title': {
-                'is': row['title_is'],
-                'en': row['title_en']
-            },
-            'artists': artists,
-            'dates': {
-                'start': row['start_date'],
-                'end': row['end_date']
-            },
-            'description': {
-                'is': row['description_is'],
-                'en': row['description_en']
-            },
-            'year': row['year'],
-            'images': images
-        })
-
-    output = {'exhibitions': exhibitions}
-
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output, f, ensure_ascii=False, indent=2)
-
-    print(f"Exported {len(exhibitions)} exhibitions to {output_path}")
+    artist_groups = _group_by_exhibition(artists)
+    image_groups = _group_by_exhibition(images)
+    next_artists = next(artist_groups, None)
+    next_images = next(image_groups, None)
+
+    opener = gzip.open if compress else open
+    count = 0
+    with opener(output_path, 'wt', encoding='utf-8') as f:
+        write = _export_writer(f, ndjson, compact)
+        for row in exhibitions:
+            artist_rows = []
+            if next_artists and next_artists[0] == row['id']:
+                artist_rows = next_artists[1]
+                next_artists = next(artist_groups, None)
+            image_rows = []
+            if next_images and next_images[0] == row['id']:
+                image_rows = next_images[1]
+                next_images = next(image_groups, None)
+
+            write({
+                'id': row['exhibition_id'],
+                'title': {
+                    'is': row['title_is'],
+                    'en': row['title_en']
+                },
+                'artists': [a['name'] for a in artist_rows],
+                'dates': {
+                    'start': row['start_date'],
+                    'end': row['end_date']
+                },
+                'description': {
+                    'is': row['description_is'],
+                    'en': row['description_en']
+                },
+                'year': row['year'],
+                'images': [
+                    {
+                        'url': img['original_url'],
+                        'local_path': img['local_path'],
+                        'caption': img['caption'],
+                        'alt_text': img['alt_text']
+                    }
+                    for img in image_rows
+                ]
+            })
+            count += 1
+        write(None)
+
+    print(f"Exported {count} exhibitions to {output_path}")
+    return count
+
+
+def _group_by_exhibition(cursor: sqlite3.Cursor) -> Iterator[tuple[int, list]]:
+    """Yield (exhibition id, rows) for a cursor sorted by exhibition."""
+    for exhibition_id, rows in groupby(cursor, key=itemgetter(0)):
+        yield exhibition_id, list(rows)
+
+
+def _export_writer(f, ndjson: bool, compact: bool) -> Callable[[Optional[dict]], None]:
+    """Return a function writing one exhibition at a time; None ends the output.
+
+    The default layout matches json.dump(..., indent=2) of the whole
+    {'exhibitions': [...]} document.
+    """
+    if ndjson:
+        def write(exhibition):
+            if exhibition is not None:
+                f.write(json.dumps(exhibition, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+        return write
+
+    if compact:
+        head, sep, tail, empty = '{"exhibitions":[', ',', ']}', '{"exhibitions":[]}'
+        dumps = lambda e: json.dumps(e, ensure_ascii=False, separators=(',', ':'))
+    else:
+        head, sep, tail, empty = '{\n  "exhibitions": [\n', ',\n', '\n  ]\n}', '{\n  "exhibitions": []\n}'
+        # Split on '\n' only: str.splitlines would also break at U+0085/U+2028 inside strings
+        dumps = lambda e: '\n'.join(
+            '    ' + line for line in json.dumps(e, ensure_ascii=False, indent=2).split('\n')
+        )
+
+    started = False
+
+    def write(exhibition):
+        nonlocal started
+        if exhibition is None:
+            f.write(tail if started else empty)
+            return
+        f.write(sep if started else head)
+        f.write(dumps(exhibition))
+        started = True
+    return write
 
 
 if __name__ == "__main__":
@@ -0,0 +1,233 @@
+"""Responsive image derivatives for the website.
+
+Builds resized copies of every downloaded image at a few widths and
+formats, on a process pool, and records them in image_derivatives.
+Derivatives are keyed by the original's content hash, so an image shared
+by several exhibitions is processed once and re-runs only pick up images
+that have no derivatives yet.
+
+Layout under the images directory:
+    derivatives/<sha256[:2]>/<sha256>/<width>.<ext>
+
+Pillow is only needed by this stage and is imported by the worker
+processes, so the rest of the scraper runs without it.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from blobstore import BlobStore
+from database import get_connection
+
+DERIVATIVE_WIDTHS = (320, 800, 1600)
+DERIVATIVE_FORMATS = ('webp', 'jpeg')
+FORMAT_EXTENSIONS = {'webp': 'webp', 'avif': 'avif', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 60},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+}
+UPDATE_BATCH_SIZE = 50
+EXIF_ORIENTATION = 0x0112
+
+INSERT_DERIVATIVE_SQL = """
+    INSERT OR REPLACE INTO image_derivatives (
+        content_hash, width, height, format, path, file_size
+    ) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class DerivativeBuilder:
+    """Generate resized derivatives of downloaded images."""
+
+    def __init__(
+        self,
+        db_path: str = "kob_archive.db",
+        images_dir: str = "images",
+        widths: tuple[int, ...] = DERIVATIVE_WIDTHS,
+        formats: tuple[str, ...] = DERIVATIVE_FORMATS,
+        workers: Optional[int] = None
+    ):
+        self.db_path = db_path
+        self.images_dir = Path(images_dir)
+        self.widths = tuple(sorted(set(widths), reverse=True))
+        self.formats = tuple(formats)
+        self.workers = workers or os.cpu_count() or 1
+        self.blobs = BlobStore(images_dir)
+
+    def pending_images(self, conn: sqlite3.Connection) -> list[dict]:
+        """One source file per content hash still missing a requested format.
+
+        Downloads made before the blob store have no content_hash; they are
+        included once per file and hashed by the worker.
+        """
+        cursor = conn.cursor()
+        placeholders = ','.join('?' * len(self.formats))
+        cursor.execute(f"""
+            SELECT i.content_hash, MIN(i.local_path) AS local_path
+            FROM images i
+            WHERE i.local_path IS NOT NULL AND i.content_hash IS NOT NULL
+              AND (
+                  SELECT COUNT(DISTINCT d.format) FROM image_derivatives d
+                  WHERE d.content_hash = i.content_hash AND d.format IN ({placeholders})
+              ) < ?
+            GROUP BY i.content_hash
+            UNION ALL
+            SELECT NULL, local_path FROM images
+            WHERE local_path IS NOT NULL AND content_hash IS NULL
+            GROUP BY local_path
+        """, (*self.formats, len(self.formats)))
+
+        pending = []
+        for row in cursor.fetchall():
+            source = self._source_path(row['content_hash'], row['local_path'])
+            if source:
+                pending.append({'content_hash': row['content_hash'], 'source': str(source)})
+        return pending
+
+    def _source_path(self, content_hash: Optional[str], local_path: str) -> Optional[Path]:
+        if content_hash and self.blobs.has(content_hash):
+            return self.blobs.blob_path(content_hash)
+        path = Path(local_path)
+        return path if path.exists() else None
+
+    def build_all(self) -> dict:
+        """Build derivatives for every pending image."""
+        stats = {'processed': 0, 'derivatives': 0, 'failed': 0}
+        conn = get_connection(self.db_path)
+        try:
+            pending = self.pending_images(conn)
+            print(f"Building derivatives for {len(pending)} images "
+                  f"({', '.join(map(str, self.widths))}px; {', '.join(self.formats)}) "
+                  f"on {self.workers} processes...")
+            if not pending:
+                return stats
+
+            start = time.monotonic()
+            results = []
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {
+                    pool.submit(
+                        build_derivatives, task['source'], task['content_hash'],
+                        str(self.images_dir / "derivatives"), self.widths, self.formats
+                    ): task
+                    for task in pending
+                }
+                for idx, future in enumerate(as_completed(futures), 1):
+                    task = futures[future]
+                    result = future.result()
+                    if result.get('error'):
+                        print(f"  Failed {task['source']}: {result['error']}")
+                        stats['failed'] += 1
+                    else:
+                        # Hashed by the worker: a download from before the blob store
+                        result['local_path'] = None if task['content_hash'] else task['source']
+                        results.append(result)
+                        stats['processed'] += 1
+                        stats['derivatives'] += len(result['derivatives'])
+                    if len(results) >= UPDATE_BATCH_SIZE:
+                        _record_results(conn, results)
+                    if idx % 100 == 0:
+                        print(f"  [{idx}/{len(pending)}]")
+            _record_results(conn, results)
+
+            print(f"  Done in {time.monotonic() - start:.1f}s")
+        finally:
+            conn.close()
+        return stats
+
+
+def build_derivatives(
+    source: str,
+    content_hash: Optional[str],
+    output_dir: str,
+    widths: tuple[int, ...],
+    formats: tuple[str, ...]
+) -> dict:
+    """Resize one image to every width and format (runs in a worker process).
+
+    Widths at or above the original's are replaced by a single copy at the
+    original width; images are never upscaled. Returns the original's
+    dimensions and one (width, height, format, path, size) per file, or an
+    'error' message.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        if not content_hash:
+            content_hash = _file_hash(source)
+        out = Path(output_dir) / content_hash[:2] / content_hash
+        out.mkdir(parents=True, exist_ok=True)
+
+        with Image.open(source) as original:
+            width, height = original.size
+            rotated = original.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+            if rotated:
+                width, height = height, width
+            # Let JPEGs decode at a reduced DCT scale that still covers the largest width
+            largest = min(max(widths), width)
+            original.draft('RGB', (1, largest) if rotated else (largest, 1))
+            img = ImageOps.exif_transpose(original)
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if img.has_transparency_data else 'RGB')
+
+            derivatives = []
+            # Largest first, each step resized from the previous one
+            for target in sorted({min(w, img.width) for w in widths}, reverse=True):
+                if target != img.width:
+                    img = img.resize(
+                        (target, max(1, round(img.height * target / img.width))),
+                        Image.Resampling.LANCZOS
+                    )
+                for fmt in formats:
+                    path = out / f"{target}.{FORMAT_EXTENSIONS[fmt]}"
+                    frame = img.convert('RGB') if fmt == 'jpeg' and img.mode == 'RGBA' else img
+                    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                    frame.save(tmp, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                    os.replace(tmp, path)
+                    derivatives.append((img.width, img.height, fmt, str(path), path.stat().st_size))
+
+        return {
+            'content_hash': content_hash,
+            'width': width,
+            'height': height,
+            'derivatives': derivatives,
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _record_results(conn: sqlite3.Connection, results: list[dict]) -> None:
+    """Store dimensions and derivative rows for a batch of built images."""
+    if not results:
+        return
+    cursor = conn.cursor()
+    for result in results:
+        if result['local_path']:
+            # Remember the hash so the next run sees this image as done
+            cursor.execute(
+                "UPDATE images SET content_hash = ? WHERE local_path = ?",
+                (result['content_hash'], result['local_path'])
+            )
+        cursor.execute(
+            "UPDATE images SET width = ?, height = ? WHERE content_hash = ?",
+            (result['width'], result['height'], result['content_hash'])
+        )
+        cursor.executemany(INSERT_DERIVATIVE_SQL, [
+            (result['content_hash'], *derivative) for derivative in result['derivatives']
+        ])
+    conn.commit()
+    results.clear()
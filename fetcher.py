@@ -0,0 +1,323 @@
+"""Shared fetch layer: classified retries and a per-host circuit breaker.
+
+Every tool fetches through a Fetcher, which wraps cached_get() so the
+response cache keeps working as before, paces requests with the tool's
+rate limiter (reporting each response's latency and outcome back to it),
+and adds:
+
+- retries for transient failures only (timeouts, connection errors and
+  resets, 408/425/429 and 5xx), with exponential backoff and full jitter
+- Retry-After on 429/503, honoured for the whole host, not just the
+  request that got it
+- a circuit breaker per host: after BREAKER_THRESHOLD failures in a row
+  it opens and every fetcher waits out a cooldown; then one probe
+  request is let through, which either closes it or reopens it with the
+  cooldown doubled. A degraded server gets a pause, not a retry storm.
+  Cache hits never wait on it, and only a 2xx or 304 from the network
+  counts as the host recovering.
+
+Anything else (404, CacheMiss, invalid URLs) is raised immediately.
+
+With a RunMetrics, each network attempt also records its wait, DNS,
+connect, TTFB and (unless streamed) download time, body size and
+latency; streamed bodies are timed by the caller that reads them.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+from http_cache import CachedResponse, ResponseCache, cached_get
+from metrics import RunMetrics, take_connection_times
+from ratelimit import RateLimiter
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # seconds; the cap for attempt n is BACKOFF_BASE * 2**n
+BACKOFF_MAX = 60.0
+RETRY_AFTER_MAX = 600.0
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+BREAKER_THRESHOLD = 5  # consecutive failures that open the breaker
+BREAKER_COOLDOWN = 30.0
+BREAKER_COOLDOWN_MAX = 600.0
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker shared by every thread using a host."""
+
+    def __init__(
+        self,
+        host: str,
+        threshold: int = BREAKER_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        max_cooldown: float = BREAKER_COOLDOWN_MAX
+    ):
+        self.host = host
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened = 0  # times the breaker has opened
+        self._cooldown = cooldown
+        self._open_until = 0.0
+        self._paused_until = 0.0
+        self._probing = False
+        self._prober: Optional[int] = None  # thread sending the half-open probe
+        self._cond = threading.Condition()
+
+    def before_request(self) -> float:
+        """Block while the host is paused or the breaker is open.
+
+        In the half-open state only one caller (the probe) proceeds; the
+        rest wait for its outcome. Returns seconds spent waiting.
+        """
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self.state == 'open':
+                    if now < self._open_until:
+                        self._cond.wait(self._open_until - now)
+                        continue
+                    self.state = 'half-open'
+                    self._probing = False
+                if self.state == 'half-open':
+                    if self._probing:
+                        self._cond.wait()
+                        continue
+                    self._probing = True
+                    self._prober = threading.get_ident()
+                    break
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                    continue
+                break
+        return time.monotonic() - start
+
+    def record_success(self) -> None:
+        with self._cond:
+            if self.state != 'closed':
+                print(f"  {self.host} recovered; resuming")
+            self.state = 'closed'
+            self.failures = 0
+            self._cooldown = self.base_cooldown
+            self._probing = False
+            self._cond.notify_all()
+
+    def record_failure(self) -> None:
+        with self._cond:
+            self.failures += 1
+            if self.state == 'half-open':
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == 'closed' and self.failures >= self.threshold:
+                self._open()
+            self._probing = False
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        """Let another caller probe if this one's request ended without an outcome."""
+        with self._cond:
+            if self._probing and self._prober == threading.get_ident():
+                self._probing = False
+                self._cond.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request to the host for `seconds` (Retry-After)."""
+        with self._cond:
+            until = time.monotonic() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+                print(f"  {self.host} asked us to wait; pausing {seconds:g}s")
+
+    def _open(self) -> None:
+        self.state = 'open'
+        self.opened += 1
+        self._open_until = time.monotonic() + self._cooldown
+        print(f"  {self.host} is failing ({self.failures} errors in a row); "
+              f"pausing all requests for {self._cooldown:g}s")
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url: str) -> CircuitBreaker:
+    """The process-wide breaker for a URL's host."""
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def is_retryable(error: requests.exceptions.RequestException) -> bool:
+    """Transient failures worth another attempt."""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in RETRY_STATUSES
+
+
+def retry_after(response) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta or HTTP date), capped."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class Fetcher:
+    """GET with retries and circuit breaking, shared by the archive tools."""
+
+    def __init__(
+        self,
+        session,
+        cache: Optional[ResponseCache] = None,
+        limiter: Optional[RateLimiter] = None,
+        timeout: float = 30,
+        max_retries: int = MAX_RETRIES,
+        metrics: Optional[RunMetrics] = None
+    ):
+        self.session = session
+        self.cache = cache
+        self.limiter = limiter
+        self.metrics = metrics
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.stats = {'requests': 0, 'retries': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, stream: bool = False):
+        """Fetch a URL, retrying transient failures.
+
+        Returns the response (body unread with `stream=True`, as with
+        cached_get) or raises the last error once retries are exhausted.
+        """
+        breaker = breaker_for(url)
+        sent = []
+
+        def throttle():
+            # Only called when the request goes to the network, so cache
+            # hits are served while the breaker is open
+            waited = breaker.before_request()
+            if self.metrics and waited:
+                self.metrics.add_time('wait', waited)
+            if self.limiter:
+                waited = self.limiter.acquire()
+                if self.metrics:
+                    self.metrics.add_time('wait', waited)
+            take_connection_times()
+            sent.append(time.monotonic())
+
+        for attempt in range(self.max_retries + 1):
+            self._count('requests')
+            sent.clear()
+            try:
+                response = cached_get(
+                    self.session, url, self.cache,
+                    timeout=self.timeout, throttle=throttle, stream=stream
+                )
+            except requests.exceptions.RequestException as e:
+                retryable = is_retryable(e)
+                self._report(sent, ok=not retryable)
+                self._measure(sent, getattr(e, 'response', None), stream, failed=True)
+                if not retryable:
+                    # The request itself is at fault (or never left the
+                    # cache): no sign of the host's health either way
+                    breaker.release()
+                    raise
+                error_response = getattr(e, 'response', None)
+                if error_response is not None:
+                    error_response.close()
+                breaker.record_failure()
+                wait = retry_after(error_response)
+                if wait:
+                    breaker.pause(wait)
+                if attempt == self.max_retries:
+                    self._count('failed')
+                    raise
+                self._count('retries')
+                paused = bool(wait)
+                if not paused:
+                    wait = backoff_delay(attempt)
+                print(f"  Retrying {url} in {wait:.1f}s "
+                      f"({_describe(e)}; attempt {attempt + 2}/{self.max_retries + 1})")
+                if not paused:
+                    time.sleep(wait)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            self._report(sent, ok=True)
+            self._measure(sent, response, stream)
+            if sent:
+                # A 2xx or 304 from the host; cache hits say nothing about it
+                breaker.record_success()
+            return response
+
+    def _report(self, sent: list[float], ok: bool) -> None:
+        """Feed the request's latency and outcome to the rate limiter."""
+        if self.limiter and sent:
+            self.limiter.record(time.monotonic() - sent[-1], ok)
+
+    def _measure(self, sent: list[float], response, stream: bool, failed: bool = False) -> None:
+        """Split one attempt's time into phases for the run metrics."""
+        metrics = self.metrics
+        if not metrics:
+            return
+        if not sent:
+            if not failed:
+                metrics.count('cache_hits')
+            return
+        total = time.monotonic() - sent[-1]
+        dns, connect = take_connection_times()
+        metrics.count('requests')
+        metrics.observe_latency(total)
+        if failed:
+            metrics.count('errors')
+        if connect:  # a new connection was opened for this request
+            metrics.add_time('dns', dns)
+            metrics.add_time('connect', connect)
+
+        elapsed = getattr(response, 'elapsed', None)
+        if elapsed is None:
+            # No response, or a 304 served from the cache: no phase split
+            metrics.add_time('ttfb', max(total - dns - connect, 0.0))
+            return
+        headers = elapsed.total_seconds()
+        metrics.add_time('ttfb', max(headers - dns - connect, 0.0))
+        if not stream and not isinstance(response, CachedResponse):
+            metrics.add_time('download', max(total - headers, 0.0))
+            metrics.count('bytes', len(response.content))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+def _describe(error: requests.exceptions.RequestException) -> str:
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return f"HTTP {response.status_code}"
+    return type(error).__name__
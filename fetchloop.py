@@ -0,0 +1,113 @@
+"""One asyncio event loop for every fetch the archive tools make.
+
+The loop runs on a background thread for the life of the process and is
+shared by every tool in it. Tools hand it coroutines with `submit()`,
+which returns a concurrent.futures.Future, so synchronous code can wait
+on results in whatever order it needs. A coroutine composes fetches,
+e.g. an exhibition's Icelandic and English pages in parallel, then its
+images, and everything in flight shares the loop's connection slots:
+
+    loop = fetch_loop()
+    slots = loop.slots(workers)
+    future = loop.submit(loop.call(slots, fetcher.get, url))
+
+Requests still go through a Fetcher (cache, retries, circuit breaker,
+rate limiter, metrics) on a requests Session with keep-alive, so the
+blocking HTTP calls run on the loop's thread pool. Each tool bounds its
+own share with `slots()`, and the pool bounds the process. Streamed
+bodies (stream=True) are read on the same pool thread that fetched
+them, inside the callable passed to `call()`.
+"""
+
+import asyncio
+import atexit
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+FETCH_THREADS = 32  # blocking fetches in flight across the whole process
+
+_lock = threading.Lock()
+_loop: Optional["FetchLoop"] = None
+
+
+class FetchLoop:
+    """Background event loop with a bounded pool for blocking fetch calls."""
+
+    def __init__(self, threads: int = FETCH_THREADS):
+        self.threads = threads
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="fetch")
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fetch-loop", daemon=True)
+        self._thread.start()
+
+    def slots(self, concurrency: int) -> asyncio.Semaphore:
+        """A limit on how many of one tool's calls run at once."""
+        return asyncio.Semaphore(max(1, concurrency))
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedule a coroutine on the loop; returns a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the loop and wait for its result.
+
+        If the wait is interrupted (e.g. by Ctrl-C), the coroutine is
+        cancelled too, and the caller waits for its cleanup (finally
+        blocks, which may still await) to finish before the interrupt
+        propagates, so it never races the caller's own teardown.
+        """
+        finished = threading.Event()
+        tasks: list[asyncio.Task] = []
+
+        def start() -> None:
+            task = asyncio.ensure_future(coro)
+            task.add_done_callback(lambda _: finished.set())
+            tasks.append(task)
+
+        # Callbacks run in order, so the task exists before any cancel below
+        self._loop.call_soon_threadsafe(start)
+        try:
+            finished.wait()
+        except BaseException:
+            self._loop.call_soon_threadsafe(lambda: tasks[0].cancel())
+            finished.wait()
+            raise
+        return tasks[0].result()
+
+    async def call(self, slots: asyncio.Semaphore, fn: Callable, *args) -> Any:
+        """Run a blocking callable (a fetch, a download) on the pool, within `slots`."""
+        async with slots:
+            return await self._loop.run_in_executor(None, fn, *args)
+
+    def close(self) -> None:
+        """Cancel what is still scheduled and stop the loop and its pool."""
+        if self._loop.is_closed():
+            return
+        self.run(self._cancel_pending())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._loop.close()
+
+    async def _cancel_pending(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def fetch_loop() -> FetchLoop:
+    """The process-wide fetch loop, started on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = FetchLoop()
+        return _loop
+
+
+@atexit.register
+def _close_fetch_loop() -> None:
+    if _loop is not None:
+        _loop.close()
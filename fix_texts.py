@@ -1,16 +1,37 @@
+import argparse
+import asyncio
 import sqlite3
 import requests
-from bs4 import BeautifulSoup
-import time
+
+from fetcher import Fetcher
+from fetchloop import fetch_loop
+from http_cache import CACHE_DIR, ResponseCache
+from metrics import TimingAdapter
+from parsers import find_fragments, fragment_text, parse_page
+from ratelimit import AdaptiveRateLimiter
+from readmodel import refresh_read_model
 
 BASE_URL = "http://kob.this.is/klingogbang/"
 HEADERS = {
     "User-Agent": "KlingBangArchiveScraper/1.0 (Historical archive project)",
 }
+BATCH_SIZE = 25  # exhibitions per commit
+REQUEST_DELAY = 0.5  # starting seconds between requests; the limiter adapts
 
-def fix_exhibition_texts():
-    # Use 30s timeout to avoid locking issues with highres scraper
-    conn = sqlite3.connect('kob_archive.db', timeout=30)
+def flush_updates(conn, updates):
+    # One short write transaction per batch keeps the lock free for other tools
+    if updates:
+        conn.executemany("""
+            UPDATE exhibitions 
+            SET description_is = ?, description_en = ?
+            WHERE id = ?
+        """, updates)
+        conn.commit()
+        updates.clear()
+
+def fix_exhibition_texts(cache=None, workers=2, db_path='kob_archive.db'):
+    # Busy timeout covers the scrapers' batch commits; writes here are batched too
+    conn = sqlite3.connect(db_path, timeout=30)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
@@ -19,47 +40,55 @@ def fix_exhibition_texts():
     exhibitions = cursor.fetchall()
     
     print(f"Fixing texts for {len(exhibitions)} exhibitions...")
+    updates = []
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = TimingAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    fetcher = Fetcher(session, cache, limiter=AdaptiveRateLimiter.from_delay(REQUEST_DELAY), timeout=10)
 
-    for ex in exhibitions:
-        ex_db_id = ex['id']
-        ex_id = ex['exhibition_id']
-        
-        # 1. Fetch Icelandic
-        url_is = f"{BASE_URL}archive_view.php?id={ex_id}"
-        desc_is = fetch_text(url_is)
+    # Both languages of every exhibition are fetched on the shared fetch
+    # loop, `workers` pages at a time; results are written in order
+    loop = fetch_loop()
+    slots = loop.slots(workers)
+    futures = [loop.submit(fetch_texts(ex['exhibition_id'], fetcher, loop, slots)) for ex in exhibitions]
+
+    for ex, future in zip(exhibitions, futures):
+        desc_is, desc_en = future.result()
         
-        # 2. Fetch English
-        url_en = f"{BASE_URL}archive_view.php?id={ex_id}&lang=en"
-        desc_en = fetch_text(url_en)
-        
-        # Update DB
-        cursor.execute("""
-            UPDATE exhibitions 
-            SET description_is = ?, description_en = ?
-            WHERE id = ?
-        """, (desc_is, desc_en, ex_db_id))
-        conn.commit()
+        # Queue DB update
+        updates.append((desc_is, desc_en, ex['id']))
+        if len(updates) >= BATCH_SIZE:
+            flush_updates(conn, updates)
         
         print(f"  Fixed '{ex['title_is']}': IS({len(desc_is or '')}), EN({len(desc_en or '')})")
-        time.sleep(0.5)
 
+    flush_updates(conn, updates)
     conn.close()
     print("\nText fix complete!")
 
-def fetch_text(url):
+async def fetch_texts(ex_id, fetcher, loop, slots):
+    # Icelandic and English pages in parallel
+    url_is = f"{BASE_URL}archive_view.php?id={ex_id}"
+    url_en = f"{BASE_URL}archive_view.php?id={ex_id}&lang=en"
+    return await asyncio.gather(
+        loop.call(slots, fetch_text, url_is, fetcher),
+        loop.call(slots, fetch_text, url_en, fetcher),
+    )
+
+def fetch_text(url, fetcher):
     try:
-        resp = requests.get(url, timeout=10)
+        resp = fetcher.get(url)
         resp.encoding = 'iso-8859-1'
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        page = parse_page(resp.text)
         
-        text_cells = soup.find_all(class_='arc_view_text')
+        text_cells = find_fragments(page, 'arc_view_text')
         
         parts = []
         for cell in text_cells:
-            for s in cell(['script', 'style']):
-                s.decompose()
-                
-            text = cell.get_text(separator='\n', strip=True)
+            # script/style contents are never collected by the parser
+            text = fragment_text(cell['strings'], '\n')
             if text and text != '\xa0' and len(text) > 1:
                 parts.append(text)
         
@@ -69,4 +98,12 @@ def fetch_text(url):
         return ""
 
 if __name__ == "__main__":
-    fix_exhibition_texts()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Re-fetch missing exhibition descriptions")
+    parser.add_argument('--db', default='kob_archive.db', help='Database path')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='HTTP response cache directory')
+    parser.add_argument('--offline', action='store_true', help='Parse pages from the cache only')
+    parser.add_argument('--workers', type=int, default=2, help='Pages fetched in parallel')
+    args = parser.parse_args()
+    fix_exhibition_texts(ResponseCache(args.cache_dir, offline=args.offline), max(1, args.workers), args.db)
+    # Descriptions feed the website's exhibition list
+    refresh_read_model(args.db)
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""Persistent crawl frontier shared by the scrapers.
+
+Every page a crawl has to fetch is a row in crawl_frontier, keyed by
+(kind, url). Fetchers lease pending rows, and mark each one done once
+its results are committed, or failed with a retry time. An interrupted
+crawl therefore resumes where it stopped: finished pages are never
+requested again, and rows leased by a process that died become
+available again once the lease expires.
+
+Leasing is a single UPDATE ... RETURNING statement, so any number of
+processes can drain the same frontier without taking the same row.
+
+Kinds used:
+    year          archive_list.php for one year      -> exhibition
+    exhibition    archive_view.php (plus &lang=en)
+    gallery       exhibition page scanned for image_view links -> image_view
+    image_view    full-resolution image page
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+from database import get_connection
+
+LEASE_SECONDS = 600  # a worker that holds a row longer than this is presumed dead
+MAX_ATTEMPTS = 5
+RETRY_BASE = 30.0  # seconds before the first retry; doubled per attempt
+RETRY_MAX = 6 * 3600.0
+
+_UNFINISHED = "state = 'pending' OR state = 'leased'"
+_YEAR_SCOPE = "CAST(json_extract(payload, '$.year') AS INTEGER) BETWEEN ? AND ?"
+
+
+class CrawlFrontier:
+    """Queue of pages to fetch, persisted in the archive database."""
+
+    def __init__(self, db_path: str = "kob_archive.db", owner: Optional[str] = None):
+        self.db_path = db_path
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = get_connection(db_path)  # waits out other writers (database.BUSY_TIMEOUT)
+
+    def __enter__(self) -> "CrawlFrontier":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def add(
+        self,
+        kind: str,
+        entries: Iterable[tuple[str, dict]],
+        reset: tuple[str, ...] = ()
+    ) -> None:
+        """Queue (url, payload) entries of one kind.
+
+        URLs already in the frontier keep their state, except rows in one
+        of the `reset` states, which go back to pending with a fresh
+        attempt count and payload.
+        """
+        self._insert(kind, entries, reset)
+        self._conn.commit()
+
+    def _insert(self, kind: str, entries: Iterable[tuple[str, dict]], reset: tuple[str, ...]) -> None:
+        rows = [(kind, url, json.dumps(payload)) for url, payload in entries]
+        if not rows:
+            return
+        if reset:
+            placeholders = ','.join('?' * len(reset))
+            self._conn.executemany(f"""
+                INSERT INTO crawl_frontier (kind, url, payload) VALUES (?, ?, ?)
+                ON CONFLICT (kind, url) DO UPDATE SET
+                    payload = excluded.payload, state = 'pending', attempts = 0,
+                    next_retry_at = NULL, last_error = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE state IN ({placeholders})
+            """, [row + reset for row in rows])
+        else:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO crawl_frontier (kind, url, payload) VALUES (?, ?, ?)", rows
+            )
+
+    def lease(
+        self,
+        kind: str,
+        limit: int = 1,
+        years: Optional[tuple[int, int]] = None
+    ) -> list[dict]:
+        """Claim up to `limit` due rows of a kind for this process.
+
+        Pending rows whose retry time has passed are eligible, as are rows
+        whose lease expired. Each claimed row comes back as a dict with
+        id, url, attempts and the decoded payload.
+        """
+        now = time.time()
+        scope, params = self._scope(years)
+        cursor = self._conn.execute(f"""
+            UPDATE crawl_frontier SET
+                state = 'leased', lease_owner = ?, lease_expires_at = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM crawl_frontier
+                WHERE kind = ? {scope}
+                  AND ((state = 'pending' AND (next_retry_at IS NULL OR next_retry_at <= ?))
+                       OR (state = 'leased' AND lease_expires_at < ?))
+                ORDER BY id
+                LIMIT ?
+            )
+            RETURNING id, url, attempts, payload
+        """, (self.owner, now + LEASE_SECONDS, kind, *params, now, now, limit))
+        rows = cursor.fetchall()
+        self._conn.commit()
+        tasks = [
+            {'id': row['id'], 'url': row['url'], 'attempts': row['attempts'],
+             'payload': json.loads(row['payload']) if row['payload'] else {}}
+            for row in rows
+        ]
+        return sorted(tasks, key=lambda task: task['id'])
+
+    def complete(self, task_id: int, children: Optional[tuple[str, list, tuple]] = None) -> None:
+        """Mark a leased row done.
+
+        `children` is an optional (kind, entries, reset) triple queued in the
+        same transaction, so a listing page is never done without the pages
+        it links to.
+        """
+        if children:
+            self._insert(*children)
+        self._conn.execute("""
+            UPDATE crawl_frontier SET state = 'done', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (task_id,))
+        self._conn.commit()
+
+    def complete_url(
+        self,
+        kind: str,
+        url: str,
+        payload: dict,
+        children: Optional[tuple[str, list, tuple]] = None
+    ) -> None:
+        """Record a page fetched outside the frontier as done.
+
+        The row is added if it is not there yet. `children` are queued in
+        the same transaction, as with complete().
+        """
+        if children:
+            self._insert(*children)
+        self._insert(kind, [(url, payload)], ())
+        complete_urls(self._conn, kind, [url])
+        self._conn.commit()
+
+    def fail(self, task_id: int, error: str) -> bool:
+        """Record a failed fetch; returns True if the row will be retried.
+
+        Retries back off exponentially from RETRY_BASE; after MAX_ATTEMPTS
+        the row is left in the failed state.
+        """
+        row = self._conn.execute(
+            "SELECT attempts FROM crawl_frontier WHERE id = ?", (task_id,)
+        ).fetchone()
+        attempts = (row['attempts'] if row else 0) + 1
+        retry = attempts < MAX_ATTEMPTS
+        delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+        self._conn.execute("""
+            UPDATE crawl_frontier SET
+                state = ?, attempts = ?, next_retry_at = ?, last_error = ?,
+                lease_owner = NULL, lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, ('pending' if retry else 'failed', attempts,
+              time.time() + delay if retry else None, error, task_id))
+        self._conn.commit()
+        return retry
+
+    def release(self) -> int:
+        """Hand this process's unfinished leases back without counting an attempt."""
+        cursor = self._conn.execute("""
+            UPDATE crawl_frontier SET state = 'pending', lease_owner = NULL,
+                lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE state = 'leased' AND lease_owner = ?
+        """, (self.owner,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def unfinished(self, kinds: tuple[str, ...], years: Optional[tuple[int, int]] = None) -> int:
+        """Count pending and leased rows of the given kinds."""
+        scope, params = self._scope(years)
+        placeholders = ','.join('?' * len(kinds))
+        return self._conn.execute(f"""
+            SELECT COUNT(*) FROM crawl_frontier
+            WHERE kind IN ({placeholders}) AND ({_UNFINISHED}) {scope}
+        """, (*kinds, *params)).fetchone()[0]
+
+    def failed(self, kinds: tuple[str, ...], years: Optional[tuple[int, int]] = None) -> int:
+        """Count rows of the given kinds that ran out of attempts."""
+        scope, params = self._scope(years)
+        placeholders = ','.join('?' * len(kinds))
+        return self._conn.execute(f"""
+            SELECT COUNT(*) FROM crawl_frontier
+            WHERE kind IN ({placeholders}) AND state = 'failed' {scope}
+        """, (*kinds, *params)).fetchone()[0]
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Row counts by kind and state."""
+        counts: dict[str, dict[str, int]] = {}
+        for row in self._conn.execute(
+            "SELECT kind, state, COUNT(*) FROM crawl_frontier GROUP BY kind, state"
+        ):
+            counts.setdefault(row[0], {})[row[1]] = row[2]
+        return counts
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @staticmethod
+    def _scope(years: Optional[tuple[int, int]]) -> tuple[str, tuple]:
+        if not years:
+            return "", ()
+        return f"AND {_YEAR_SCOPE}", years
+
+
+def complete_urls(conn: sqlite3.Connection, kind: str, urls: list[str]) -> None:
+    """Mark rows done on the caller's connection, inside its transaction.
+
+    Used by the exhibition writer so that a page is only done once the
+    data scraped from it is committed.
+    """
+    conn.executemany("""
+        UPDATE crawl_frontier SET state = 'done', lease_owner = NULL, lease_expires_at = NULL,
+            last_error = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE kind = ? AND url = ?
+    """, [(kind, url) for url in urls])
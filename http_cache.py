@@ -0,0 +1,189 @@
+"""On-disk HTTP response cache shared by the archive fetchers.
+
+Entries are keyed by URL and point at bodies stored by content hash, so
+the same page fetched by the scraper, the high-res scraper and fix_texts.py
+is downloaded once and revalidated with conditional GETs afterwards.
+
+Layout under the cache directory:
+    meta/<sha256(url)[:2]>/<sha256(url)>.json   status, headers, validators, fetch time
+    bodies/<sha256(body)[:2]>/<sha256(body)>     raw response body
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = ".http_cache"
+CACHEABLE_TYPES = ("text/html",)
+
+
+class CacheMiss(requests.exceptions.RequestException):
+    """Raised in offline mode when a URL has never been cached."""
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the cache."""
+
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes, fetched_at: str):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.fetched_at = fetched_at
+        self.encoding = 'iso-8859-1'
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def raise_for_status(self) -> None:
+        """Cached entries are always successful responses."""
+
+
+class ResponseCache:
+    """Content-addressed response cache with ETag/Last-Modified revalidation."""
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        offline: bool = False,
+        max_age: float = 0
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.offline = offline
+        self.max_age = max_age  # seconds an entry is served without revalidating
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _meta_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / "meta" / key[:2] / f"{key}.json"
+
+    def _body_path(self, digest: str) -> Path:
+        return self.cache_dir / "bodies" / digest[:2] / digest
+
+    def lookup(self, url: str) -> Optional[tuple[dict, bytes]]:
+        """Return the cached (meta, body) for a URL, if present and intact."""
+        try:
+            meta = json.loads(self._meta_path(url).read_text(encoding='utf-8'))
+            body = self._body_path(meta['body_sha256']).read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta, body
+
+    def _store(self, url: str, response) -> None:
+        """Store a successful response body and its validators."""
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not body_path.exists():
+            _write_atomic(body_path, body)
+        self._write_meta(url, response.status_code, response.headers, digest)
+
+    def _write_meta(self, url: str, status_code: int, headers, digest: str) -> None:
+        headers = CaseInsensitiveDict(headers)
+        meta = {
+            'url': url,
+            'status_code': status_code,
+            'headers': dict(headers),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched_at': datetime.now().isoformat(),
+            'body_sha256': digest,
+        }
+        _write_atomic(self._meta_path(url), json.dumps(meta).encode('utf-8'))
+
+    def get(
+        self,
+        session,
+        url: str,
+        timeout: float = 30,
+        throttle: Optional[Callable[[], object]] = None,
+        stream: bool = False
+    ):
+        """GET a URL through the cache.
+
+        `throttle` is called only when the request actually goes to the
+        network. With `stream=True`, uncacheable responses (images) are
+        returned with their body unread. Raises requests exceptions like
+        `session.get()` would, and CacheMiss for uncached URLs in offline mode.
+        """
+        cached = self.lookup(url)
+
+        if cached:
+            meta, body = cached
+            age = time.time() - datetime.fromisoformat(meta['fetched_at']).timestamp()
+            if self.offline or age < self.max_age:
+                self._count('hits')
+                return _from_cache(url, meta, body)
+        elif self.offline:
+            self._count('misses')
+            raise CacheMiss(f"{url} is not in the cache (offline mode)")
+
+        headers = {}
+        if cached:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        if throttle:
+            throttle()
+        response = session.get(url, headers=headers, timeout=timeout, stream=stream)
+
+        if cached and response.status_code == 304:
+            self._count('revalidated')
+            # Refresh validators and fetch time; the body is unchanged
+            headers = CaseInsensitiveDict(meta['headers'])
+            headers.update(response.headers)
+            self._write_meta(url, meta['status_code'], headers, meta['body_sha256'])
+            return _from_cache(url, {**meta, 'headers': dict(headers)}, body)
+
+        response.raise_for_status()
+        self._count('misses')
+        content_type = response.headers.get('Content-Type', '')
+        if any(content_type.startswith(t) for t in CACHEABLE_TYPES):
+            self._store(url, response)
+        return response
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+
+def cached_get(
+    session,
+    url: str,
+    cache: Optional[ResponseCache] = None,
+    timeout: float = 30,
+    throttle: Optional[Callable[[], object]] = None,
+    stream: bool = False
+):
+    """GET a URL through `cache` if given, otherwise straight from the network."""
+    if cache:
+        return cache.get(session, url, timeout=timeout, throttle=throttle, stream=stream)
+    if throttle:
+        throttle()
+    response = session.get(url, timeout=timeout, stream=stream)
+    response.raise_for_status()
+    return response
+
+
+def _from_cache(url: str, meta: dict, body: bytes) -> CachedResponse:
+    return CachedResponse(url, meta['status_code'], meta['headers'], body, meta['fetched_at'])
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file via a temp name and rename, safe across threads and processes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
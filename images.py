@@ -1,7 +1,11 @@
 """Image download and management for Kling & Bang archive."""
 
+import hashlib
+import mmap
 import os
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -9,12 +13,35 @@ from urllib.parse import urlparse
 
 import requests
 
-from database import get_connection
+from blobstore import BlobStore
+from database import get_connection, shared_connection
+from fetcher import Fetcher
+from fetchloop import fetch_loop
+from metrics import RunMetrics, TimingAdapter
+from probe import check_complete, probe_file
+from ratelimit import AdaptiveRateLimiter
 
 HEADERS = {
     "User-Agent": "KlingBangArchiveScraper/1.0 (Historical archive project)",
 }
-REQUEST_DELAY = 0.5  # seconds between image downloads
+REQUEST_DELAY = 0.5  # starting seconds between image downloads; the limiter adapts
+UPDATE_BATCH_SIZE = 50  # image rows per commit in concurrent mode
+VERIFY_WORKERS = 8
+HASH_MISMATCH = "content hash mismatch"
+QUARANTINE_DIR = 'quarantine'  # under images_dir; damaged-looking files are moved here
+
+UPDATE_DOWNLOADED_SQL = """
+    UPDATE images SET
+        local_path = ?,
+        file_size = ?,
+        mime_type = ?,
+        width = ?,
+        height = ?,
+        downloaded_at = ?,
+        content_hash = ?,
+        etag = ?
+    WHERE id = ?
+"""
 
 
 class ImageDownloader:
@@ -24,15 +51,28 @@ class ImageDownloader:
         self,
         db_path: str = "kob_archive.db",
         images_dir: str = "images",
-        delay: float = REQUEST_DELAY
+        delay: float = REQUEST_DELAY,
+        workers: int = 1,
+        max_rps: Optional[float] = None,
+        min_rps: Optional[float] = None,
+        metrics: Optional[RunMetrics] = None
     ):
         self.db_path = db_path
         self.images_dir = Path(images_dir)
         self.delay = delay
+        self.workers = max(1, workers)
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(delay, max_rps, min_rps)
+        self.metrics = metrics or RunMetrics('images')
+        self.blobs = BlobStore(images_dir)
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
+        # One connection per worker, all kept alive to the same host
+        adapter = TimingAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.fetcher = Fetcher(self.session, limiter=self.rate_limiter, metrics=self.metrics)
 
-    def _get_local_path(self, year: int, exhibition_id: int, filename: str) -> Path:
+    def get_local_path(self, year: int, exhibition_id: int, filename: str) -> Path:
         """Generate local path for an image."""
         # Sanitize filename
         safe_filename = "".join(
@@ -41,28 +81,39 @@ class ImageDownloader:
         return self.images_dir / str(year) / str(exhibition_id) / safe_filename
 
     def download_image(self, url: str, local_path: Path) -> Optional[dict]:
-        """Download a single image and return metadata."""
-        try:
-            time.sleep(self.delay)
-            response = self.session.get(url, timeout=30, stream=True)
-            response.raise_for_status()
-
-            # Create directory if needed
-            local_path.parent.mkdir(parents=True, exist_ok=True)
+        """Download a single image into the blob store and return metadata.
 
-            # Write image
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+        `local_path` becomes a hardlink to the blob. If the response's
+        ETag/length identify bytes already held, the body is not read.
+        """
+        try:
+            response = self.fetcher.get(url, stream=True)
 
-            # Get metadata
-            file_size = local_path.stat().st_size
             content_type = response.headers.get('Content-Type', '')
+            etag = response.headers.get('ETag')
+
+            digest = self.blobs.match_hint(response.headers)
+            if digest:
+                response.close()
+                file_size = self.blobs.blob_path(digest).stat().st_size
+            else:
+                with self.metrics.timer('download'):
+                    digest, file_size, _ = self.blobs.ingest(response)
+                self.metrics.count('bytes', file_size)
+                self.blobs.remember(etag, digest, file_size)
+            self.blobs.link(digest, local_path)
+            # Format and dimensions from the file header; no decode
+            with self.metrics.timer('parse'):
+                info = probe_file(self.blobs.blob_path(digest)) or {}
 
             return {
                 'file_size': file_size,
-                'mime_type': content_type,
+                'mime_type': info.get('mime_type') or content_type,
+                'width': info.get('width'),
+                'height': info.get('height'),
                 'downloaded_at': datetime.now().isoformat(),
+                'content_hash': digest,
+                'etag': etag,
             }
 
         except requests.exceptions.RequestException as e:
@@ -74,7 +125,7 @@ class ImageDownloader:
 
     def download_exhibition_images(self, exhibition_db_id: int) -> dict:
         """Download all images for an exhibition."""
-        conn = get_connection(self.db_path)
+        conn = shared_connection(self.db_path)
         cursor = conn.cursor()
 
         # Get exhibition info
@@ -84,11 +135,11 @@ class ImageDownloader:
         )
         exhibition = cursor.fetchone()
         if not exhibition:
-            conn.close()
             return {'downloaded': 0, 'failed': 0, 'skipped': 0}
 
         year = exhibition['year']
         ex_id = exhibition['exhibition_id']
+        self.blobs.load_hints(conn)
 
         # Get images that haven't been downloaded
         cursor.execute("""
@@ -101,45 +152,36 @@ class ImageDownloader:
         stats = {'downloaded': 0, 'failed': 0, 'skipped': 0}
 
         for img in images:
-            local_path = self._get_local_path(year, ex_id, img['filename'])
+            local_path = self.get_local_path(year, ex_id, img['filename'])
 
             # Skip if file already exists
             if local_path.exists():
-                cursor.execute(
-                    "UPDATE images SET local_path = ? WHERE id = ?",
-                    (str(local_path), img['id'])
-                )
-                conn.commit()
+                with self.metrics.timer('db_write'):
+                    cursor.execute(
+                        "UPDATE images SET local_path = ? WHERE id = ?",
+                        (str(local_path), img['id'])
+                    )
+                    conn.commit()
                 stats['skipped'] += 1
                 continue
 
             # Download
             metadata = self.download_image(img['original_url'], local_path)
             if metadata:
-                cursor.execute("""
-                    UPDATE images SET
-                        local_path = ?,
-                        file_size = ?,
-                        mime_type = ?,
-                        downloaded_at = ?
-                    WHERE id = ?
-                """, (
-                    str(local_path),
-                    metadata['file_size'],
-                    metadata['mime_type'],
-                    metadata['downloaded_at'],
-                    img['id']
-                ))
-                conn.commit()
+                with self.metrics.timer('db_write'):
+                    cursor.execute(UPDATE_DOWNLOADED_SQL, downloaded_row(local_path, metadata, img['id']))
+                    conn.commit()
                 stats['downloaded'] += 1
             else:
                 stats['failed'] += 1
 
-        conn.close()
         return stats
 
     def download_all_images(self) -> dict:
         """Download all images that haven't been downloaded yet."""
+        if self.workers > 1:
+            return self._download_concurrent()
+
         conn = get_connection(self.db_path)
         cursor = conn.cursor()
 
@@ -168,6 +210,9 @@ class ImageDownloader:
 
     def download_year_images(self, year: int) -> dict:
         """Download all images for a specific year."""
+        if self.workers > 1:
+            return self._download_concurrent(year)
+
         conn = get_connection(self.db_path)
         cursor = conn.cursor()
 
@@ -190,35 +235,277 @@ class ImageDownloader:
 
         return total_stats
 
-    def verify_images(self) -> dict:
-        """Verify all downloaded images exist on disk."""
+    def _download_concurrent(self, year: Optional[int] = None) -> dict:
+        """Download pending images on the shared fetch loop, batching DB updates.
+
+        At most `workers` downloads run at once (see fetchloop.py); rows
+        are updated from this thread only, UPDATE_BATCH_SIZE at a time in
+        one transaction.
+        """
         conn = get_connection(self.db_path)
         cursor = conn.cursor()
-
-        cursor.execute("SELECT id, local_path FROM images WHERE local_path IS NOT NULL")
+        cursor.execute(f"""
+            SELECT i.id, i.original_url, i.filename,
+                   e.id AS exhibition_db_id, e.exhibition_id, e.year
+            FROM images i
+            JOIN exhibitions e ON e.id = i.exhibition_id
+            WHERE i.local_path IS NULL {'AND e.year = ?' if year else ''}
+            ORDER BY e.year DESC, e.id, i.id
+        """, (year,) if year else ())
         images = cursor.fetchall()
+        self.blobs.load_hints(conn)
 
-        stats = {'valid': 0, 'missing': 0}
-        missing_ids = []
-
+        total_stats = {'downloaded': 0, 'failed': 0, 'skipped': 0}
+        ex_stats = defaultdict(lambda: {'downloaded': 0, 'failed': 0, 'skipped': 0})
+        remaining = defaultdict(int)
+        exhibitions = {}
         for img in images:
-            if Path(img['local_path']).exists():
-                stats['valid'] += 1
-            else:
-                stats['missing'] += 1
-                missing_ids.append(img['id'])
+            remaining[img['exhibition_db_id']] += 1
+            exhibitions[img['exhibition_db_id']] = img
+        print(f"Downloading {len(images)} images for {len(exhibitions)} exhibitions "
+              f"with {self.workers} workers...")
+
+        downloaded_rows: list[tuple] = []
+        skipped_rows: list[tuple] = []
+        finished = 0
+
+        def record(img, key: str) -> None:
+            nonlocal finished
+            total_stats[key] += 1
+            ex_id = img['exhibition_db_id']
+            ex_stats[ex_id][key] += 1
+            remaining[ex_id] -= 1
+            if remaining[ex_id] == 0:
+                finished += 1
+                ex = exhibitions[ex_id]
+                stats = ex_stats.pop(ex_id)
+                print(f"[{finished}/{len(exhibitions)}] Exhibition {ex['exhibition_id']} ({ex['year']})... "
+                      f"downloaded={stats['downloaded']}, failed={stats['failed']} "
+                      f"(total {sum(total_stats.values())}/{len(images)})")
+            if len(downloaded_rows) + len(skipped_rows) >= UPDATE_BATCH_SIZE:
+                flush_updates(conn, downloaded_rows, skipped_rows, self.metrics)
+
+        loop = fetch_loop()
+        slots = loop.slots(self.workers)
+        futures = {}
+        try:
+            for img in images:
+                local_path = self.get_local_path(img['year'], img['exhibition_id'], img['filename'])
+                if local_path.exists():
+                    skipped_rows.append((str(local_path), img['id']))
+                    record(img, 'skipped')
+                    continue
+                future = loop.submit(loop.call(slots, self.download_image, img['original_url'], local_path))
+                futures[future] = (img, local_path)
+
+            for future in as_completed(futures):
+                img, local_path = futures[future]
+                metadata = future.result()
+                if metadata:
+                    downloaded_rows.append(downloaded_row(local_path, metadata, img['id']))
+                    record(img, 'downloaded')
+                else:
+                    record(img, 'failed')
+        finally:
+            for future in futures:
+                future.cancel()
+            flush_updates(conn, downloaded_rows, skipped_rows, self.metrics)
+            conn.close()
+
+        return total_stats
+
+    def verify_images(self, deep: bool = False, workers: int = VERIFY_WORKERS) -> dict:
+        """Verify all downloaded images exist on disk.
+
+        With `deep`, every file is also read in full on a thread pool:
+        its size and SHA-256 are checked against file_size and
+        content_hash, and files without a stored hash have their structure
+        (header plus end marker) validated instead. Missing, truncated and
+        corrupt files are queued for re-download by clearing local_path.
+        """
+        conn = get_connection(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT id, local_path, file_size, content_hash FROM images
+            WHERE local_path IS NOT NULL
+        """)
+        images = cursor.fetchall()
 
-        # Clear local_path for missing images so they can be re-downloaded
-        if missing_ids:
+        if deep:
+            stats, bad_ids = self._verify_deep(images, workers)
+        else:
+            stats = {'valid': 0, 'missing': 0}
+            bad_ids = []
+            for img in images:
+                if Path(img['local_path']).exists():
+                    stats['valid'] += 1
+                else:
+                    stats['missing'] += 1
+                    bad_ids.append(img['id'])
+
+        # Clear local_path for missing or damaged images so they can be re-downloaded
+        if bad_ids:
             cursor.executemany(
                 "UPDATE images SET local_path = NULL WHERE id = ?",
-                [(id,) for id in missing_ids]
+                [(id,) for id in bad_ids]
             )
             conn.commit()
 
         conn.close()
         return stats
 
+    def _verify_deep(self, images: list, workers: int) -> tuple[dict, list[int]]:
+        """Check every file's bytes; returns stats and the ids to re-download.
+
+        Hardlinked copies of one blob share an inode and are read once.
+        Files proven bad (wrong size or content hash) are removed, together
+        with their blob when it is the same file, so neither the "already
+        exists" shortcut nor an ETag hint can link the bad bytes back into
+        place. Files that only fail the structural check, with no hash to
+        prove them wrong, are moved to QUARANTINE_DIR instead, and their
+        blob is kept.
+        """
+        stats = {'valid': 0, 'missing': 0, 'truncated': 0, 'corrupt': 0, 'bytes': 0, 'seconds': 0.0}
+        bad_ids = []
+        by_inode = defaultdict(list)
+        for img in images:
+            try:
+                st = os.stat(img['local_path'])
+            except OSError:
+                stats['missing'] += 1
+                bad_ids.append(img['id'])
+                continue
+            by_inode[(st.st_dev, st.st_ino)].append(img)
+
+        print(f"Verifying {len(by_inode)} files ({len(images)} images) on {workers} threads...")
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(check_image_file, rows[0]['local_path'],
+                            rows[0]['file_size'], rows[0]['content_hash']): rows
+                for rows in by_inode.values()
+            }
+            for future in as_completed(futures):
+                rows = futures[future]
+                status, problem, size = future.result()
+                stats['bytes'] += size
+                stats[status] += len(rows)
+                if status == 'valid':
+                    continue
+                print(f"  {status.capitalize()}: {rows[0]['local_path']} ({problem})")
+                bad_ids.extend(row['id'] for row in rows)
+                if status == 'truncated' or problem == HASH_MISMATCH:
+                    self._discard(rows)
+                else:
+                    self._quarantine(rows)
+        stats['seconds'] = time.monotonic() - start
+        return stats, bad_ids
+
+    def _discard(self, rows: list) -> None:
+        """Remove a damaged file and every hardlink to it that the rows name."""
+        paths = {Path(row['local_path']) for row in rows}
+        digests = {row['content_hash'] for row in rows if row['content_hash']}
+        for digest in digests:
+            blob = self.blobs.blob_path(digest)
+            try:
+                if blob.samefile(next(iter(paths))):
+                    paths.add(blob)
+            except OSError:
+                pass
+        for path in paths:
+            try:
+                path.unlink()
+            except OSError as e:
+                print(f"  Could not remove {path}: {e}")
+
+    def _quarantine(self, rows: list) -> None:
+        """Move a suspect file's links out of place, keeping the bytes."""
+        quarantine = self.images_dir / QUARANTINE_DIR
+        for path in {Path(row['local_path']) for row in rows}:
+            try:
+                target = quarantine / path.relative_to(self.images_dir)
+            except ValueError:
+                target = quarantine / path.name
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(path, target)
+            except OSError as e:
+                print(f"  Could not quarantine {path}: {e}")
+
+
+def check_image_file(
+    path: str,
+    expected_size: Optional[int] = None,
+    expected_hash: Optional[str] = None
+) -> tuple[str, Optional[str], int]:
+    """Read one image file in full and check it.
+
+    The file is memory-mapped and hashed in a single call, which lets
+    hashlib release the GIL so threads verify in parallel. Returns
+    (status, problem, bytes read) with status 'valid', 'missing',
+    'truncated' (size disagrees with the database) or 'corrupt' (hash
+    mismatch, damaged header or missing end marker). A file matching
+    `expected_hash` is valid as it is: those are the bytes the server
+    sent, so the structural check, which can trip on harmless trailing
+    bytes, is only used when there is no hash.
+    """
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 'truncated', "empty file", 0
+            if expected_size is not None and size != expected_size:
+                return 'truncated', f"{size} of {expected_size} bytes", size
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if expected_hash:
+                    if hashlib.sha256(data).hexdigest() != expected_hash:
+                        return 'corrupt', HASH_MISMATCH, size
+                    return 'valid', None, size
+                problem = check_complete(data)
+    except FileNotFoundError:
+        return 'missing', "file not found", 0
+    except OSError as e:
+        return 'corrupt', str(e), 0
+    if problem:
+        return 'corrupt', problem, size
+    return 'valid', None, size
+
+
+def downloaded_row(local_path: Path, metadata: dict, image_id: int) -> tuple:
+    """Build the UPDATE_DOWNLOADED_SQL parameters for a downloaded image."""
+    return (
+        str(local_path),
+        metadata['file_size'],
+        metadata['mime_type'],
+        metadata['width'],
+        metadata['height'],
+        metadata['downloaded_at'],
+        metadata['content_hash'],
+        metadata['etag'],
+        image_id
+    )
+
+
+def flush_updates(
+    conn,
+    downloaded_rows: list[tuple],
+    skipped_rows: list[tuple],
+    metrics: Optional[RunMetrics] = None
+) -> None:
+    """Apply queued image row updates in one transaction."""
+    if not downloaded_rows and not skipped_rows:
+        return
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.executemany(UPDATE_DOWNLOADED_SQL, downloaded_rows)
+    cursor.executemany("UPDATE images SET local_path = ? WHERE id = ?", skipped_rows)
+    conn.commit()
+    if metrics:
+        metrics.add_time('db_write', time.perf_counter() - start)
+    downloaded_rows.clear()
+    skipped_rows.clear()
+
 
 if __name__ == "__main__":
     downloader = ImageDownloader()
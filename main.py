@@ -3,54 +3,134 @@
 Kling & Bang Gallery Archive Scraper
 
 Usage:
-    python main.py scrape [--year YEAR] [--start-year YEAR] [--end-year YEAR]
-    python main.py images [--year YEAR]
-    python main.py export [--output FILE]
-    python main.py stats
+    python main.py scrape [--year YEAR] [--start-year YEAR] [--end-year YEAR] [--workers N]
+    python main.py images [--year YEAR] [--workers N]
+    python main.py sync [--year YEAR] [--start-year YEAR] [--end-year YEAR] [--workers N]
+    python main.py probe [--all] [--workers N]
+    python main.py derivatives [--widths 320,800,1600] [--formats webp,jpeg] [--workers N]
+    python main.py reparse [--workers N]
+    python main.py build-readmodel
+    python main.py export [--output FILE] [--ndjson] [--compact] [--gzip]
+    python main.py search QUERY [--limit N]
+    python main.py stats [--runs] [--limit N]
     python main.py test
 
 Examples:
     python main.py scrape                    # Scrape all years (2003-2025)
     python main.py scrape --year 2024        # Scrape single year
     python main.py scrape --start-year 2020  # Scrape 2020-2025
+    python main.py scrape --workers 4 --max-rps 4  # Crawl with 4 threads, at most 4 req/s
+    python main.py --offline scrape          # Re-parse cached pages, no network
+    python main.py scrape --refresh          # Update exhibitions whose pages changed
+    python main.py scrape                    # (again after Ctrl-C: resumes, no page fetched twice)
+    python main.py scrape --year 2010        # (again once finished: returns at once; --refresh re-checks)
     python main.py images                    # Download all images
+    python main.py images --workers 8 --max-rps 10  # Parallel image download
+    python main.py sync --workers 4          # Scrape, thumbnails and full-size images in one pass
+    python main.py probe                     # Fill image sizes/types from file headers
+    python main.py derivatives               # Build responsive image sizes on all cores
+    python main.py reparse                   # Rebuild exhibitions from stored HTML snapshots
+    python main.py build-readmodel           # Precompute the website's list tables
     python main.py export                    # Export to JSON
+    python main.py export --ndjson --gzip --output export.ndjson.gz  # One exhibition per line
+    python main.py search "asdis"            # Full-text search (accents optional)
     python main.py stats                     # Show database statistics
+    python main.py stats --runs              # Where recent runs spent their time
+    python main.py --metrics run.prom images # Also write the run's metrics for Prometheus
     python main.py test                      # Test with exhibition 555
 """
 
 import argparse
 import sys
-
-from database import init_database, get_connection, get_statistics, export_to_json
+from contextlib import nullcontext
+
+import scrape_highres
+import scraper as scraper_module
+from database import init_database, get_connection, get_statistics, export_to_json, wal_mode
+from http_cache import CACHE_DIR, ResponseCache
+from parsers import BACKENDS
+from pipeline import SyncPipeline
+from readmodel import build_read_model, refresh_read_model
+from reparse import reparse_snapshots
+from search import search_exhibitions
 from scraper import KoBScraper, scrape_single_exhibition
-from images import ImageDownloader
+from images import VERIFY_WORKERS, ImageDownloader
+from metrics import PHASES, latency_quantile, recent_runs, record_run
+from probe import PROBE_WORKERS, probe_images
+from ratelimit import DEFAULT_MAX_RATE, DEFAULT_MIN_RATE, describe_rate
+from derivatives import DERIVATIVE_FORMATS, DERIVATIVE_WIDTHS, FORMAT_EXTENSIONS, DerivativeBuilder
+from snapshots import SNAPSHOT_DB, SnapshotStore
+
+WAL_COMMANDS = ('scrape', 'images', 'sync', 'reparse')
+MAX_RPS_HELP = ('Adaptive ceiling in requests/sec: the rate climbs toward it while the '
+                f'site responds well and backs off on errors (default: {DEFAULT_MAX_RATE:g})')
 
 
 def cmd_scrape(args):
     """Run the scraper."""
     init_database(args.db)
-    scraper = KoBScraper(args.db, delay=args.delay)
+    snapshots = None if args.no_snapshots else SnapshotStore(args.snapshots)
+    scraper = KoBScraper(
+        args.db,
+        delay=args.delay,
+        workers=args.workers,
+        max_rps=args.max_rps,
+        min_rps=args.min_rps,
+        batch_size=args.batch_size,
+        cache=_response_cache(args),
+        refresh=args.refresh,
+        parser=args.parser,
+        snapshots=snapshots
+    )
 
-    if args.year:
-        stats = scraper.scrape_year(args.year, scrape_english=not args.no_english)
-    else:
-        stats = scraper.scrape_all_years(
-            start_year=args.start_year,
-            end_year=args.end_year,
-            scrape_english=not args.no_english
-        )
+    try:
+        if args.year:
+            stats = scraper.scrape_year(args.year, scrape_english=not args.no_english)
+        else:
+            stats = scraper.scrape_all_years(
+                start_year=args.start_year,
+                end_year=args.end_year,
+                scrape_english=not args.no_english
+            )
+    finally:
+        if snapshots:
+            snapshots.close()
 
     print(f"\nScraping complete!")
     print(f"  Total: {stats['total']}")
     print(f"  Success: {stats['success']}")
+    print(f"  Updated: {stats['updated']}")
     print(f"  Skipped: {stats['skipped']}")
     print(f"  Failed: {stats['failed']}")
+    print(f"  Request rate: {describe_rate(scraper.rate_limiter)}")
+    _record_run(args, scraper, stats)
+    refresh_read_model(args.db)
+
+
+def _record_run(args, tool, stats: dict) -> None:
+    """Store a fetching tool's run metrics (and write them out with --metrics)."""
+    run_id = record_run(args.db, tool.metrics, stats, tool.rate_limiter.snapshot(), args.metrics)
+    print(f"  Run #{run_id} recorded; see `main.py stats --runs`")
+
+
+def _response_cache(args):
+    """Build the shared HTTP response cache from the global options."""
+    if args.no_cache and not args.offline:
+        return None
+    return ResponseCache(args.cache_dir, offline=args.offline)
 
 
 def cmd_images(args):
     """Download images."""
-    downloader = ImageDownloader(args.db, args.images_dir, delay=args.delay)
+    init_database(args.db)
+    downloader = ImageDownloader(
+        args.db,
+        args.images_dir,
+        delay=args.delay,
+        workers=args.workers,
+        max_rps=args.max_rps,
+        min_rps=args.min_rps
+    )
 
     if args.year:
         stats = downloader.download_year_images(args.year)
@@ -61,17 +141,155 @@ def cmd_images(args):
     print(f"  Downloaded: {stats['downloaded']}")
     print(f"  Skipped: {stats['skipped']}")
     print(f"  Failed: {stats['failed']}")
+    print(f"  Request rate: {describe_rate(downloader.rate_limiter)}")
+    _record_run(args, downloader, stats)
+
+
+def cmd_sync(args):
+    """Scrape exhibitions and download their images in one streaming pass."""
+    init_database(args.db)
+    snapshots = None if args.no_snapshots else SnapshotStore(args.snapshots)
+    pipeline = SyncPipeline(
+        args.db,
+        args.images_dir,
+        delay=args.delay,
+        workers=args.workers,
+        max_rps=args.max_rps,
+        min_rps=args.min_rps,
+        cache=_response_cache(args),
+        parser=args.parser,
+        snapshots=snapshots
+    )
+
+    try:
+        stats = pipeline.run(
+            start_year=args.year or args.start_year,
+            end_year=args.year or args.end_year,
+            scrape_english=not args.no_english
+        )
+    finally:
+        if snapshots:
+            snapshots.close()
+
+    exhibitions, thumbnails, full_size = stats['exhibitions'], stats['thumbnails'], stats['full_size']
+    print(f"\nSync complete!")
+    print(f"  Exhibitions: {exhibitions['success']} new, {exhibitions['skipped']} skipped, "
+          f"{exhibitions['failed']} failed")
+    print(f"  Thumbnails: {thumbnails['downloaded']} downloaded, {thumbnails['skipped']} skipped, "
+          f"{thumbnails['failed']} failed")
+    print(f"  Full-size images: {full_size['successful']} saved, {full_size['failed']} failed")
+    if full_size['deferred']:
+        print(f"  Queued for retry: {full_size['deferred']}")
+    print(f"  Request rate: {describe_rate(pipeline.rate_limiter)}")
+    _record_run(args, pipeline, stats)
+    refresh_read_model(args.db)
+
+
+def cmd_probe(args):
+    """Fill image dimensions and MIME types from file headers."""
+    init_database(args.db)
+    stats = probe_images(args.db, workers=args.workers, reprobe=args.all)
+
+    print(f"\nProbe complete!")
+    print(f"  Probed: {stats['probed']}")
+    print(f"  Unreadable: {stats['unreadable']}")
+    print(f"  Missing files: {stats['missing']}")
+
+
+def cmd_derivatives(args):
+    """Build resized image derivatives."""
+    init_database(args.db)
+    builder = DerivativeBuilder(
+        args.db,
+        args.images_dir,
+        widths=tuple(int(w) for w in args.widths.split(',')),
+        formats=tuple(args.formats.split(',')),
+        workers=args.workers
+    )
+    stats = builder.build_all()
+
+    print(f"\nDerivatives complete!")
+    print(f"  Images: {stats['processed']}")
+    print(f"  Files written: {stats['derivatives']}")
+    print(f"  Failed: {stats['failed']}")
+
+
+def _format_list(value: str) -> str:
+    formats = value.split(',')
+    unknown = [f for f in formats if f not in FORMAT_EXTENSIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown format(s) {', '.join(unknown)}; choose from {', '.join(FORMAT_EXTENSIONS)}"
+        )
+    return value
+
+
+def cmd_reparse(args):
+    """Rebuild exhibitions from the HTML snapshot archive."""
+    init_database(args.db)
+    stats = reparse_snapshots(
+        args.db,
+        args.snapshots,
+        workers=args.workers,
+        parser=args.parser,
+        batch_size=args.batch_size
+    )
+
+    print(f"\nRe-parse complete!")
+    print(f"  Total: {stats['total']}")
+    print(f"  Inserted: {stats['success']}")
+    print(f"  Updated: {stats['updated']}")
+    print(f"  Unchanged: {stats['skipped']}")
+    print(f"  Failed: {stats['failed']}")
+    refresh_read_model(args.db)
+
+
+def cmd_build_readmodel(args):
+    """Precompute the website's read-model tables."""
+    init_database(args.db)
+    stats = build_read_model(args.db)
+    print(f"\nRead model built in {stats['seconds']:.2f}s")
+    print(f"  Exhibitions: {stats['exhibitions']}")
+    print(f"  Artists: {stats['artists']}")
+    print(f"  Images: {stats['images']}")
+    print(f"  Years: {stats['years']}")
 
 
 def cmd_export(args):
     """Export database to JSON."""
     conn = get_connection(args.db)
-    export_to_json(conn, args.output)
+    export_to_json(
+        conn,
+        args.output,
+        ndjson=args.ndjson,
+        compact=args.compact,
+        compress=args.gzip or args.output.endswith('.gz')
+    )
     conn.close()
 
 
+def cmd_search(args):
+    """Full-text search over exhibitions."""
+    init_database(args.db)
+    conn = get_connection(args.db)
+    results = search_exhibitions(conn, ' '.join(args.query), limit=args.limit)
+    conn.close()
+
+    if not results:
+        print("No matches")
+        return
+    for result in results:
+        dates = f"{result['start_date'] or '?'} - {result['end_date'] or '?'}"
+        print(f"  [{result['exhibition_id']}] {result['title_is']} ({result['year']}, {dates})")
+        if result['title_en'] and result['title_en'] != result['title_is']:
+            print(f"         {result['title_en']}")
+
+
 def cmd_stats(args):
     """Show database statistics."""
+    if args.runs:
+        _print_runs(args)
+        return
     conn = get_connection(args.db)
     stats = get_statistics(conn)
     conn.close()
@@ -89,6 +307,40 @@ def cmd_stats(args):
         print(f"  {year}: {count}")
 
 
+def _print_runs(args):
+    """Show recent runs and where their time went."""
+    init_database(args.db)
+    conn = get_connection(args.db)
+    runs = recent_runs(conn, args.limit)
+    conn.close()
+
+    print("\nRecent runs (phase times are summed over worker threads)")
+    print("=" * 40)
+    if not runs:
+        print("No runs recorded yet")
+    for run in runs:
+        snap = run['metrics']
+        print(f"#{run['id']} {run['tool']:<8} {run['started_at'][:19].replace('T', ' ')}  "
+              f"wall {run['wall_seconds']:.1f}s, {run['requests']} requests, "
+              f"{run['bytes'] / 1024 / 1024:.1f} MB, {run['errors']} errors")
+        phases = snap.get('phases', {})
+        busy = sum(entry['seconds'] for entry in phases.values()) or 1
+        print("    " + "  ".join(
+            f"{phase} {phases[phase]['seconds']:.1f}s ({phases[phase]['seconds'] / busy:.0%})"
+            for phase in PHASES if phase in phases
+        ))
+        latency = snap.get('latency')
+        if latency and latency['count']:
+            p50, p95 = (latency_quantile(latency, q) for q in (0.5, 0.95))
+            print(f"    latency mean {latency['sum'] / latency['count'] * 1000:.0f} ms, "
+                  f"p50 <= {_bound(p50)}, p95 <= {_bound(p95)}"
+                  + (f"; final rate {snap['rate']['rate']:.2f} req/s" if snap.get('rate') else ""))
+
+
+def _bound(seconds) -> str:
+    return "inf" if seconds is None else f"{seconds * 1000:g} ms"
+
+
 def cmd_test(args):
     """Test scraping with a single exhibition."""
     init_database(args.db)
@@ -111,10 +363,16 @@ def cmd_test(args):
 def cmd_verify(args):
     """Verify downloaded images."""
     downloader = ImageDownloader(args.db, args.images_dir)
-    stats = downloader.verify_images()
+    stats = downloader.verify_images(deep=args.deep, workers=args.workers)
     print(f"\nImage verification:")
     print(f"  Valid: {stats['valid']}")
     print(f"  Missing: {stats['missing']}")
+    if args.deep:
+        print(f"  Truncated: {stats['truncated']}")
+        print(f"  Corrupt: {stats['corrupt']}")
+        megabytes = stats['bytes'] / (1024 * 1024)
+        rate = megabytes / stats['seconds'] if stats['seconds'] else 0.0
+        print(f"  Read {megabytes:.1f} MB in {stats['seconds']:.1f}s ({rate:.1f} MB/s)")
 
 
 def main():
@@ -125,7 +383,21 @@ def main():
     )
     parser.add_argument('--db', default='kob_archive.db', help='Database path')
     parser.add_argument('--images-dir', default='images', help='Images directory')
-    parser.add_argument('--delay', type=float, default=1.5, help='Delay between requests')
+    parser.add_argument('--base-url', default=scraper_module.BASE_URL,
+                        help='Archive site to scrape (e.g. a mirror or the benchmark mock site)')
+    parser.add_argument('--delay', type=float, default=1.5,
+                        help='Starting delay between requests; the rate then adapts to the host')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='HTTP response cache directory')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the HTTP response cache')
+    parser.add_argument('--offline', action='store_true',
+                        help='Serve pages from the HTTP cache only, never the network')
+    parser.add_argument('--parser', choices=sorted(BACKENDS),
+                        help='HTML parser backend (default: lxml if installed)')
+    parser.add_argument('--snapshots', default=SNAPSHOT_DB, help='Raw HTML snapshot archive')
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help='Do not archive fetched pages while scraping')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Also write run metrics as JSON (Prometheus text if FILE ends in .prom)')
 
     subparsers = parser.add_subparsers(dest='command', help='Command to run')
 
@@ -135,46 +407,131 @@ def main():
     scrape_parser.add_argument('--start-year', type=int, default=2003, help='Start year')
     scrape_parser.add_argument('--end-year', type=int, default=2025, help='End year')
     scrape_parser.add_argument('--no-english', action='store_true', help='Skip English versions')
+    scrape_parser.add_argument('--workers', type=int, default=1, help='Concurrent fetch workers')
+    scrape_parser.add_argument('--max-rps', type=float,
+                               help=MAX_RPS_HELP)
+    scrape_parser.add_argument('--min-rps', type=float,
+                               help=f'Lowest adaptive requests/sec (default: {DEFAULT_MIN_RATE:g})')
+    scrape_parser.add_argument('--batch-size', type=int, default=25,
+                               help='Exhibitions per database transaction')
+    scrape_parser.add_argument('--refresh', action='store_true',
+                               help='Re-check existing exhibitions and update changed ones')
 
     # Images command
     images_parser = subparsers.add_parser('images', help='Download images')
     images_parser.add_argument('--year', type=int, help='Download for single year')
+    images_parser.add_argument('--workers', type=int, default=1, help='Concurrent download workers')
+    images_parser.add_argument('--max-rps', type=float,
+                               help=MAX_RPS_HELP)
+    images_parser.add_argument('--min-rps', type=float,
+                               help=f'Lowest adaptive requests/sec (default: {DEFAULT_MIN_RATE:g})')
+
+    # Sync command
+    sync_parser = subparsers.add_parser('sync', help='Scrape and download images in one pipelined pass')
+    sync_parser.add_argument('--year', type=int, help='Sync single year')
+    sync_parser.add_argument('--start-year', type=int, default=2003, help='Start year')
+    sync_parser.add_argument('--end-year', type=int, default=2025, help='End year')
+    sync_parser.add_argument('--no-english', action='store_true', help='Skip English versions')
+    sync_parser.add_argument('--workers', type=int, default=4,
+                             help='Concurrent fetches per stage (default: %(default)s)')
+    sync_parser.add_argument('--max-rps', type=float,
+                             help=MAX_RPS_HELP)
+    sync_parser.add_argument('--min-rps', type=float,
+                             help=f'Lowest adaptive requests/sec (default: {DEFAULT_MIN_RATE:g})')
+
+    # Probe command
+    probe_parser = subparsers.add_parser('probe', help='Fill image dimensions from file headers')
+    probe_parser.add_argument('--all', action='store_true',
+                              help='Re-probe images that already have dimensions')
+    probe_parser.add_argument('--workers', type=int, default=PROBE_WORKERS, help='Reader threads')
+
+    # Derivatives command
+    derivatives_parser = subparsers.add_parser('derivatives', help='Build resized image derivatives')
+    derivatives_parser.add_argument('--widths', default=','.join(map(str, DERIVATIVE_WIDTHS)),
+                                    help='Comma-separated target widths in pixels')
+    derivatives_parser.add_argument('--formats', type=_format_list,
+                                    default=','.join(DERIVATIVE_FORMATS),
+                                    help='Comma-separated output formats (webp, avif, jpeg)')
+    derivatives_parser.add_argument('--workers', type=int,
+                                    help='Worker processes (default: CPU count)')
+
+    # Reparse command
+    reparse_parser = subparsers.add_parser('reparse', help='Rebuild exhibitions from HTML snapshots')
+    reparse_parser.add_argument('--workers', type=int, help='Parser processes (default: CPU count)')
+    reparse_parser.add_argument('--batch-size', type=int, default=25,
+                                help='Exhibitions per insert batch')
+
+    # Read model command
+    subparsers.add_parser('build-readmodel', help="Precompute the website's list tables")
 
     # Export command
     export_parser = subparsers.add_parser('export', help='Export to JSON')
     export_parser.add_argument('--output', default='export.json', help='Output file')
+    export_parser.add_argument('--ndjson', action='store_true',
+                               help='Write one exhibition per line (newline-delimited JSON)')
+    export_parser.add_argument('--compact', action='store_true', help='No indentation')
+    export_parser.add_argument('--gzip', action='store_true',
+                               help='Gzip the output (implied by a .gz output name)')
+
+    # Search command
+    search_parser = subparsers.add_parser('search', help='Full-text search')
+    search_parser.add_argument('query', nargs='+', help='Words to search for')
+    search_parser.add_argument('--limit', type=int, default=20, help='Max results')
 
     # Stats command
-    subparsers.add_parser('stats', help='Show statistics')
+    stats_parser = subparsers.add_parser('stats', help='Show statistics')
+    stats_parser.add_argument('--runs', action='store_true',
+                              help='Show the time breakdown of recent scrape/images/highres/sync runs')
+    stats_parser.add_argument('--limit', type=int, default=10, help='Runs to show with --runs')
 
     # Test command
     subparsers.add_parser('test', help='Test with single exhibition')
 
     # Verify command
-    subparsers.add_parser('verify', help='Verify downloaded images')
+    verify_parser = subparsers.add_parser('verify', help='Verify downloaded images')
+    verify_parser.add_argument('--deep', action='store_true',
+                               help='Hash and validate every file, queueing damaged ones for re-download')
+    verify_parser.add_argument('--workers', type=int, default=VERIFY_WORKERS,
+                               help='Threads for --deep (default: %(default)s)')
 
     # Init command
     init_parser = subparsers.add_parser('init', help='Initialize database only')
 
     args = parser.parse_args()
-
-    if args.command == 'scrape':
-        cmd_scrape(args)
-    elif args.command == 'images':
-        cmd_images(args)
-    elif args.command == 'export':
-        cmd_export(args)
-    elif args.command == 'stats':
-        cmd_stats(args)
-    elif args.command == 'test':
-        cmd_test(args)
-    elif args.command == 'verify':
-        cmd_verify(args)
-    elif args.command == 'init':
-        init_database(args.db)
-    else:
-        parser.print_help()
-        sys.exit(1)
+    scraper_module.BASE_URL = args.base_url
+    scrape_highres.BASE_URL = args.base_url
+
+    # Long write runs use WAL so the website can keep reading meanwhile
+    with wal_mode(args.db) if args.command in WAL_COMMANDS else nullcontext():
+        if args.command == 'scrape':
+            cmd_scrape(args)
+        elif args.command == 'images':
+            cmd_images(args)
+        elif args.command == 'sync':
+            cmd_sync(args)
+        elif args.command == 'probe':
+            cmd_probe(args)
+        elif args.command == 'derivatives':
+            cmd_derivatives(args)
+        elif args.command == 'reparse':
+            cmd_reparse(args)
+        elif args.command == 'build-readmodel':
+            cmd_build_readmodel(args)
+        elif args.command == 'export':
+            cmd_export(args)
+        elif args.command == 'search':
+            cmd_search(args)
+        elif args.command == 'stats':
+            cmd_stats(args)
+        elif args.command == 'test':
+            cmd_test(args)
+        elif args.command == 'verify':
+            cmd_verify(args)
+        elif args.command == 'init':
+            init_database(args.db)
+        else:
+            parser.print_help()
+            sys.exit(1)
 
 
 if __name__ == "__main__":
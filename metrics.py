@@ -0,0 +1,252 @@
+"""Per-run telemetry for the archive fetchers.
+
+Each tool run fills a RunMetrics with where its time went and what it
+transferred, and the CLI stores it as a scrape_runs row (see
+`main.py stats --runs`), optionally also writing JSON or Prometheus text.
+
+Phases, summed over all worker threads:
+    wait        blocked on the rate limiter
+    dns         name resolution for new connections
+    connect     TCP connect for new connections
+    ttfb        request sent until response headers (TLS included)
+    download    reading the response body
+    parse       HTML parsing and image header probing
+    db_write    database transactions
+
+Request latency (send until the response is read; headers only for
+streamed images) goes into a fixed-bucket histogram. Connection timings
+come from TimingAdapter, which the tools mount on their sessions.
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from database import get_connection
+
+PHASES = ('wait', 'dns', 'connect', 'ttfb', 'download', 'parse', 'db_write')
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+INSERT_RUN_SQL = """
+    INSERT INTO scrape_runs (
+        tool, started_at, finished_at, wall_seconds, requests, bytes, errors, stats, metrics
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Connection timings of the current thread's request, read by the fetch layer
+_connection_times = threading.local()
+
+
+class RunMetrics:
+    """Thread-safe timers, counters and a latency histogram for one run."""
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self._phases = {phase: [0.0, 0] for phase in PHASES}
+        self._counters = {'requests': 0, 'bytes': 0, 'errors': 0, 'cache_hits': 0}
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._lock = threading.Lock()
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latency_sum += seconds
+            for idx, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self._buckets[idx] += 1
+                    break
+            else:
+                self._buckets[-1] += 1
+
+    def snapshot(self) -> dict:
+        """Everything recorded so far, as plain JSON-ready data."""
+        with self._lock:
+            return {
+                'tool': self.tool,
+                'started_at': self.started_at.isoformat(),
+                'wall_seconds': time.monotonic() - self._start,
+                'phases': {
+                    phase: {'seconds': round(total, 6), 'count': n}
+                    for phase, (total, n) in self._phases.items()
+                },
+                'counters': dict(self._counters),
+                'latency': {
+                    'buckets': [[bound, n] for bound, n in zip(LATENCY_BUCKETS, self._buckets)]
+                               + [['+Inf', self._buckets[-1]]],
+                    'count': sum(self._buckets),
+                    'sum': round(self._latency_sum, 6),
+                },
+            }
+
+
+def latency_quantile(latency: dict, q: float) -> Optional[float]:
+    """Estimate a quantile from a snapshot's histogram (upper bucket bound)."""
+    if not latency['count']:
+        return None
+    target = q * latency['count']
+    seen = 0
+    for bound, n in latency['buckets']:
+        seen += n
+        if seen >= target:
+            return None if bound == '+Inf' else bound
+    return None
+
+
+def record_run(
+    db_path: str,
+    metrics: RunMetrics,
+    stats: dict,
+    rate: Optional[dict] = None,
+    output: Optional[str] = None
+) -> int:
+    """Store a finished run in scrape_runs, and optionally write it to `output`.
+
+    `output` gets Prometheus text format if it ends in .prom, JSON
+    otherwise. `rate` is the rate limiter's snapshot. Returns the run id.
+    """
+    snap = metrics.snapshot()
+    if rate:
+        snap['rate'] = rate
+    snap['stats'] = stats
+    counters = snap['counters']
+    conn = get_connection(db_path)
+    try:
+        cursor = conn.execute(INSERT_RUN_SQL, (
+            snap['tool'], snap['started_at'], datetime.now().isoformat(), snap['wall_seconds'],
+            counters['requests'], counters['bytes'], counters['errors'],
+            json.dumps(stats), json.dumps(snap),
+        ))
+        conn.commit()
+        run_id = cursor.lastrowid
+    finally:
+        conn.close()
+
+    if output:
+        text = to_prometheus(snap) if output.endswith('.prom') else json.dumps(snap, indent=2)
+        Path(output).write_text(text, encoding='utf-8')
+    return run_id
+
+
+def recent_runs(conn: sqlite3.Connection, limit: int = 10) -> list[dict]:
+    """The latest runs, newest first, with their stored metrics decoded."""
+    rows = conn.execute("""
+        SELECT id, tool, started_at, wall_seconds, requests, bytes, errors, metrics
+        FROM scrape_runs ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return [{**dict(row), 'metrics': json.loads(row['metrics'] or '{}')} for row in rows]
+
+
+def to_prometheus(snap: dict) -> str:
+    """Render a metrics snapshot in the Prometheus text exposition format."""
+    tool = snap['tool']
+    lines = [
+        "# TYPE kob_run_wall_seconds gauge",
+        f'kob_run_wall_seconds{{tool="{tool}"}} {snap["wall_seconds"]:.6f}',
+        "# TYPE kob_phase_seconds_total counter",
+    ]
+    for phase, entry in snap['phases'].items():
+        lines.append(f'kob_phase_seconds_total{{tool="{tool}",phase="{phase}"}} {entry["seconds"]}')
+    lines.append("# TYPE kob_events_total counter")
+    for name, value in snap['counters'].items():
+        lines.append(f'kob_events_total{{tool="{tool}",event="{name}"}} {value}')
+    lines.append("# TYPE kob_request_latency_seconds histogram")
+    cumulative = 0
+    for bound, n in snap['latency']['buckets']:
+        cumulative += n
+        lines.append(f'kob_request_latency_seconds_bucket{{tool="{tool}",le="{bound}"}} {cumulative}')
+    lines.append(f'kob_request_latency_seconds_sum{{tool="{tool}"}} {snap["latency"]["sum"]}')
+    lines.append(f'kob_request_latency_seconds_count{{tool="{tool}"}} {snap["latency"]["count"]}')
+    if snap.get('rate'):
+        lines.append("# TYPE kob_request_rate gauge")
+        lines.append(f'kob_request_rate{{tool="{tool}"}} {snap["rate"]["rate"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def take_connection_times() -> tuple[float, float]:
+    """(dns, connect) seconds spent opening connections on this thread since the last call."""
+    dns = getattr(_connection_times, 'dns', 0.0)
+    connect = getattr(_connection_times, 'connect', 0.0)
+    _connection_times.dns = _connection_times.connect = 0.0
+    return dns, connect
+
+
+class _TimedConnection:
+    """Time name resolution and TCP connect separately for new connections."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)}
+        except OSError:
+            addresses = set()
+        resolved = time.perf_counter()
+        # Connect to the resolved address; with several, let urllib3 resolve
+        # again and try each (the connect time then includes that lookup)
+        if len(addresses) == 1:
+            self._dns_host = addresses.pop()
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+            _connection_times.dns = getattr(_connection_times, 'dns', 0.0) + resolved - start
+            _connection_times.connect = (
+                getattr(_connection_times, 'connect', 0.0) + time.perf_counter() - resolved
+            )
+
+
+class _TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report DNS and connect times."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
@@ -0,0 +1,258 @@
+"""Single-pass HTML extraction for Kling & Bang archive pages.
+
+One walk over a page collects everything the scrapers read from it:
+    fragments  every element with an arc_view_* class, with its text
+               strings, <p> paragraphs and images
+    images     every <img> (src, alt, class) in document order
+    links      every <a href> with the first <img> inside it
+
+Two interchangeable backends produce the same structure:
+    lxml         libxml2-based, fast; used when lxml is installed
+    html.parser  stdlib streaming parser, no tree is built
+"""
+
+import hashlib
+from html.parser import HTMLParser
+from typing import Callable, Optional
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+FRAGMENT_PREFIX = "arc_view_"
+SKIP_TEXT_TAGS = {"script", "style"}
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+# Start tags that implicitly end an open <p>, as in HTML (and lxml)
+CLOSES_P = {
+    "address", "article", "aside", "blockquote", "center", "dd", "details", "dir",
+    "div", "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "menu",
+    "nav", "ol", "p", "pre", "section", "table", "ul",
+}
+# An open <p> outside these is not in scope for the implicit end
+P_SCOPE = {"applet", "button", "caption", "html", "marquee", "object", "table", "td", "th"}
+
+
+def parse_page(html: str, backend: Optional[str] = None) -> dict:
+    """Parse a page with the given backend (default: fastest available)."""
+    return get_parser(backend)(html)
+
+
+def get_parser(backend: Optional[str] = None) -> Callable[[str], dict]:
+    """Return the parse function for a backend name."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[backend]
+
+
+def find_fragment(page: dict, class_name: str) -> Optional[dict]:
+    """First fragment carrying `class_name`, like soup.find(class_=...)."""
+    for fragment in page['fragments']:
+        if class_name in fragment['classes']:
+            return fragment
+    return None
+
+
+def find_fragments(page: dict, class_name: str) -> list[dict]:
+    """All fragments carrying `class_name`, in document order."""
+    return [f for f in page['fragments'] if class_name in f['classes']]
+
+
+def find_image(page: dict, class_name: Optional[str] = None) -> Optional[dict]:
+    """First image, or first image carrying `class_name`."""
+    for img in page['images']:
+        if class_name is None or class_name in img['classes']:
+            return img
+    return None
+
+
+def fragment_text(strings: list[str], separator: str = '') -> str:
+    """Join stripped, non-empty strings, like get_text(separator, strip=True)."""
+    return separator.join(s.strip() for s in strings if s.strip())
+
+
+def page_fingerprint(page: dict) -> str:
+    """Hash the page's arc_view_* fragments with whitespace normalized.
+
+    Only fragment classes, text and image sources are hashed, so layout
+    outside the fragments and backend serialization details never mark a
+    page as changed.
+    """
+    digest = hashlib.sha256()
+    for fragment in page['fragments']:
+        digest.update(' '.join(fragment['classes']).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(' '.join(''.join(fragment['strings']).split()).encode('utf-8'))
+        for img in fragment['images']:
+            digest.update(b'\0')
+            digest.update(img['src'].encode('utf-8'))
+        digest.update(b'\1')
+    return digest.hexdigest()
+
+
+class _PageBuilder:
+    """Accumulates parse events into the page structure for both backends."""
+
+    def __init__(self):
+        self.page = {'fragments': [], 'images': [], 'links': []}
+        self.fragments: list[dict] = []  # open fragments
+        self.paragraphs: list[list[str]] = []  # open <p> string lists
+        self.links: list[dict] = []  # open links
+        self.skip_text = 0
+
+    def start(self, tag: str, attrs: dict) -> tuple:
+        """Open an element; returns a token for `end()`."""
+        opened = []
+        classes = (attrs.get('class') or '').split()
+        if any(c.startswith(FRAGMENT_PREFIX) for c in classes):
+            fragment = {'classes': classes, 'strings': [], 'paragraphs': [], 'images': []}
+            self.page['fragments'].append(fragment)
+            self.fragments.append(fragment)
+            opened.append(('fragment', fragment))
+
+        if tag == 'p' and self.fragments:
+            lists = []
+            for fragment in self.fragments:
+                strings = []
+                fragment['paragraphs'].append(strings)
+                lists.append(strings)
+            self.paragraphs.extend(lists)
+            opened.append(('paragraphs', lists))
+        elif tag == 'a' and attrs.get('href') is not None:
+            link = {'href': attrs['href'], 'img': None}
+            self.page['links'].append(link)
+            self.links.append(link)
+            opened.append(('link', link))
+        elif tag in SKIP_TEXT_TAGS:
+            self.skip_text += 1
+            opened.append(('skip', None))
+        elif tag == 'img':
+            self.image(attrs)
+        return tuple(opened)
+
+    def end(self, token: tuple) -> None:
+        for kind, value in token:
+            if kind == 'fragment':
+                _remove_same(self.fragments, value)
+            elif kind == 'paragraphs':
+                for strings in value:
+                    _remove_same(self.paragraphs, strings)
+            elif kind == 'link':
+                _remove_same(self.links, value)
+            elif kind == 'skip':
+                self.skip_text -= 1
+
+    def image(self, attrs: dict) -> None:
+        img = {
+            'src': attrs.get('src') or '',
+            'alt': attrs.get('alt') or '',
+            'classes': (attrs.get('class') or '').split(),
+        }
+        self.page['images'].append(img)
+        for fragment in self.fragments:
+            fragment['images'].append(img)
+        for link in self.links:
+            if link['img'] is None:
+                link['img'] = img
+
+    def text(self, data: str) -> None:
+        if self.skip_text or not data:
+            return
+        for fragment in self.fragments:
+            fragment['strings'].append(data)
+        for strings in self.paragraphs:
+            strings.append(data)
+
+
+def _remove_same(items: list, obj) -> None:
+    """Remove `obj` itself from `items` (list.remove compares by equality)."""
+    for idx in range(len(items) - 1, -1, -1):
+        if items[idx] is obj:
+            del items[idx]
+            return
+
+
+class _StreamParser(HTMLParser):
+    """Event-driven parser building the tree shape lxml (and a browser) would."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.builder = _PageBuilder()
+        self.stack: list[tuple[str, tuple]] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in CLOSES_P:
+            self._close_p()
+        token = self.builder.start(tag, attrs)
+        if tag in VOID_TAGS:
+            self.builder.end(token)
+        else:
+            self.stack.append((tag, token))
+
+    def handle_startendtag(self, tag, attrs):
+        self.builder.end(self.builder.start(tag, dict(attrs)))
+
+    def handle_endtag(self, tag):
+        # Close everything up to the most recent open tag of this name
+        for idx in range(len(self.stack) - 1, -1, -1):
+            if self.stack[idx][0] == tag:
+                for _, token in reversed(self.stack[idx:]):
+                    self.builder.end(token)
+                del self.stack[idx:]
+                return
+
+    def handle_data(self, data):
+        self.builder.text(data)
+
+    def _close_p(self) -> None:
+        for idx in range(len(self.stack) - 1, -1, -1):
+            tag = self.stack[idx][0]
+            if tag == 'p':
+                self.handle_endtag('p')
+                return
+            if tag in P_SCOPE:
+                return
+
+
+def _parse_stream(html: str) -> dict:
+    parser = _StreamParser()
+    parser.feed(html)
+    parser.close()
+    return parser.builder.page
+
+
+def _parse_lxml(html: str) -> dict:
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        # e.g. an XML encoding declaration in a str, or an empty document
+        return _parse_stream(html)
+
+    builder = _PageBuilder()
+
+    def walk(elem) -> None:
+        if isinstance(elem.tag, str):
+            token = builder.start(elem.tag, elem.attrib)
+            if elem.text:
+                builder.text(elem.text)
+            for child in elem:
+                walk(child)
+                if child.tail:
+                    builder.text(child.tail)
+            builder.end(token)
+
+    walk(root)
+    return builder.page
+
+
+BACKENDS = {'html.parser': _parse_stream}
+if lxml is not None:
+    BACKENDS['lxml'] = _parse_lxml
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'html.parser'
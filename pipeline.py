@@ -0,0 +1,448 @@
+"""Streaming sync: exhibitions, thumbnails and full-size images in one crawl.
+
+`main.py scrape`, `main.py images` and scrape_highres.py run one after
+another, and the last fetches every exhibition page a second time to
+find its image_view.php links. `main.py sync` runs the same work as
+stages of one pipeline on the shared fetch loop (see fetchloop.py):
+
+    years        archive_list.php for each year          -> exhibitions
+    exhibitions  archive_view.php (Icelandic and English),
+                 saved; image_view links are read from the
+                 same parsed page                        -> thumbnails
+    thumbnails   the exhibition's images from its page   -> image_views
+    image_views  full-size images from image_view.php
+
+Stages are joined by bounded queues (QUEUE_SIZE), so a stage that falls
+behind holds back the ones feeding it instead of work piling up in
+memory, and each stage works on `workers` items at a time. All stages run
+at once, so a sync takes about as long as its slowest stage rather than
+the sum of them. Every request shares one rate limiter and one run's
+metrics.
+
+Database writes and image file saves, scraping_log entries included, run
+on one dedicated thread, never on the loop thread, so a write waiting out
+the busy timeout holds up only other writes, not fetches, and the stages'
+writes never contend with each other for the lock. An exhibition's image_view pages are
+queued only once its thumbnails are on disk, which names files the same
+way the phased tools do.
+
+An interrupted sync resumes where it stopped. Years are checkpointed in
+year_checkpoints like `main.py scrape`: a past year whose exhibitions
+were all saved is not listed again, and a year that was interrupted or
+had failures is. Exhibitions already in the archive are not scraped
+again, but their missing thumbnails, and their gallery if it was never
+scanned, go through the same stages, and image_view pages left in the
+crawl frontier are picked up again.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+from database import (
+    KnownKeys,
+    add_year_counts,
+    finish_year_checkpoint,
+    insert_exhibitions_batch,
+    log_scrapes_batch,
+    shared_connection,
+    start_year_checkpoint,
+)
+from fetchloop import fetch_loop
+from frontier import CrawlFrontier
+from http_cache import ResponseCache
+from images import ImageDownloader, downloaded_row, flush_updates
+from metrics import RunMetrics
+from scrape_highres import HighResScraper, image_view_entries
+from scraper import REQUEST_DELAY, KoBScraper
+from snapshots import SnapshotStore
+from writer import LOG_BATCH_SIZE
+
+QUEUE_SIZE = 64  # items waiting between two stages
+_DONE = object()  # closes a stage's inbox
+
+# Archived exhibitions with work left: thumbnails not downloaded, or a
+# gallery that was never scanned for image_view links
+UNFINISHED_EXHIBITIONS_SQL = """
+    SELECT * FROM (
+        SELECT e.id, e.exhibition_id, e.year, e.source_url,
+               EXISTS (SELECT 1 FROM crawl_frontier f
+                       WHERE f.kind = 'gallery' AND f.url = e.source_url AND f.state = 'done') AS scanned,
+               EXISTS (SELECT 1 FROM images i
+                       WHERE i.exhibition_id = e.id AND i.local_path IS NULL) AS pending
+        FROM exhibitions e
+        WHERE e.year BETWEEN ? AND ?
+    )
+    WHERE NOT scanned OR pending
+    ORDER BY year, exhibition_id
+"""
+
+
+class SyncPipeline:
+    """Scrape exhibitions and download their images as one streaming crawl."""
+
+    def __init__(
+        self,
+        db_path: str = "kob_archive.db",
+        images_dir: str = "images",
+        delay: float = REQUEST_DELAY,
+        workers: int = 4,
+        max_rps: Optional[float] = None,
+        min_rps: Optional[float] = None,
+        cache: Optional[ResponseCache] = None,
+        parser: Optional[str] = None,
+        snapshots: Optional[SnapshotStore] = None
+    ):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self.metrics = RunMetrics('sync')
+        conn = shared_connection(db_path)
+        # Exhibitions, artists and image keys, kept current by every stage's inserts
+        self.known = KnownKeys(conn, images=True)
+        self.scraper = KoBScraper(
+            db_path, delay=delay, workers=self.workers, max_rps=max_rps, min_rps=min_rps,
+            cache=cache, parser=parser, snapshots=snapshots, metrics=self.metrics
+        )
+        self.images = ImageDownloader(db_path, images_dir, workers=self.workers, metrics=self.metrics)
+        self.highres = HighResScraper(
+            db_path, images_dir, cache=cache, parser=parser, metrics=self.metrics,
+            workers=self.workers, known=self.known
+        )
+        # One request budget for the whole sync, and one blob store
+        self.rate_limiter = self.scraper.rate_limiter
+        for tool in (self.images, self.highres):
+            tool.rate_limiter = self.rate_limiter
+            tool.fetcher.limiter = self.rate_limiter
+        self.highres.blobs = self.images.blobs
+        self.images.blobs.load_hints(conn)
+
+    def run(self, start_year: int = 2003, end_year: int = 2025, scrape_english: bool = True) -> dict:
+        """Sync a range of years; returns stats per stage."""
+        self.scrape_english = scrape_english
+        self.stats = {
+            'exhibitions': {'total': 0, 'success': 0, 'skipped': 0, 'failed': 0},
+            'thumbnails': {'downloaded': 0, 'skipped': 0, 'failed': 0},
+            'full_size': {'total': 0, 'successful': 0, 'failed': 0, 'deferred': 0},
+        }
+        # Every database write and file save of the sync, in order
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sync-db")
+        # The scraper's scraping_log entries, buffered until _flush_log
+        self._log_entries: list[tuple] = []
+        self._log_lock = threading.Lock()
+        self.scraper.log_sink = self._log
+        try:
+            fetch_loop().run(self._run((start_year, end_year)))
+        finally:
+            self.scraper.log_sink = None
+            try:
+                self._db.submit(self._flush_log).result()
+            finally:
+                self._db.shutdown(wait=True)
+        return self.stats
+
+    def _log(self, entry: tuple) -> None:
+        """Buffer a scraping_log entry from any fetch thread."""
+        with self._log_lock:
+            self._log_entries.append(entry)
+
+    def _flush_log(self, at_least: int = 1) -> None:
+        """Commit the buffered scraping_log entries once there are `at_least` of them."""
+        with self._log_lock:
+            if len(self._log_entries) < at_least:
+                return
+            entries, self._log_entries = self._log_entries, []
+        conn = shared_connection(self.db_path)
+        with conn:
+            log_scrapes_batch(conn, entries)
+
+    async def _db_call(self, fn: Callable, *args) -> Any:
+        """Run blocking database or file work on the sync's writer thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._db, fn, *args)
+
+    async def _run(self, years: tuple[int, int]) -> None:
+        self._loop = fetch_loop()
+        self._page_slots = self._loop.slots(self.workers)
+        self._image_slots = self._loop.slots(self.workers)
+        self._view_slots = self._loop.slots(self.workers)
+        self._exhibition_queue = asyncio.Queue(QUEUE_SIZE)
+        self._thumbnail_queue = asyncio.Queue(QUEUE_SIZE)
+        self._image_view_queue = asyncio.Queue(QUEUE_SIZE)
+        # Listed years still being scraped: exhibitions left and failed
+        self._open_years: dict[int, dict[str, int]] = {}
+        self._frontier = await self._db_call(CrawlFrontier, self.db_path)
+        try:
+            finished = await self._db_call(self.scraper.finished_years, *years)
+            existing = await self._db_call(self._unfinished_exhibitions, years)
+            if existing:
+                print(f"{len(existing)} archived exhibitions have images or galleries left")
+            remaining = await self._db_call(self._frontier.unfinished, ('image_view',), years)
+            if remaining:
+                print(f"Resuming {remaining} image pages left by an earlier run")
+
+            await _gather(
+                _stage(self._exhibition_queue, self._list_years(years, finished), self._queue_existing(existing)),
+                _stage(self._thumbnail_queue, _drain(self._exhibition_queue, self._exhibition, self.workers)),
+                _stage(self._image_view_queue, _drain(self._thumbnail_queue, self._thumbnails, self.workers),
+                       self._lease_image_views(years)),
+                _drain(self._image_view_queue, self._image_view, self.workers),
+            )
+            self.stats['full_size']['deferred'] = await self._db_call(
+                self._frontier.unfinished, ('image_view',), years
+            )
+        finally:
+            await self._db_call(self._close_frontier)
+
+    def _unfinished_exhibitions(self, years: tuple[int, int]) -> list:
+        return shared_connection(self.db_path).execute(UNFINISHED_EXHIBITIONS_SQL, years).fetchall()
+
+    def _close_frontier(self) -> None:
+        self._frontier.release()
+        self._frontier.close()
+
+    async def _list_years(self, years: tuple[int, int], finished: dict) -> None:
+        """Fetch the year list pages and queue the exhibitions not yet archived.
+
+        Years a crawl already finished are skipped. The rest are fetched
+        `workers` at a time and handled in year order, so exhibitions are
+        queued in the same order however the fetches interleave.
+        """
+        stats = self.stats['exhibitions']
+        for row in finished.values():
+            stats['total'] += row['total']
+            stats['skipped'] += row['total']
+        list_years = [year for year in range(years[0], years[1] + 1) if year not in finished]
+        fetches = [
+            asyncio.ensure_future(self._loop.call(self._page_slots, self.scraper.get_year_page, year))
+            for year in list_years
+        ]
+        try:
+            for year, fetch in zip(list_years, fetches):
+                page = await fetch
+                if not page:
+                    print(f"Year {year}: list page failed")
+                    continue
+                exhibition_ids = self.scraper.extract_exhibition_ids(page)
+                new = sorted(ex_id for ex_id in exhibition_ids if not self.known.has_exhibition(ex_id))
+                stats['total'] += len(exhibition_ids)
+                stats['skipped'] += len(exhibition_ids) - len(new)
+                print(f"Year {year}: {len(exhibition_ids)} exhibitions, {len(new)} new")
+                await self._db_call(self._start_year, year, len(exhibition_ids), len(exhibition_ids) - len(new))
+                self._open_years[year] = {'left': len(new), 'failed': 0}
+                if not new:
+                    await self._db_call(self._finish_year, year, 0)
+                for ex_id in new:
+                    await self._exhibition_queue.put({'exhibition_id': ex_id, 'year': year})
+        finally:
+            for fetch in fetches:
+                fetch.cancel()
+
+    def _start_year(self, year: int, listed: int, skipped: int) -> None:
+        start_year_checkpoint(shared_connection(self.db_path), year, listed, skipped)
+
+    def _finish_year(self, year: int, failed: int) -> None:
+        self._flush_log()
+        row = finish_year_checkpoint(shared_connection(self.db_path), year, failed)
+        if row and row['completed_at']:
+            print(f"Year {year} complete: {row['total']} exhibitions, {row['success']} new, "
+                  f"{row['skipped']} skipped")
+        elif row:
+            print(f"Year {year} incomplete: {failed} of {row['total']} exhibitions failed, "
+                  f"will be listed again on the next sync")
+
+    async def _exhibition_done(self, year: int, failed: bool) -> None:
+        """Count one of a listed year's exhibitions as handled, finishing the year after the last."""
+        counts = self._open_years[year]
+        counts['left'] -= 1
+        counts['failed'] += failed
+        if not counts['left']:
+            await self._db_call(self._finish_year, year, counts['failed'])
+
+    async def _queue_existing(self, rows: list) -> None:
+        """Queue archived exhibitions whose thumbnails or gallery are unfinished."""
+        for row in rows:
+            await self._exhibition_queue.put({
+                'exhibition': {'exhibition_db_id': row['id'], 'exhibition_id': row['exhibition_id'],
+                               'year': row['year']},
+                'source_url': row['source_url'],
+                'scanned': bool(row['scanned']),
+            })
+
+    async def _exhibition(self, item: dict) -> None:
+        """Scrape and save a new exhibition, or rescan an archived one's gallery."""
+        if 'exhibition' in item:
+            links = None
+            if not item['scanned']:
+                links = await self._loop.call(
+                    self._page_slots, self.highres.find_gallery_links, item['source_url']
+                )
+            await self._thumbnail_queue.put(
+                {'exhibition': item['exhibition'], 'source_url': item['source_url'], 'links': links}
+            )
+            return
+
+        ex_id, year = item['exhibition_id'], item['year']
+        stats = self.stats['exhibitions']
+        pages = [self._loop.call(self._page_slots, self.scraper.scrape_exhibition_page, ex_id, year)]
+        if self.scrape_english:
+            pages.append(self._loop.call(self._page_slots, self.scraper.scrape_exhibition_english, ex_id))
+        scraped, *english = await asyncio.gather(*pages)
+        if not scraped:
+            print(f"Exhibition {ex_id} ({year}): failed")
+            stats['failed'] += 1
+            await self._exhibition_done(year, failed=True)
+            return
+        data, page = scraped
+        if english and english[0]:
+            data.update(english[0])
+
+        db_id = await self._db_call(self._save, data, year)
+        await self._exhibition_done(year, failed=False)
+        if db_id is None:
+            stats['skipped'] += 1
+            return
+        stats['success'] += 1
+        with self.metrics.timer('parse'):
+            links = self.highres.extract_gallery_links(page)
+        print(f"Exhibition {ex_id} ({year}): saved, {len(data['images'])} images, "
+              f"{len(links)} gallery links")
+        await self._thumbnail_queue.put({
+            'exhibition': {'exhibition_db_id': db_id, 'exhibition_id': ex_id, 'year': year},
+            'source_url': data['source_url'],
+            'links': links,
+        })
+
+    def _save(self, data: dict, year: int) -> Optional[int]:
+        """Insert one exhibition; its database ID, or None if it already exists.
+
+        The year's checkpoint counts it in the same transaction.
+        """
+        self._flush_log(LOG_BATCH_SIZE)
+        conn = shared_connection(self.db_path)
+        try:
+            with self.metrics.timer('db_write'):
+                saved = insert_exhibitions_batch(conn, [data], self.known)
+                db_id = saved.get(data['exhibition_id'])
+                add_year_counts(conn, {year: {'success' if db_id is not None else 'skipped': 1}})
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return db_id
+
+    def _pending_thumbnails(self, ex: dict) -> tuple[list[tuple], list[tuple]]:
+        """An exhibition's thumbnails to download, and those already on disk.
+
+        Returns (image ID, URL, local path) downloads and (local path,
+        image ID) rows to record as skipped.
+        """
+        pending = shared_connection(self.db_path).execute(
+            "SELECT id, original_url, filename FROM images "
+            "WHERE exhibition_id = ? AND local_path IS NULL ORDER BY id",
+            (ex['exhibition_db_id'],)
+        ).fetchall()
+        downloads = []
+        skipped_rows = []
+        for img in pending:
+            local_path = self.images.get_local_path(ex['year'], ex['exhibition_id'], img['filename'])
+            if local_path.exists():
+                skipped_rows.append((str(local_path), img['id']))
+            else:
+                downloads.append((img['id'], img['original_url'], local_path))
+        return downloads, skipped_rows
+
+    def _record_thumbnails(self, downloaded_rows: list[tuple], skipped_rows: list[tuple]) -> None:
+        flush_updates(shared_connection(self.db_path), downloaded_rows, skipped_rows, self.metrics)
+
+    async def _thumbnails(self, item: dict) -> None:
+        """Download an exhibition's pending thumbnails, then queue its image_view pages."""
+        ex = item['exhibition']
+        downloads, skipped_rows = await self._db_call(self._pending_thumbnails, ex)
+        downloaded_rows: list[tuple] = []
+        fetches = [
+            asyncio.ensure_future(
+                self._loop.call(self._image_slots, self.images.download_image, url, local_path)
+            )
+            for _, url, local_path in downloads
+        ]
+        try:
+            await asyncio.gather(*fetches)
+        finally:
+            # Record what finished even if the sync is interrupted, like `main.py images`
+            for (image_id, _, local_path), fetch in zip(downloads, fetches):
+                if fetch.done() and not fetch.cancelled() and not fetch.exception() and fetch.result():
+                    downloaded_rows.append(downloaded_row(local_path, fetch.result(), image_id))
+            downloaded = len(downloaded_rows)
+            stats = self.stats['thumbnails']
+            stats['downloaded'] += downloaded
+            stats['skipped'] += len(skipped_rows)
+            await self._db_call(self._record_thumbnails, downloaded_rows, skipped_rows)
+
+        stats['failed'] += len(downloads) - downloaded
+        if downloads:
+            print(f"  Exhibition {ex['exhibition_id']}: {downloaded} thumbnails downloaded, "
+                  f"{len(downloads) - downloaded} failed")
+
+        if item['links'] is not None:
+            await self._db_call(
+                self._frontier.complete_url, 'gallery', item['source_url'], ex,
+                ('image_view', image_view_entries(ex, item['links']), ('failed',))
+            )
+            await self._lease_image_views((ex['year'], ex['year']))
+
+    async def _lease_image_views(self, years: tuple[int, int]) -> None:
+        """Lease due image_view pages in a range of years onto the image_views queue.
+
+        Leased a queue's worth at a time, so rows are not held long before
+        a worker gets to them.
+        """
+        while tasks := await self._db_call(self._frontier.lease, 'image_view', QUEUE_SIZE, years):
+            for task in tasks:
+                await self._image_view_queue.put(task)
+
+    async def _image_view(self, task: dict) -> None:
+        """Fetch, link and record one full-size image."""
+        stats = self.stats['full_size']
+        stats['total'] += 1
+        image_data = await self._loop.call(
+            self._view_slots, self.highres.fetch_image_view, task['payload']['image_view_id']
+        )
+        if await self._db_call(self._save_image_view, task, image_data):
+            stats['successful'] += 1
+        else:
+            stats['failed'] += 1
+
+    def _save_image_view(self, task: dict, image_data: Optional[dict]) -> bool:
+        """Save a fetched full-size image and settle its frontier row."""
+        if self.highres.save_image_view(task, image_data):
+            self._frontier.complete(task['id'])
+            return True
+        self._frontier.fail(task['id'], "image fetch failed")
+        return False
+
+
+async def _gather(*aws: Awaitable) -> None:
+    """Run coroutines together; the first to fail cancels the others."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _stage(outbox: asyncio.Queue, *aws: Awaitable) -> None:
+    """Run everything that feeds `outbox`, then close it."""
+    await _gather(*aws)
+    await outbox.put(_DONE)
+
+
+async def _drain(inbox: asyncio.Queue, handle: Callable[[dict], Awaitable], workers: int) -> None:
+    """Handle items from `inbox` with `workers` concurrent workers until it is closed."""
+    async def worker() -> None:
+        while (item := await inbox.get()) is not _DONE:
+            await handle(item)
+        await inbox.put(_DONE)  # for the other workers
+
+    await _gather(*(worker() for _ in range(workers)))
@@ -0,0 +1,268 @@
+"""Header-only image probing: format and dimensions without decoding.
+
+Only the few bytes each format needs are read: the IHDR chunk of a PNG,
+the logical screen of a GIF, the VP8/VP8L/VP8X header of a WebP, the
+'ispe' property of an AVIF/HEIF, and for JPEG the segment headers up to
+the first SOF marker (seeking over everything else). JPEG dimensions
+honour the EXIF orientation, so they match what a browser displays.
+"""
+
+import io
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from database import get_connection
+
+HEAD_SIZE = 64 * 1024  # bytes read for the container formats
+EXIF_READ_LIMIT = 8 * 1024  # IFD0 sits at the start of the APP1 segment
+MAX_JPEG_SEGMENTS = 64
+PROBE_WORKERS = 8
+UPDATE_BATCH_SIZE = 200
+
+MIME_TYPES = {
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'bmp': 'image/bmp',
+    'avif': 'image/avif',
+    'heic': 'image/heic',
+}
+
+# SOF markers carrying frame dimensions (not DHT/JPG/DAC, which share the range)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_EXIF_ORIENTATION = 0x0112
+
+
+def probe_file(path) -> Optional[dict]:
+    """Probe an image file; returns format, mime_type, width, height or None."""
+    try:
+        with open(path, 'rb') as f:
+            return probe_stream(f)
+    except OSError:
+        return None
+
+
+def probe_bytes(data: bytes) -> Optional[dict]:
+    return probe_stream(io.BytesIO(data))
+
+
+def probe_stream(f: BinaryIO) -> Optional[dict]:
+    """Probe a seekable binary stream positioned at the start of an image."""
+    head = f.read(32)
+    if head.startswith(b'\xff\xd8'):
+        f.seek(2)
+        size = _jpeg_size(f)
+        return _result('jpeg', size)
+    if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+        return _result('png', struct.unpack('>II', head[16:24]))
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return _result('gif', struct.unpack('<HH', head[6:10]))
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return _result('webp', _webp_size(head + f.read(8)))
+    if head.startswith(b'BM') and len(head) >= 26:
+        width, height = struct.unpack('<ii', head[18:26])
+        return _result('bmp', (width, abs(height)))
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        fmt = 'avif' if brand in (b'avif', b'avis') else 'heic' if brand in (b'heic', b'heix', b'mif1') else None
+        if fmt:
+            return _result(fmt, _ispe_size(head + f.read(HEAD_SIZE)))
+    return None
+
+
+def _result(fmt: str, size: Optional[tuple[int, int]]) -> Optional[dict]:
+    if not size or size[0] <= 0 or size[1] <= 0:
+        return None
+    return {'format': fmt, 'mime_type': MIME_TYPES[fmt], 'width': size[0], 'height': size[1]}
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[tuple[int, int]]:
+    """Walk JPEG segment headers up to the frame header."""
+    orientation = 1
+    for _ in range(MAX_JPEG_SEGMENTS):
+        byte = f.read(1)
+        if byte != b'\xff':
+            return None
+        while byte == b'\xff':  # markers may be padded with fill bytes
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # standalone markers have no length
+        if marker == 0xD9:
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0] - 2
+
+        if marker in _SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return (height, width) if orientation in (5, 6, 7, 8) else (width, height)
+        if marker == 0xE1:
+            segment = f.read(min(length, EXIF_READ_LIMIT))
+            orientation = _exif_orientation(segment) or orientation
+            f.seek(length - len(segment), io.SEEK_CUR)
+        else:
+            f.seek(length, io.SEEK_CUR)
+    return None
+
+
+def _exif_orientation(segment: bytes) -> Optional[int]:
+    """Read the orientation tag from IFD0 of an APP1 Exif segment."""
+    if not segment.startswith(b'Exif\x00\x00'):
+        return None
+    tiff = segment[6:]
+    order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if not order or len(tiff) < 8:
+        return None
+    offset = struct.unpack(order + 'I', tiff[4:8])[0]
+    if offset + 2 > len(tiff):
+        return None
+    count = struct.unpack(order + 'H', tiff[offset:offset + 2])[0]
+    for idx in range(count):
+        entry = tiff[offset + 2 + idx * 12:offset + 14 + idx * 12]
+        if len(entry) < 12:
+            return None
+        tag = struct.unpack(order + 'H', entry[:2])[0]
+        if tag == _EXIF_ORIENTATION:
+            return struct.unpack(order + 'H', entry[8:10])[0]
+    return None
+
+
+def _webp_size(head: bytes) -> Optional[tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and len(head) >= 30:
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and len(head) >= 25:
+        b0, b1, b2, b3 = head[21:25]
+        return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+    if chunk == b'VP8X' and len(head) >= 30:
+        return (
+            1 + int.from_bytes(head[24:27], 'little'),
+            1 + int.from_bytes(head[27:30], 'little'),
+        )
+    return None
+
+
+def _ispe_size(head: bytes) -> Optional[tuple[int, int]]:
+    """Size from the first 'ispe' (image spatial extents) property box."""
+    idx = head.find(b'ispe')
+    if idx < 4 or idx + 16 > len(head):
+        return None
+    return struct.unpack('>II', head[idx + 8:idx + 16])
+
+
+def check_complete(data) -> Optional[str]:
+    """Check that a whole image file (bytes or mmap) is structurally intact.
+
+    Verifies the header probes and that the format's end marker or
+    declared length is present, which catches truncated downloads.
+    Returns a description of the problem, or None when the file looks
+    complete. Formats without a cheap end check pass on a valid header.
+    """
+    info = probe_bytes(bytes(data[:HEAD_SIZE]))
+    if not info:
+        return "unrecognized or damaged header"
+    size = len(data)
+    fmt = info['format']
+    if fmt == 'jpeg':
+        # Some encoders append padding or trailers after EOI
+        if data.rfind(b'\xff\xd9', max(0, size - 4096)) == -1:
+            return "missing JPEG end-of-image marker"
+    elif fmt == 'png':
+        # Like JPEG, tolerate bytes appended after the final chunk
+        if data.rfind(b'\x00\x00\x00\x00IEND', max(0, size - 4096)) == -1:
+            return "missing PNG IEND chunk"
+    elif fmt == 'gif':
+        if data.rfind(b'\x3b', max(0, size - 16)) == -1:
+            return "missing GIF trailer"
+    elif fmt == 'webp':
+        declared = struct.unpack('<I', data[4:8])[0] + 8
+        if size < declared:
+            return f"truncated WebP ({size} of {declared} bytes)"
+    elif fmt == 'bmp':
+        declared = struct.unpack('<I', data[2:6])[0]
+        if declared and size < declared:
+            return f"truncated BMP ({size} of {declared} bytes)"
+    elif fmt in ('avif', 'heic'):
+        return _check_boxes(data, size)
+    return None
+
+
+def _check_boxes(data, size: int) -> Optional[str]:
+    """Walk top-level ISO BMFF boxes; the last one must end at the file end."""
+    offset = 0
+    while offset < size:
+        if offset + 8 > size:
+            return "truncated box header"
+        box_size = struct.unpack('>I', data[offset:offset + 4])[0]
+        if box_size == 1:
+            if offset + 16 > size:
+                return "truncated box header"
+            box_size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+        elif box_size == 0:
+            return None  # box extends to the end of the file
+        if box_size < 8:
+            return "invalid box size"
+        offset += box_size
+    return None if offset == size else f"truncated {data[4:8].decode('ascii', 'replace')} file"
+
+
+def probe_images(db_path: str = "kob_archive.db", workers: int = PROBE_WORKERS, reprobe: bool = False) -> dict:
+    """Fill width, height and mime_type for downloaded images from their headers.
+
+    Only rows missing any of the three are probed unless `reprobe` is set.
+    Files are read on a thread pool; the probe is I/O-bound and small.
+    """
+    stats = {'probed': 0, 'unreadable': 0, 'missing': 0}
+    conn = get_connection(db_path)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, local_path FROM images
+        WHERE local_path IS NOT NULL
+        {'' if reprobe else 'AND (width IS NULL OR height IS NULL OR mime_type IS NULL)'}
+    """)
+    rows = cursor.fetchall()
+    print(f"Probing {len(rows)} images on {workers} threads...")
+
+    def probe(row):
+        path = Path(row['local_path'])
+        return row['id'], probe_file(path) if path.exists() else False
+
+    start = time.monotonic()
+    updates = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for image_id, info in pool.map(probe, rows):
+                if info is False:
+                    stats['missing'] += 1
+                elif info is None:
+                    stats['unreadable'] += 1
+                else:
+                    stats['probed'] += 1
+                    updates.append((info['width'], info['height'], info['mime_type'], image_id))
+                if len(updates) >= UPDATE_BATCH_SIZE:
+                    _flush_probes(conn, updates)
+        _flush_probes(conn, updates)
+    finally:
+        conn.close()
+    print(f"  Done in {time.monotonic() - start:.1f}s")
+    return stats
+
+
+def _flush_probes(conn, updates: list[tuple]) -> None:
+    if not updates:
+        return
+    conn.executemany("UPDATE images SET width = ?, height = ?, mime_type = ? WHERE id = ?", updates)
+    conn.commit()
+    updates.clear()
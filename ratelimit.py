@@ -0,0 +1,153 @@
+"""Request rate limiting shared by the Kling & Bang archive scrapers."""
+
+import threading
+import time
+from typing import Optional
+
+DEFAULT_MIN_RATE = 0.2  # requests/sec the adaptive limiter never goes below
+DEFAULT_MAX_RATE = 2.0  # ... and never above, unless --max-rps says otherwise
+INCREASE_STEP = 0.5  # requests/sec added per second of healthy responses
+DECREASE_FACTOR = 0.5  # rate multiplier on an error or a latency spike
+LATENCY_FACTOR = 3.0  # a spike is this many times the best latency seen...
+LATENCY_FLOOR = 0.5  # ... and at least this many seconds
+LATENCY_SMOOTHING = 0.2  # weight of a new sample in the latency average
+
+
+class RateLimiter:
+    """Thread-safe token bucket capping requests per second to the host.
+
+    Every worker calls `acquire()` before sending a request, so the
+    politeness budget holds globally no matter how many threads crawl.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.waited = 0.0  # total seconds callers have spent in acquire()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_delay(cls, delay: float, max_rps: Optional[float] = None) -> "RateLimiter":
+        """Build a limiter from a legacy per-request delay or an explicit rate."""
+        if max_rps is not None:
+            return cls(max_rps)
+        return cls(1.0 / delay if delay > 0 else 0)
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; return seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            # Reserve a token now; a negative balance is the queue ahead of us
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Feedback from a finished request; a fixed-rate limiter ignores it."""
+
+    def snapshot(self) -> dict:
+        """Current rate and total wait, for progress and run reports."""
+        with self._lock:
+            return {'rate': self.rate, 'waited': self.waited}
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Token bucket whose rate follows the host's health (AIMD).
+
+    The fetch layer reports every response's latency and whether it
+    failed in a way that suggests overload (see fetcher.is_retryable).
+    Healthy responses raise the rate by INCREASE_STEP per second's worth
+    of requests; an error, or a smoothed latency above LATENCY_FACTOR
+    times the best seen, halves it, at most once per round trip so one
+    burst of in-flight failures counts once. The rate stays within
+    [min_rate, max_rate]; equal bounds give a fixed rate.
+    """
+
+    def __init__(self, rate: float, min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE):
+        self.min_rate = min(min_rate, max_rate)
+        self.max_rate = max_rate
+        super().__init__(min(max(rate, self.min_rate), self.max_rate))
+        self.latency: Optional[float] = None  # smoothed
+        self.best_latency: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self._next_decrease = 0.0
+
+    @classmethod
+    def from_delay(
+        cls,
+        delay: float,
+        max_rps: Optional[float] = None,
+        min_rps: Optional[float] = None
+    ) -> RateLimiter:
+        """Start at one request per `delay` and adapt within the bounds.
+
+        A zero delay without --max-rps keeps the old meaning: no limit.
+        """
+        if delay <= 0 and max_rps is None:
+            return RateLimiter(0)
+        max_rate = max_rps if max_rps is not None else DEFAULT_MAX_RATE
+        min_rate = min_rps if min_rps is not None else DEFAULT_MIN_RATE
+        return cls(1.0 / delay if delay > 0 else max_rate, min_rate, max_rate)
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.latency = latency if self.latency is None else (
+                LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * self.latency
+            )
+            if ok and (self.best_latency is None or latency < self.best_latency):
+                self.best_latency = latency
+            threshold = max(LATENCY_FLOOR, LATENCY_FACTOR * (self.best_latency or 0))
+
+            if not ok or self.latency > threshold:
+                if now >= self._next_decrease:
+                    self._set_rate(self.rate * DECREASE_FACTOR)
+                    self.decreases += 1
+                    self._next_decrease = now + max(self.latency, 1.0 / self.rate)
+            elif self.rate < self.max_rate:
+                # One step per rate-many successes: linear growth in time
+                self._set_rate(self.rate + INCREASE_STEP / self.rate)
+                self.increases += 1
+
+    def _set_rate(self, rate: float) -> None:
+        # Requests already queued keep their slots; the new rate spaces the rest
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'min_rate': self.min_rate,
+                'max_rate': self.max_rate,
+                'waited': self.waited,
+                'latency': self.latency,
+                'increases': self.increases,
+                'decreases': self.decreases,
+            }
+
+
+def describe_rate(limiter: RateLimiter) -> str:
+    """One-line summary of a limiter for end-of-run reports."""
+    snap = limiter.snapshot()
+    if not snap['rate']:
+        return "unlimited"
+    text = f"{snap['rate']:.2f} req/s"
+    if 'max_rate' in snap:
+        text += f" (adaptive {snap['min_rate']:g}-{snap['max_rate']:g}"
+        if snap['latency'] is not None:
+            text += f", latency {snap['latency'] * 1000:.0f} ms"
+        text += f", {snap['decreases']} slowdowns)"
+    return f"{text}; waited {snap['waited']:.1f}s"
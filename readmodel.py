@@ -0,0 +1,199 @@
+"""Denormalized read-model tables for the website.
+
+The website (website/src/lib/db.ts) only reads, and its list pages used to
+aggregate on every render: GROUP_CONCAT joins for exhibition cards, COUNT
+joins for the artist index and a full scan to resolve an artist slug.
+`main.py build-readmodel` materializes those results once instead:
+
+    exhibition_list     exhibitions in display order (year, then start
+                        date, newest first) with their artist names
+    artist_list         artists in name order with exhibition counts and
+                        the URL slug the website uses (indexed)
+    artist_exhibitions  each artist's exhibitions, in display order
+    year_counts         exhibitions and images per year
+    read_model_info     build time, totals and the schema version
+
+so every website query is a single indexed lookup or an ordered scan of
+one table. The tables are rebuilt from scratch in one transaction, so a
+reader sees either the old model or the new one. The website falls back
+to querying the base tables when read_model_info is missing or has a
+different version.
+"""
+
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from database import get_connection
+
+READ_MODEL_VERSION = 1
+
+# Mirrors slugify() in website/src/lib/utils.ts, which builds artist URLs
+_SLUG_FOLDS = (
+    ('[áàâä]', 'a'), ('[éèêë]', 'e'), ('[íìîï]', 'i'), ('[óòôö]', 'o'), ('[úùûü]', 'u'),
+    ('[ýÿ]', 'y'), ('[ðþ]', 'd'), ('æ', 'ae'), ('ø', 'o'), ('ß', 'ss'),
+)
+
+_TABLES = ('exhibition_list', 'artist_list', 'artist_exhibitions', 'year_counts', 'read_model_info')
+
+_SCHEMA = """
+    CREATE TABLE exhibition_list (
+        position INTEGER PRIMARY KEY,
+        id INTEGER NOT NULL UNIQUE,
+        exhibition_id INTEGER NOT NULL,
+        title_is TEXT NOT NULL,
+        title_en TEXT,
+        start_date DATE,
+        end_date DATE,
+        description_is TEXT,
+        description_en TEXT,
+        excerpt_is TEXT,
+        year INTEGER NOT NULL,
+        source_url TEXT NOT NULL,
+        artist_names TEXT
+    );
+    CREATE INDEX idx_exhibition_list_year ON exhibition_list(year, position);
+
+    CREATE TABLE artist_list (
+        position INTEGER PRIMARY KEY,
+        id INTEGER NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        normalized_name TEXT,
+        slug TEXT NOT NULL,
+        exhibition_count INTEGER NOT NULL
+    );
+    CREATE INDEX idx_artist_list_slug ON artist_list(slug, position);
+
+    CREATE TABLE artist_exhibitions (
+        artist_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        PRIMARY KEY (artist_id, position)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE year_counts (
+        year INTEGER PRIMARY KEY,
+        exhibitions INTEGER NOT NULL,
+        images INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE read_model_info (
+        version INTEGER NOT NULL,
+        built_at TIMESTAMP NOT NULL,
+        exhibitions INTEGER NOT NULL,
+        artists INTEGER NOT NULL,
+        images INTEGER NOT NULL
+    );
+"""
+
+_EXHIBITION_LIST_SQL = """
+    INSERT INTO exhibition_list
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY e.year DESC, e.start_date DESC, e.id),
+        e.id, e.exhibition_id, e.title_is, e.title_en, e.start_date, e.end_date,
+        e.description_is, e.description_en, e.excerpt_is, e.year, e.source_url,
+        (SELECT group_concat(name, ', ') FROM (
+            SELECT a.name FROM exhibition_artists ea
+            JOIN artists a ON a.id = ea.artist_id
+            WHERE ea.exhibition_id = e.id
+            ORDER BY ea.display_order
+        ))
+    FROM exhibitions e
+"""
+
+_ARTIST_EXHIBITIONS_SQL = """
+    INSERT INTO artist_exhibitions (artist_id, position)
+    SELECT ea.artist_id, el.position
+    FROM exhibition_artists ea
+    JOIN exhibition_list el ON el.id = ea.exhibition_id
+"""
+
+_YEAR_COUNTS_SQL = """
+    INSERT INTO year_counts (year, exhibitions, images)
+    SELECT e.year, COUNT(*), SUM((SELECT COUNT(*) FROM images i WHERE i.exhibition_id = e.id))
+    FROM exhibitions e
+    GROUP BY e.year
+"""
+
+
+def slugify(text: str) -> str:
+    """The website's artist URL slug for a name."""
+    text = text.lower()
+    for pattern, replacement in _SLUG_FOLDS:
+        text = re.sub(pattern, replacement, text)
+    return re.sub(r'[^a-z0-9]+', '-', text).strip('-')
+
+
+def build_read_model(db_path: str = "kob_archive.db") -> dict:
+    """Rebuild every read-model table from the base tables; returns row counts."""
+    start = time.monotonic()
+    conn = get_connection(db_path)
+    try:
+        artists = conn.execute("""
+            SELECT a.id, a.name, a.normalized_name,
+                   (SELECT COUNT(*) FROM exhibition_artists ea WHERE ea.artist_id = a.id) AS exhibition_count
+            FROM artists a
+            ORDER BY a.name COLLATE NOCASE, a.id
+        """).fetchall()
+
+        # One transaction: readers never see a half-built model
+        conn.execute("BEGIN IMMEDIATE")
+        for table in _TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for statement in _SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        conn.execute(_EXHIBITION_LIST_SQL)
+        conn.executemany(
+            "INSERT INTO artist_list (position, id, name, normalized_name, slug, exhibition_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(position, row['id'], row['name'], row['normalized_name'], slugify(row['name']),
+              row['exhibition_count'])
+             for position, row in enumerate(artists, 1)]
+        )
+        conn.execute(_ARTIST_EXHIBITIONS_SQL)
+        conn.execute(_YEAR_COUNTS_SQL)
+        stats = {
+            'exhibitions': conn.execute("SELECT COUNT(*) FROM exhibition_list").fetchone()[0],
+            'artists': len(artists),
+            'images': conn.execute("SELECT COALESCE(SUM(images), 0) FROM year_counts").fetchone()[0],
+            'years': conn.execute("SELECT COUNT(*) FROM year_counts").fetchone()[0],
+        }
+        conn.execute(
+            "INSERT INTO read_model_info (version, built_at, exhibitions, artists, images) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (READ_MODEL_VERSION, datetime.now().isoformat(),
+             stats['exhibitions'], stats['artists'], stats['images'])
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    stats['seconds'] = time.monotonic() - start
+    return stats
+
+
+def has_read_model(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'read_model_info'"
+    ).fetchone() is not None
+
+
+def refresh_read_model(db_path: str = "kob_archive.db") -> bool:
+    """Rebuild the read model if this database has one; True if it was rebuilt.
+
+    Called after commands that change what the website shows, so a
+    database that serves the website never has a stale model.
+    """
+    conn = get_connection(db_path)
+    try:
+        present = has_read_model(conn)
+    finally:
+        conn.close()
+    if present:
+        stats = build_read_model(db_path)
+        print(f"  Read model rebuilt ({stats['exhibitions']} exhibitions, "
+              f"{stats['artists']} artists) in {stats['seconds']:.2f}s")
+    return present
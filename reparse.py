@@ -0,0 +1,117 @@
+"""Rebuild exhibitions from the raw HTML snapshot archive.
+
+Runs the scraper's extraction over the pages kept in snapshots.db on a
+process pool, so a parsing fix reaches every stored exhibition in seconds
+without crawling the live site again.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from database import KnownKeys, get_connection, insert_exhibitions_batch, refresh_exhibition
+from scraper import KoBScraper
+from snapshots import SNAPSHOT_DB, SnapshotStore, decompress
+from writer import BATCH_SIZE
+
+# Per-process extractor, built once by the pool initializer
+_scraper: Optional[KoBScraper] = None
+
+
+def reparse_snapshots(
+    db_path: str = "kob_archive.db",
+    snapshot_path: str = SNAPSHOT_DB,
+    workers: Optional[int] = None,
+    parser: Optional[str] = None,
+    batch_size: int = BATCH_SIZE
+) -> dict:
+    """Re-extract every stored exhibition page and write the results.
+
+    New exhibitions are inserted; existing ones are compared field by field
+    (ignoring fingerprints) and updated through refresh_exhibition, so
+    download state in the images table is kept and every change is
+    recorded in exhibition_changes.
+    """
+    stats = {'total': 0, 'success': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+    workers = workers or os.cpu_count() or 1
+
+    with SnapshotStore(snapshot_path) as store:
+        pages = store.exhibition_pages()
+        year_pages = list(store.year_pages())
+
+    conn = get_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT exhibition_id, year FROM exhibitions")
+        years = {row['exhibition_id']: row['year'] for row in cursor.fetchall()}
+        existing = set(years)
+        known = KnownKeys(conn)
+
+        # The list pages are authoritative for years; stored rows fill the gaps
+        _init_worker(parser)
+        for year, body in year_pages:
+            page = _scraper.parse(decompress(body).decode('iso-8859-1'))
+            for ex_id in _scraper.extract_exhibition_ids(page):
+                years[ex_id] = year
+
+        tasks = []
+        for ex_id in sorted(pages):
+            if 'is' not in pages[ex_id]:
+                continue
+            stats['total'] += 1
+            if ex_id not in years:
+                print(f"  Exhibition {ex_id}: no year known, skipping")
+                stats['failed'] += 1
+                continue
+            url, body = pages[ex_id]['is']
+            en_body = pages[ex_id]['en'][1] if 'en' in pages[ex_id] else None
+            tasks.append((ex_id, years[ex_id], url, body, en_body))
+
+        print(f"Re-parsing {len(tasks)} exhibitions from {snapshot_path} on {workers} processes...")
+        start = time.monotonic()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(parser,)
+        ) as pool:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = pool.map(_extract, tasks, chunksize=chunksize)
+
+            batch = []
+            for data in results:
+                if data['exhibition_id'] in existing:
+                    if refresh_exhibition(conn, data, force=True, known=known):
+                        stats['updated'] += 1
+                    else:
+                        stats['skipped'] += 1
+                    continue
+                batch.append(data)
+                if len(batch) >= batch_size:
+                    stats['success'] += len(insert_exhibitions_batch(conn, batch, known))
+                    batch.clear()
+            if batch:
+                stats['success'] += len(insert_exhibitions_batch(conn, batch, known))
+
+        conn.commit()
+        print(f"  Done in {time.monotonic() - start:.1f}s")
+    finally:
+        conn.close()
+
+    return stats
+
+
+def _init_worker(parser: Optional[str]) -> None:
+    global _scraper
+    _scraper = KoBScraper(parser=parser)
+
+
+def _extract(task: tuple) -> dict:
+    """Rebuild one exhibition's scraped data from its stored pages."""
+    exhibition_id, year, url, body, en_body = task
+    page = _scraper.parse(decompress(body).decode('iso-8859-1'))
+    data = _scraper.extract_exhibition(page, exhibition_id, year, url)
+    if en_body:
+        en_page = _scraper.parse(decompress(en_body).decode('iso-8859-1'))
+        en_data = _scraper.extract_english(en_page)
+        if en_data:
+            data.update(en_data)
+    return data
@@ -6,96 +6,133 @@ Fetches full-resolution images from image_view.php pages and links them
 to the correct exhibitions in the database.
 """
 
+import argparse
 import re
 import os
-import time
-import sqlite3
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+
+from blobstore import BlobStore
+from database import KnownKeys, init_database, shared_connection, wal_mode
+from frontier import CrawlFrontier
+from fetcher import Fetcher
+from fetchloop import fetch_loop
+from http_cache import CACHE_DIR, ResponseCache
+from metrics import RunMetrics, TimingAdapter, record_run
+from parsers import BACKENDS, find_image, get_parser
+from probe import probe_file
+from readmodel import refresh_read_model
+from ratelimit import DEFAULT_MAX_RATE, AdaptiveRateLimiter, describe_rate
 
 BASE_URL = "http://kob.this.is/klingogbang/"
 HEADERS = {
     "User-Agent": "KlingBangArchiveScraper/1.0 (Historical archive project)",
 }
-REQUEST_DELAY = 1.0
+REQUEST_DELAY = 1.0  # starting seconds between requests; the limiter adapts
+HIGHRES_KINDS = ('gallery', 'image_view')
+LEASE_BATCH = 20  # image_view pages leased at a time
 
 
 class HighResScraper:
-    def __init__(self, db_path: str = "kob_archive.db", images_dir: str = "images"):
+    def __init__(
+        self,
+        db_path: str = "kob_archive.db",
+        images_dir: str = "images",
+        cache: ResponseCache | None = None,
+        parser: str | None = None,
+        delay: float = REQUEST_DELAY,
+        max_rps: float | None = None,
+        min_rps: float | None = None,
+        metrics: RunMetrics | None = None,
+        workers: int = 1,
+        known: KnownKeys | None = None
+    ):
         self.db_path = db_path
+        self.workers = max(1, workers)
         self.images_dir = Path(images_dir)
+        self.cache = cache
+        self.parse = get_parser(parser)
+        self.blobs = BlobStore(images_dir)
+        # Image keys already in the database, loaded once (see update_database)
+        # unless the caller shares the KnownKeys its own inserts keep current
+        self._known = known
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
+        adapter = TimingAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.metrics = metrics or RunMetrics('highres')
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(delay, max_rps, min_rps)
+        self.fetcher = Fetcher(self.session, cache, limiter=self.rate_limiter, metrics=self.metrics)
 
     def get_all_exhibitions(self):
         """Get all exhibitions from database."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
+        return shared_connection(self.db_path).execute("""
             SELECT id, exhibition_id, year, source_url
             FROM exhibitions
             ORDER BY year DESC
-        """)
-        exhibitions = cursor.fetchall()
-        conn.close()
-        return exhibitions
+        """).fetchall()
 
-    def find_gallery_links(self, exhibition_url: str) -> list[dict]:
-        """Find all image_view.php links on an exhibition page."""
+    def find_gallery_links(self, exhibition_url: str) -> list[dict] | None:
+        """Find all image_view.php links on an exhibition page (None if it failed)."""
         try:
-            time.sleep(REQUEST_DELAY)
-            response = self.session.get(exhibition_url, timeout=30)
+            response = self.fetcher.get(exhibition_url)
             response.encoding = 'iso-8859-1'
-            soup = BeautifulSoup(response.text, 'html.parser')
+            with self.metrics.timer('parse'):
+                page = self.parse(response.text)
+            return self.extract_gallery_links(page)
 
-            gallery_links = []
+        except Exception as e:
+            print(f"  Error parsing {exhibition_url}: {e}")
+            return None
 
-            # Find all links to image_view.php
-            for link in soup.find_all('a', href=re.compile(r'image_view\.php\?id=\d+')):
-                match = re.search(r'id=(\d+)', link['href'])
-                if match:
-                    image_view_id = int(match.group(1))
+    def extract_gallery_links(self, page: dict) -> list[dict]:
+        """Extract the image_view.php links from a parsed exhibition page."""
+        gallery_links = []
 
-                    # Get thumbnail info from the linked image
-                    thumbnail_img = link.find('img')
-                    if thumbnail_img:
-                        src = thumbnail_img.get('src', '')
-                        filename = Path(urlparse(src).path).name
+        # Find all links to image_view.php
+        for link in page['links']:
+            match = re.search(r'image_view\.php\?id=(\d+)', link['href'])
+            if match:
+                image_view_id = int(match.group(1))
 
-                        # Skip head.jpg
-                        if filename == 'head.jpg':
-                            continue
+                # Get thumbnail info from the linked image
+                thumbnail_img = link['img']
+                if thumbnail_img:
+                    src = thumbnail_img['src']
+                    filename = Path(urlparse(src).path).name
 
-                        gallery_links.append({
-                            'image_view_id': image_view_id,
-                            'thumbnail_src': src,
-                            'thumbnail_filename': filename,
-                            'alt_text': thumbnail_img.get('alt', ''),
-                        })
+                    # Skip head.jpg
+                    if filename == 'head.jpg':
+                        continue
 
-            return gallery_links
+                    gallery_links.append({
+                        'image_view_id': image_view_id,
+                        'thumbnail_src': src,
+                        'thumbnail_filename': filename,
+                        'alt_text': thumbnail_img['alt'],
+                    })
 
-        except Exception as e:
-            print(f"  Error parsing {exhibition_url}: {e}")
-            return []
+        return gallery_links
 
     def fetch_full_res_image(self, image_view_id: int) -> dict | None:
-        """Fetch full-resolution image from image_view.php page."""
+        """Fetch full-resolution image from image_view.php page.
+
+        The returned 'response' has its body unread; save_image streams it
+        to disk so originals are never held in memory.
+        """
         url = f"{BASE_URL}image_view.php?id={image_view_id}"
 
         try:
-            time.sleep(REQUEST_DELAY)
-            response = self.session.get(url, timeout=30)
+            response = self.fetcher.get(url, stream=True)
             content_type = response.headers.get('Content-Type', '')
 
             # Case 1: Direct image file
             if content_type.startswith('image/'):
                 return {
-                    'content': response.content,
+                    'response': response,
                     'content_type': content_type,
                     'source_url': url,
                 }
@@ -103,43 +140,71 @@ class HighResScraper:
             # Case 2: HTML page with image
             if 'text/html' in content_type:
                 response.encoding = 'iso-8859-1'
-                soup = BeautifulSoup(response.text, 'html.parser')
+                with self.metrics.timer('parse'):
+                    page = self.parse(response.text)
 
                 # Find the main image
                 img_tag = (
-                    soup.find('img', class_='img_main') or
-                    soup.find('img', class_='img') or
-                    soup.find('img')
+                    find_image(page, 'img_main') or
+                    find_image(page, 'img') or
+                    find_image(page)
                 )
 
-                if img_tag and img_tag.get('src'):
+                if img_tag and img_tag['src']:
                     img_url = urljoin(url, img_tag['src'])
                     # Skip head.jpg
                     if 'head.jpg' in img_url:
                         return None
 
-                    img_response = self.session.get(img_url, timeout=30)
+                    img_response = self.fetcher.get(img_url, stream=True)
                     return {
-                        'content': img_response.content,
+                        'response': img_response,
                         'content_type': img_response.headers.get('Content-Type', 'image/jpeg'),
                         'source_url': img_url,
                     }
 
+            response.close()
             return None
 
         except Exception as e:
             print(f"    Error fetching image_view {image_view_id}: {e}")
             return None
 
+    def store_image(self, image_view_id: int, image_data: dict) -> bool:
+        """Read a fetched image's body into the blob store.
+
+        Bytes already held (by hash, or by an ETag/length hint before the
+        body is read) are not written again. Adds 'digest', 'file_size'
+        and 'etag' to `image_data`; False if the body could not be stored.
+        """
+        response = image_data['response']
+        etag = response.headers.get('ETag')
+        try:
+            digest = self.blobs.match_hint(response.headers)
+            if digest:
+                response.close()
+                file_size = self.blobs.blob_path(digest).stat().st_size
+            else:
+                with self.metrics.timer('download'):
+                    digest, file_size, _ = self.blobs.ingest(response)
+                self.metrics.count('bytes', file_size)
+                self.blobs.remember(etag, digest, file_size)
+        except (requests.exceptions.RequestException, OSError) as e:
+            print(f"    Failed to store image_view #{image_view_id}: {e}")
+            return False
+        image_data.update(digest=digest, file_size=file_size, etag=etag)
+        return True
+
     def save_image(self, year: int, exhibition_id: int, image_view_id: int,
                    thumbnail_filename: str, image_data: dict) -> dict | None:
-        """Save full-resolution image to disk."""
+        """Store a full-resolution image in the blob store and link it into place."""
         if not image_data:
             return None
+        if 'digest' not in image_data and not self.store_image(image_view_id, image_data):
+            return None
+        digest = image_data['digest']
 
-        # Create directory
         img_dir = self.images_dir / str(year) / str(exhibition_id)
-        img_dir.mkdir(parents=True, exist_ok=True)
 
         # Determine filename - use image_view_id to ensure uniqueness
         base_name = Path(thumbnail_filename).stem if thumbnail_filename else f"img_{image_view_id}"
@@ -154,132 +219,266 @@ class HighResScraper:
         ext = ext_map.get(image_data['content_type'], '.jpg')
         filename = f"{base_name}{ext}"
 
-        # Avoid overwriting - add image_view_id if file exists
+        # Avoid overwriting different bytes - add image_view_id if file exists
         filepath = img_dir / filename
-        if filepath.exists():
+        if filepath.exists() and not self.blobs.holds(digest, filepath):
             filename = f"{base_name}_{image_view_id}{ext}"
             filepath = img_dir / filename
 
-        # Save
-        with open(filepath, 'wb') as f:
-            f.write(image_data['content'])
+        try:
+            self.blobs.link(digest, filepath)
+        except OSError as e:
+            print(f"    Failed to save {filepath}: {e}")
+            return None
+        with self.metrics.timer('parse'):
+            info = probe_file(self.blobs.blob_path(digest)) or {}
 
         return {
             'filename': filename,
             'local_path': str(filepath),
             'original_url': image_data['source_url'],
-            'file_size': len(image_data['content']),
+            'file_size': image_data['file_size'],
+            'mime_type': info.get('mime_type') or image_data['content_type'],
+            'width': info.get('width'),
+            'height': info.get('height'),
+            'content_hash': digest,
+            'etag': image_data['etag'],
             'image_view_id': image_view_id,
         }
 
     def update_database(self, exhibition_db_id: int, image_info: dict, alt_text: str):
         """Insert or update image record in database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Check if this image_view_id already exists for this exhibition
-        cursor.execute("""
-            SELECT id FROM images
-            WHERE exhibition_id = ? AND filename = ?
-        """, (exhibition_db_id, image_info['filename']))
-        existing = cursor.fetchone()
-
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE images SET
-                    local_path = ?,
-                    original_url = ?,
-                    file_size = ?,
-                    downloaded_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (
-                image_info['local_path'],
-                image_info['original_url'],
-                image_info['file_size'],
-                existing[0]
-            ))
-        else:
-            # Insert new record
-            cursor.execute("""
-                INSERT INTO images (
-                    exhibition_id, filename, original_url, local_path,
-                    alt_text, file_size, downloaded_at
-                ) VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """, (
-                exhibition_db_id,
-                image_info['filename'],
-                image_info['original_url'],
-                image_info['local_path'],
-                alt_text,
-                image_info['file_size'],
-            ))
-
-        conn.commit()
-        conn.close()
+        conn = shared_connection(self.db_path)
+        if self._known is None:
+            self._known = KnownKeys(conn, images=True)
+        key = (exhibition_db_id, image_info['filename'])
+
+        # The transaction commits on success and rolls back on error, so
+        # the shared connection is never left mid-transaction
+        with conn:
+            cursor = conn.cursor()
+
+            # Check if this image already exists for this exhibition
+            if self._known.has_image(conn, *key):
+                # Update existing record
+                cursor.execute("""
+                    UPDATE images SET
+                        local_path = ?,
+                        original_url = ?,
+                        file_size = ?,
+                        mime_type = ?,
+                        width = ?,
+                        height = ?,
+                        content_hash = ?,
+                        etag = ?,
+                        downloaded_at = CURRENT_TIMESTAMP
+                    WHERE exhibition_id = ? AND filename = ?
+                """, (
+                    image_info['local_path'],
+                    image_info['original_url'],
+                    image_info['file_size'],
+                    image_info['mime_type'],
+                    image_info['width'],
+                    image_info['height'],
+                    image_info['content_hash'],
+                    image_info['etag'],
+                    *key
+                ))
+            else:
+                # Insert new record
+                cursor.execute("""
+                    INSERT INTO images (
+                        exhibition_id, filename, original_url, local_path,
+                        alt_text, file_size, mime_type, width, height,
+                        content_hash, etag, downloaded_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """, (
+                    exhibition_db_id,
+                    image_info['filename'],
+                    image_info['original_url'],
+                    image_info['local_path'],
+                    alt_text,
+                    image_info['file_size'],
+                    image_info['mime_type'],
+                    image_info['width'],
+                    image_info['height'],
+                    image_info['content_hash'],
+                    image_info['etag'],
+                ))
+        self._known.add_images([key])
 
     def scrape_all(self):
-        """Main method to scrape all high-res images."""
-        exhibitions = self.get_all_exhibitions()
-        print(f"Processing {len(exhibitions)} exhibitions for high-res images...\n")
-
-        total_images = 0
-        successful = 0
-        failed = 0
-
-        for idx, ex in enumerate(exhibitions, 1):
-            print(f"[{idx}/{len(exhibitions)}] Exhibition {ex['exhibition_id']} ({ex['year']})")
-
-            # Find gallery links on the page
-            gallery_links = self.find_gallery_links(ex['source_url'])
-
-            if not gallery_links:
-                print("  No gallery images found")
-                continue
-
-            print(f"  Found {len(gallery_links)} gallery images")
-
-            for link in gallery_links:
-                total_images += 1
-                image_view_id = link['image_view_id']
-
-                # Fetch full-res image
-                image_data = self.fetch_full_res_image(image_view_id)
-
-                if image_data:
-                    # Save to disk
-                    image_info = self.save_image(
-                        ex['year'],
-                        ex['exhibition_id'],
-                        image_view_id,
-                        link['thumbnail_filename'],
-                        image_data
-                    )
-
-                    if image_info:
-                        # Update database
-                        self.update_database(ex['id'], image_info, link['alt_text'])
-                        print(f"    Saved: {image_info['filename']}")
-                        successful += 1
-                    else:
-                        failed += 1
-                else:
-                    print(f"    Failed: image_view #{image_view_id}")
-                    failed += 1
+        """Main method to scrape all high-res images.
+
+        Work goes through the crawl frontier (see frontier.py): one gallery
+        row per exhibition page, which queues an image_view row per linked
+        image. A stopped run resumes from the rows left; image_view pages
+        already done are not requested again on later runs either.
+        """
+        conn = shared_connection(self.db_path)
+        self.blobs.load_hints(conn)
+        self._known = KnownKeys(conn, images=True)
+
+        frontier = CrawlFrontier(self.db_path)
+        try:
+            remaining = frontier.unfinished(HIGHRES_KINDS)
+            if remaining:
+                print(f"Resuming interrupted run: {remaining} pages left\n")
+            else:
+                exhibitions = self.get_all_exhibitions()
+                frontier.add('gallery', [
+                    (ex['source_url'], {'exhibition_db_id': ex['id'],
+                                        'exhibition_id': ex['exhibition_id'], 'year': ex['year']})
+                    for ex in exhibitions
+                ], reset=('done', 'failed'))
+                print(f"Processing {len(exhibitions)} exhibitions for high-res images...\n")
+
+            total_images = 0
+            successful = 0
+            failed = 0
+
+            # Pages and images are fetched on the shared fetch loop, `workers`
+            # at a time; naming, linking and database writes stay on this
+            # thread in frontier order, so any worker count gives the same rows
+            loop = fetch_loop()
+            slots = loop.slots(self.workers)
+            while tasks := frontier.lease('gallery', self.workers):
+                futures = [loop.submit(loop.call(slots, self.find_gallery_links, task['url']))
+                           for task in tasks]
+                for task, future in zip(tasks, futures):
+                    self._scan_gallery(frontier, task, future.result())
+
+            while tasks := frontier.lease('image_view', LEASE_BATCH * self.workers):
+                futures = [
+                    loop.submit(loop.call(slots, self.fetch_image_view, task['payload']['image_view_id']))
+                    for task in tasks
+                ]
+                try:
+                    for task, future in zip(tasks, futures):
+                        total_images += 1
+                        if self.save_image_view(task, future.result()):
+                            frontier.complete(task['id'])
+                            successful += 1
+                        else:
+                            frontier.fail(task['id'], "image fetch failed")
+                            failed += 1
+                finally:
+                    for future in futures:
+                        future.cancel()
+
+            deferred = frontier.unfinished(HIGHRES_KINDS)
+        finally:
+            frontier.release()
+            frontier.close()
 
         print(f"\n{'='*60}")
         print("High-res scraping complete!")
         print(f"  Total images processed: {total_images}")
         print(f"  Successful: {successful}")
         print(f"  Failed: {failed}")
+        if deferred:
+            print(f"  Queued for retry: {deferred}")
+        print(f"  Request rate: {describe_rate(self.rate_limiter)}")
         print(f"{'='*60}")
 
         return {'total': total_images, 'successful': successful, 'failed': failed}
 
+    def _scan_gallery(self, frontier: CrawlFrontier, task: dict, gallery_links: list[dict] | None) -> None:
+        """Queue the image_view pages linked from one exhibition page."""
+        ex = task['payload']
+        print(f"Exhibition {ex['exhibition_id']} ({ex['year']})")
+
+        if gallery_links is None:
+            frontier.fail(task['id'], "exhibition page fetch failed")
+            return
+        if not gallery_links:
+            print("  No gallery images found")
+        else:
+            print(f"  Found {len(gallery_links)} gallery images")
+
+        entries = image_view_entries(ex, gallery_links)
+        frontier.complete(task['id'], children=('image_view', entries, ('failed',)))
+
+    def fetch_image_view(self, image_view_id: int) -> dict | None:
+        """Fetch one full-resolution image into the blob store (runs on the fetch loop)."""
+        image_data = self.fetch_full_res_image(image_view_id)
+        if image_data and not self.store_image(image_view_id, image_data):
+            return None
+        return image_data
+
+    def save_image_view(self, task: dict, image_data: dict | None) -> bool:
+        """Link and record one fetched full-resolution image."""
+        link = task['payload']
+        image_view_id = link['image_view_id']
+
+        if not image_data:
+            print(f"    Failed: image_view #{image_view_id}")
+            return False
+
+        # Save to disk
+        image_info = self.save_image(
+            link['year'],
+            link['exhibition_id'],
+            image_view_id,
+            link['thumbnail_filename'],
+            image_data
+        )
+        if not image_info:
+            return False
+
+        # Update database
+        with self.metrics.timer('db_write'):
+            self.update_database(link['exhibition_db_id'], image_info, link['alt_text'])
+        print(f"    Saved: {image_info['filename']}")
+        return True
+
+
+def image_view_entries(exhibition: dict, gallery_links: list[dict]) -> list[tuple[str, dict]]:
+    """Frontier entries for an exhibition's image_view pages.
+
+    `exhibition` holds the exhibition_db_id, exhibition_id and year that
+    save_image_view needs; each payload adds one gallery link to it.
+    """
+    return [
+        (f"{BASE_URL}image_view.php?id={link['image_view_id']}", {**exhibition, **link})
+        for link in gallery_links
+    ]
+
 
 def main():
-    scraper = HighResScraper()
-    scraper.scrape_all()
+    global BASE_URL
+    parser = argparse.ArgumentParser(description="Kling & Bang high-res image scraper")
+    parser.add_argument('--db', default='kob_archive.db', help='Database path')
+    parser.add_argument('--images-dir', default='images', help='Images directory')
+    parser.add_argument('--base-url', default=BASE_URL, help='Archive site to scrape')
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help='HTTP response cache directory')
+    parser.add_argument('--offline', action='store_true', help='Parse pages from the cache only')
+    parser.add_argument('--parser', choices=sorted(BACKENDS),
+                        help='HTML parser backend (default: lxml if installed)')
+    parser.add_argument('--delay', type=float, default=REQUEST_DELAY,
+                        help='Starting delay between requests; the rate adapts from there')
+    parser.add_argument('--min-rps', type=float, help='Lowest adaptive request rate')
+    parser.add_argument('--max-rps', type=float,
+                        help='Adaptive ceiling in requests/sec: the rate climbs toward it while '
+                             'the site responds well and backs off on errors '
+                             f'(default: {DEFAULT_MAX_RATE:g})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Pages and images fetched in parallel (default: 1)')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Also write run metrics as JSON (Prometheus text if FILE ends in .prom)')
+    args = parser.parse_args()
+    BASE_URL = args.base_url
+
+    init_database(args.db)
+    cache = ResponseCache(args.cache_dir, offline=args.offline)
+    scraper = HighResScraper(
+        args.db, args.images_dir, cache=cache, parser=args.parser,
+        delay=args.delay, max_rps=args.max_rps, min_rps=args.min_rps, workers=args.workers
+    )
+    with wal_mode(args.db):
+        stats = scraper.scrape_all()
+        record_run(args.db, scraper.metrics, stats, scraper.rate_limiter.snapshot(), args.metrics)
+        refresh_read_model(args.db)
 
 
 if __name__ == "__main__":
@@ -1,23 +1,40 @@
 """Web scraper for Kling & Bang gallery archive."""
 
+import asyncio
 import re
-import time
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Callable, Iterator, Optional
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
 
 from database import (
-    get_connection,
-    exhibition_exists,
-    insert_exhibition,
-    get_or_create_artist,
-    link_artist_to_exhibition,
-    insert_image,
+    KnownKeys,
+    add_year_counts,
+    finish_year_checkpoint,
+    get_year_checkpoints,
+    insert_exhibitions_batch,
     log_scrape,
+    shared_connection,
+    start_year_checkpoint,
 )
+from frontier import CrawlFrontier
+from fetcher import Fetcher
+from fetchloop import FetchLoop, fetch_loop
+from http_cache import ResponseCache
+from metrics import RunMetrics, TimingAdapter
+from parsers import (
+    find_fragment,
+    find_fragments,
+    fragment_text,
+    get_parser,
+    page_fingerprint,
+)
+from ratelimit import AdaptiveRateLimiter
+from snapshots import SnapshotStore
+from writer import BATCH_SIZE, ExhibitionWriter
 
 BASE_URL = "http://kob.this.is/klingogbang/"
 HEADERS = {
@@ -25,52 +42,131 @@ HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     "Accept-Language": "is,en;q=0.5",
 }
-REQUEST_DELAY = 1.5  # seconds between requests
+REQUEST_DELAY = 1.5  # starting seconds between requests; the limiter adapts from here
+CRAWL_KINDS = ('year', 'exhibition')
+LEASE_BATCH = 8  # exhibitions leased per worker at a time
 
 
 class KoBScraper:
     """Scraper for Kling & Bang gallery website."""
 
-    def __init__(self, db_path: str = "kob_archive.db", delay: float = REQUEST_DELAY):
+    def __init__(
+        self,
+        db_path: str = "kob_archive.db",
+        delay: float = REQUEST_DELAY,
+        workers: int = 1,
+        max_rps: Optional[float] = None,
+        min_rps: Optional[float] = None,
+        batch_size: int = BATCH_SIZE,
+        cache: Optional[ResponseCache] = None,
+        refresh: bool = False,
+        parser: Optional[str] = None,
+        snapshots: Optional[SnapshotStore] = None,
+        metrics: Optional[RunMetrics] = None
+    ):
         self.db_path = db_path
         self.delay = delay
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.cache = cache
+        # Re-check existing exhibitions and update the ones whose pages changed
+        self.refresh = refresh
+        self.parse = get_parser(parser)
+        # Raw copies of every fetched page, for `main.py reparse`
+        self.snapshots = snapshots
+        self._writer: Optional[ExhibitionWriter] = None
+        # Takes (url, status, error, response code) log entries instead of
+        # the database when set; the sync pipeline writes them on its own thread
+        self.log_sink: Optional[Callable[[tuple], None]] = None
+        # Exhibitions and artists already saved; loaded on first use
+        self._known: Optional[KnownKeys] = None
+        # Where the run's time goes, for `main.py stats --runs`
+        self.metrics = metrics or RunMetrics('scrape')
+        # One budget for the whole crawl, paced by how the host is coping
+        self.rate_limiter = AdaptiveRateLimiter.from_delay(delay, max_rps, min_rps)
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
-
-    def _fetch(self, url: str) -> Optional[BeautifulSoup]:
-        """Fetch a URL and return parsed BeautifulSoup object."""
-        conn = get_connection(self.db_path)
+        adapter = TimingAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Retries transient failures and pauses the crawl if the host degrades
+        self.fetcher = Fetcher(self.session, cache, limiter=self.rate_limiter, metrics=self.metrics)
+
+    def _fetch(self, url: str) -> Optional[dict]:
+        """Fetch a URL and return the parsed page (see parsers.py)."""
         try:
-            time.sleep(self.delay)
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
+            response = self.fetcher.get(url)
 
             # Handle ISO-8859-1 encoding for Icelandic characters
             response.encoding = 'iso-8859-1'
             content = response.text
+            if self.snapshots:
+                self.snapshots.save(url, response.content)
 
-            log_scrape(conn, url, 'success', response_code=response.status_code)
-            return BeautifulSoup(content, 'html.parser')
+            self._log_scrape(url, 'success', response_code=response.status_code)
+            with self.metrics.timer('parse'):
+                return self.parse(content)
 
         except requests.exceptions.RequestException as e:
             error_msg = str(e)
             status_code = getattr(e.response, 'status_code', None) if hasattr(e, 'response') else None
-            log_scrape(conn, url, 'failed', error_msg, status_code)
+            self._log_scrape(url, 'failed', error_msg, status_code)
             print(f"Error fetching {url}: {error_msg}")
             return None
-        finally:
-            conn.close()
+
+    def _log_scrape(
+        self,
+        url: str,
+        status: str,
+        error_message: Optional[str] = None,
+        response_code: Optional[int] = None
+    ) -> None:
+        """Log a fetch through the active writer or log sink, or directly if there is none."""
+        if self._writer:
+            self._writer.log(url, status, error_message, response_code)
+            return
+        if self.log_sink:
+            self.log_sink((url, status, error_message, response_code))
+            return
+        log_scrape(shared_connection(self.db_path), url, status, error_message, response_code)
+
+    def _known_keys(self) -> KnownKeys:
+        """The archive's exhibition IDs and artists, loaded once and kept in sync."""
+        if self._known is None:
+            self._known = KnownKeys(shared_connection(self.db_path))
+        return self._known
+
+    @contextmanager
+    def writing(self) -> Iterator[ExhibitionWriter]:
+        """Route saves and log entries through one batched writer thread."""
+        if self._writer:
+            yield self._writer
+            return
+        with ExhibitionWriter(
+            self.db_path, batch_size=self.batch_size, metrics=self.metrics, known=self._known_keys()
+        ) as writer:
+            self._writer = writer
+            try:
+                yield writer
+            finally:
+                self._writer = None
 
     def get_exhibition_ids_for_year(self, year: int) -> list[int]:
         """Get all exhibition IDs from a year's archive list."""
-        url = f"{BASE_URL}archive_list.php?year={year}"
-        soup = self._fetch(url)
-        if not soup:
+        page = self.get_year_page(year)
+        if not page:
             return []
+        return self.extract_exhibition_ids(page)
+
+    def get_year_page(self, year: int) -> Optional[dict]:
+        """Fetch a year's parsed archive list page, or None if the fetch failed."""
+        return self._fetch(self._year_url(year))
 
+    def extract_exhibition_ids(self, page: dict) -> list[int]:
+        """Extract exhibition IDs from a parsed archive list page."""
         exhibition_ids = []
         # Find all "meira" (more) links
-        for link in soup.find_all('a', href=True):
+        for link in page['links']:
             href = link['href']
             if 'archive_view.php?id=' in href:
                 match = re.search(r'id=(\d+)', href)
@@ -138,48 +234,57 @@ class KoBScraper:
 
     def scrape_exhibition(self, exhibition_id: int, year: int) -> Optional[dict]:
         """Scrape a single exhibition detail page."""
+        scraped = self.scrape_exhibition_page(exhibition_id, year)
+        return scraped[0] if scraped else None
+
+    def scrape_exhibition_page(self, exhibition_id: int, year: int) -> Optional[tuple[dict, dict]]:
+        """Scrape a detail page; returns the exhibition data and the parsed page."""
         url = f"{BASE_URL}archive_view.php?id={exhibition_id}"
-        soup = self._fetch(url)
-        if not soup:
+        page = self._fetch(url)
+        if not page:
             return None
+        return self.extract_exhibition(page, exhibition_id, year, url), page
 
+    def extract_exhibition(self, page: dict, exhibition_id: int, year: int, url: str) -> dict:
+        """Extract exhibition data from a parsed Icelandic detail page."""
         data = {
             'exhibition_id': exhibition_id,
             'year': year,
             'source_url': url,
             'artists': [],
             'images': [],
+            'page_fingerprint': page_fingerprint(page),
         }
 
         # Extract artist names from .arc_view_head
-        head = soup.find(class_='arc_view_head')
+        head = find_fragment(page, 'arc_view_head')
         if head:
-            artist_text = head.get_text(strip=True)
+            artist_text = fragment_text(head['strings'])
             # Split on comma, handling "og" (and) as separator too
             artists = re.split(r',|\s+og\s+', artist_text)
             data['artists'] = [a.strip() for a in artists if a.strip()]
 
         # Extract title from .arc_view_name
-        name = soup.find(class_='arc_view_name')
+        name = find_fragment(page, 'arc_view_name')
         if name:
-            data['title_is'] = name.get_text(strip=True)
+            data['title_is'] = fragment_text(name['strings'])
         else:
             data['title_is'] = f"Exhibition {exhibition_id}"
 
         # Extract date from .arc_view_date
-        date_elem = soup.find(class_='arc_view_date')
+        date_elem = find_fragment(page, 'arc_view_date')
         if date_elem:
-            date_text = date_elem.get_text(strip=True)
+            date_text = fragment_text(date_elem['strings'])
             start_date, end_date = self.parse_date_range(date_text)
             data['start_date'] = start_date
             data['end_date'] = end_date
 
         # Extract description from .arc_view_text
-        text_elems = soup.find_all(class_='arc_view_text')
+        text_elems = find_fragments(page, 'arc_view_text')
         description_parts = []
         for elem in text_elems:
             # Filter out non-breaking space and noise
-            text = elem.get_text(separator='\n', strip=True)
+            text = fragment_text(elem['strings'], '\n')
             if text and text != '\xa0' and len(text) > 1:
                 description_parts.append(text)
         
@@ -189,8 +294,8 @@ class KoBScraper:
             data['description_is'] = ""
 
         # Extract images
-        for idx, img in enumerate(soup.find_all('img')):
-            src = img.get('src', '')
+        for idx, img in enumerate(page['images']):
+            src = img['src']
             if src and not src.endswith(('.gif', 'spacer')):  # Skip spacer gifs
                 # Skip navigation/UI images
                 if any(x in src.lower() for x in ['logo', 'nav', 'button', 'arrow', 'icon']):
@@ -202,7 +307,7 @@ class KoBScraper:
                 data['images'].append({
                     'original_url': full_url,
                     'filename': filename,
-                    'alt_text': img.get('alt', ''),
+                    'alt_text': img['alt'],
                     'display_order': idx,
                 })
 
@@ -211,101 +316,102 @@ class KoBScraper:
     def scrape_exhibition_english(self, exhibition_id: int) -> Optional[dict]:
         """Scrape English version of exhibition if available."""
         url = f"{BASE_URL}archive_view.php?id={exhibition_id}&lang=en"
-        soup = self._fetch(url)
-        if not soup:
+        page = self._fetch(url)
+        if not page:
             return None
+        return self.extract_english(page)
 
+    def extract_english(self, page: dict) -> Optional[dict]:
+        """Extract English title and description from a parsed detail page."""
         data = {}
 
         # Extract English title
-        name = soup.find(class_='arc_view_name')
+        name = find_fragment(page, 'arc_view_name')
         if name:
-            title = name.get_text(strip=True)
+            title = fragment_text(name['strings'])
             # Only use if it looks different from Icelandic (has English words)
             if title:
                 data['title_en'] = title
 
-        # Extract English description
-        text_elem = soup.find(class_='arc_view_text')
-        if text_elem:
-            paragraphs = text_elem.find_all('p')
+        # Extract English description from every .arc_view_text, like the Icelandic one
+        description_parts = []
+        for text_elem in find_fragments(page, 'arc_view_text'):
+            paragraphs = text_elem['paragraphs']
             if paragraphs:
                 text = '\n\n'.join(
-                    p.get_text(strip=True) for p in paragraphs if p.get_text(strip=True)
+                    fragment_text(p) for p in paragraphs if fragment_text(p)
                 )
             else:
-                text = text_elem.get_text(strip=True)
-            if text:
-                data['description_en'] = text
+                text = fragment_text(text_elem['strings'])
+            if text and text != '\xa0' and len(text) > 1:
+                description_parts.append(text)
+        if description_parts:
+            data['description_en'] = '\n\n'.join(description_parts)
 
-        return data if data else None
+        if not data:
+            return None
+        data['page_fingerprint_en'] = page_fingerprint(page)
+        return data
+
+    def scrape_exhibition_full(
+        self,
+        exhibition_id: int,
+        year: int,
+        scrape_english: bool = True
+    ) -> Optional[dict]:
+        """Scrape an exhibition and, optionally, its English version."""
+        data = self.scrape_exhibition(exhibition_id, year)
+        if data and scrape_english:
+            en_data = self.scrape_exhibition_english(exhibition_id)
+            if en_data:
+                data.update(en_data)
+        return data
+
+    async def _scrape_exhibition_async(
+        self,
+        loop: FetchLoop,
+        slots: asyncio.Semaphore,
+        exhibition_id: int,
+        year: int,
+        scrape_english: bool = True
+    ) -> Optional[dict]:
+        """scrape_exhibition_full, fetching the Icelandic and English pages in parallel."""
+        pages = [loop.call(slots, self.scrape_exhibition, exhibition_id, year)]
+        if scrape_english:
+            pages.append(loop.call(slots, self.scrape_exhibition_english, exhibition_id))
+        data, *english = await asyncio.gather(*pages)
+        if data and english and english[0]:
+            data.update(english[0])
+        return data
 
     def save_exhibition(self, data: dict, scrape_english: bool = True) -> Optional[int]:
         """Save exhibition data to database."""
-        conn = get_connection(self.db_path)
-        try:
-            # Check if already exists
-            if exhibition_exists(conn, data['exhibition_id']):
-                print(f"  Exhibition {data['exhibition_id']} already exists, skipping")
-                return None
-
-            # Optionally get English content
-            if scrape_english:
-                en_data = self.scrape_exhibition_english(data['exhibition_id'])
-                if en_data:
-                    data.update(en_data)
-
-            # Insert exhibition
-            db_id = insert_exhibition(conn, data)
-
-            # Link artists
-            for idx, artist_name in enumerate(data.get('artists', [])):
-                artist_id = get_or_create_artist(conn, artist_name)
-                link_artist_to_exhibition(conn, db_id, artist_id, idx)
-
-            # Insert image records (not downloaded yet)
-            for img_data in data.get('images', []):
-                img_data['exhibition_id'] = db_id
-                insert_image(conn, img_data)
+        known = self._known_keys()
+        # Check if already exists
+        if known.has_exhibition(data['exhibition_id']):
+            print(f"  Exhibition {data['exhibition_id']} already exists, skipping")
+            return None
 
-            return db_id
+        # Optionally get English content
+        if scrape_english:
+            en_data = self.scrape_exhibition_english(data['exhibition_id'])
+            if en_data:
+                data.update(en_data)
 
-        finally:
-            conn.close()
+        # Insert exhibition, artist links and image records in one transaction
+        conn = shared_connection(self.db_path)
+        try:
+            saved = insert_exhibitions_batch(conn, [data], known)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            self._known = None  # may list rows that were rolled back
+            raise
+        return saved.get(data['exhibition_id'])
 
     def scrape_year(self, year: int, scrape_english: bool = True) -> dict:
         """Scrape all exhibitions for a given year."""
-        print(f"\nScraping year {year}...")
-        stats = {'total': 0, 'success': 0, 'skipped': 0, 'failed': 0}
-
-        exhibition_ids = self.get_exhibition_ids_for_year(year)
-        stats['total'] = len(exhibition_ids)
-        print(f"  Found {len(exhibition_ids)} exhibitions")
-
-        for idx, ex_id in enumerate(exhibition_ids, 1):
-            print(f"  [{idx}/{len(exhibition_ids)}] Exhibition {ex_id}...", end=' ')
-
-            conn = get_connection(self.db_path)
-            if exhibition_exists(conn, ex_id):
-                print("skipped (exists)")
-                stats['skipped'] += 1
-                conn.close()
-                continue
-            conn.close()
-
-            data = self.scrape_exhibition(ex_id, year)
-            if data:
-                db_id = self.save_exhibition(data, scrape_english)
-                if db_id:
-                    print(f"saved (id={db_id})")
-                    stats['success'] += 1
-                else:
-                    stats['skipped'] += 1
-            else:
-                print("failed")
-                stats['failed'] += 1
-
-        return stats
+        return self._crawl(year, year, scrape_english)
 
     def scrape_all_years(
         self,
@@ -314,14 +420,249 @@ class KoBScraper:
         scrape_english: bool = True
     ) -> dict:
         """Scrape all years in the archive."""
-        total_stats = {'total': 0, 'success': 0, 'skipped': 0, 'failed': 0}
+        return self._crawl(start_year, end_year, scrape_english)
+
+    def _crawl(self, start_year: int, end_year: int, scrape_english: bool) -> dict:
+        """Drain the crawl frontier (see frontier.py) for a range of years.
+
+        A new crawl queues the years' list pages, and each list page queues
+        its exhibitions. If an earlier crawl of these years stopped with
+        pages left, those are fetched instead and nothing already done is
+        requested again. Scraped exhibitions are queued to a single writer
+        thread, which marks their frontier rows done in the same
+        transaction that saves them; stats are final once it is flushed.
+
+        Each year gets a year_checkpoints row with its summary, completed
+        once none of its pages are left and none failed. Past years
+        completed by an earlier crawl are not fetched again (unless
+        refreshing); the current year's list can still grow, so it is
+        always crawled. A year with failures is listed again, which puts
+        its failed exhibitions back in the queue.
+        """
+        stats = {'total': 0, 'success': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        years = (start_year, end_year)
+        finished = {} if self.refresh else self.finished_years(start_year, end_year)
+        for row in finished.values():
+            stats['total'] += row['total']
+            stats['skipped'] += row['total']
+        crawl_years = [year for year in range(start_year, end_year + 1) if year not in finished]
+        if not crawl_years:
+            return stats
+
+        # One query per table up front; skip checks below are then in memory
+        self._known = None
+        known = self._known_keys()
+        frontier = CrawlFrontier(self.db_path)
+        try:
+            year_pages = [(self._year_url(year), {'year': year}) for year in crawl_years]
+            remaining = frontier.unfinished(CRAWL_KINDS, years)
+            if remaining:
+                print(f"Resuming interrupted crawl: {remaining} pages left")
+                frontier.add('year', year_pages)
+            else:
+                frontier.add('year', year_pages, reset=('done', 'failed'))
+
+            with self.writing() as writer:
+                before = dict(writer.stats)
+                self._crawl_year_pages(frontier, years, known, stats)
+                self._crawl_exhibitions(frontier, years, scrape_english, known, stats)
+
+                writer.flush()
+                for key in ('success', 'updated', 'skipped'):
+                    stats[key] += writer.stats[key] - before[key]
+
+            self._finish_years(frontier, crawl_years)
+            deferred = frontier.unfinished(CRAWL_KINDS, years)
+            if deferred:
+                print(f"\n{deferred} pages queued for retry on the next run")
+        finally:
+            frontier.release()
+            frontier.close()
+
+        return stats
+
+    def finished_years(self, start_year: int, end_year: int) -> dict[int, sqlite3.Row]:
+        """Past years an earlier crawl completed, with their checkpoint rows.
+
+        Their lists are not fetched again; each is printed with its summary.
+        """
+        conn = shared_connection(self.db_path)
+        # Older checkpoints could be completed with failures; crawl those again
+        finished = {
+            year: row for year, row in sorted(get_year_checkpoints(conn, start_year, end_year).items())
+            if row['completed_at'] and not row['failed'] and year < datetime.now().year
+        }
+        for year, row in finished.items():
+            print(f"Year {year} finished {row['completed_at'][:10]}: {row['total']} exhibitions, "
+                  f"{row['success']} new, {row['updated']} updated, {row['skipped']} skipped")
+        return finished
 
-        for year in range(start_year, end_year + 1):
-            year_stats = self.scrape_year(year, scrape_english)
-            for key in total_stats:
-                total_stats[key] += year_stats[key]
+    def _year_url(self, year: int) -> str:
+        return f"{BASE_URL}archive_list.php?year={year}"
 
-        return total_stats
+    def _crawl_year_pages(
+        self,
+        frontier: CrawlFrontier,
+        years: tuple[int, int],
+        known: KnownKeys,
+        stats: dict
+    ) -> None:
+        """Fetch every due year list page at once, then queue their exhibitions.
+
+        The list pages are requested on the shared fetch loop, at most
+        `workers` at a time like the exhibition pages (the session's
+        connection pool is sized to match), and handled in frontier order,
+        i.e. by year, so the exhibition work list comes out the same however
+        the fetches interleave.
+        """
+        tasks = frontier.lease('year', years[1] - years[0] + 1, years)
+        if not tasks:
+            return
+        loop = fetch_loop()
+        slots = loop.slots(min(self.workers, len(tasks)))
+        futures = [loop.submit(loop.call(slots, self._fetch, task['url'])) for task in tasks]
+        try:
+            for task, future in zip(tasks, futures):
+                self._crawl_year_page(frontier, task, future.result(), known, stats)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _crawl_year_page(
+        self,
+        frontier: CrawlFrontier,
+        task: dict,
+        page: Optional[dict],
+        known: KnownKeys,
+        stats: dict
+    ) -> None:
+        """Queue the exhibitions a fetched year list page links to."""
+        year = task['payload']['year']
+        print(f"\nScraping year {year}...")
+        if not page:
+            frontier.fail(task['id'], "list page fetch failed")
+            return
+
+        exhibition_ids = self.extract_exhibition_ids(page)
+        print(f"  Found {len(exhibition_ids)} exhibitions")
+        listed = len(exhibition_ids)
+
+        existing = {ex_id for ex_id in exhibition_ids if known.has_exhibition(ex_id)}
+        if existing and not self.refresh:
+            print(f"  Skipping {len(existing)} existing exhibitions")
+            stats['total'] += len(existing)
+            stats['skipped'] += len(existing)
+            exhibition_ids = [ex_id for ex_id in exhibition_ids if ex_id not in existing]
+
+        # Before the page is done, so a resume that re-lists the year restarts its summary
+        start_year_checkpoint(shared_connection(self.db_path), year, listed, listed - len(exhibition_ids))
+        entries = [
+            (f"{BASE_URL}archive_view.php?id={ex_id}", {'exhibition_id': ex_id, 'year': year})
+            for ex_id in sorted(exhibition_ids)
+        ]
+        frontier.complete(task['id'], children=('exhibition', entries, ('done', 'failed')))
+
+    def _finish_years(self, frontier: CrawlFrontier, years: list[int]) -> None:
+        """Close out the checkpoints of listed years that have no pages left.
+
+        Years whose pages all succeeded are completed; the rest keep their
+        failure count and are crawled again next time.
+        """
+        conn = shared_connection(self.db_path)
+        for year in years:
+            if frontier.unfinished(CRAWL_KINDS, (year, year)):
+                continue
+            row = finish_year_checkpoint(conn, year, frontier.failed(('exhibition',), (year, year)))
+            if row and row['completed_at']:
+                print(f"Year {year} complete: {row['total']} exhibitions, {row['success']} new, "
+                      f"{row['updated']} updated, {row['skipped']} skipped")
+            elif row:
+                print(f"Year {year} incomplete: {row['failed']} of {row['total']} exhibitions failed, "
+                      f"will be listed again on the next run")
+
+    def _crawl_exhibitions(
+        self,
+        frontier: CrawlFrontier,
+        years: tuple[int, int],
+        scrape_english: bool,
+        known: KnownKeys,
+        stats: dict
+    ) -> None:
+        """Lease queued exhibitions, fetch them and hand them to the writer.
+
+        A leased batch is fetched on the shared fetch loop (see
+        fetchloop.py), at most `workers` pages at a time, with each
+        exhibition's Icelandic and English pages in parallel. Results are
+        queued in frontier order from this thread, so the resulting rows
+        are the same for any number of workers.
+        """
+        pending = frontier.unfinished(('exhibition',), years)
+        done = 0
+        loop = fetch_loop()
+        slots = loop.slots(self.workers)
+        futures = []
+        try:
+            while tasks := frontier.lease('exhibition', LEASE_BATCH * self.workers, years):
+                stats['total'] += len(tasks)
+                existing = {
+                    task['id'] for task in tasks
+                    if known.has_exhibition(task['payload']['exhibition_id'])
+                }
+                if not self.refresh and existing:
+                    # Saved since it was queued, by this run's writer or before a resume
+                    skipped_by_year: dict[int, dict[str, int]] = {}
+                    for task in tasks:
+                        if task['id'] in existing:
+                            frontier.complete(task['id'])
+                            year_counts = skipped_by_year.setdefault(task['payload']['year'], {'skipped': 0})
+                            year_counts['skipped'] += 1
+                    conn = shared_connection(self.db_path)
+                    add_year_counts(conn, skipped_by_year)
+                    conn.commit()
+                    stats['skipped'] += len(existing)
+                    done += len(existing)
+                    tasks = [task for task in tasks if task['id'] not in existing]
+
+                futures = [
+                    loop.submit(self._scrape_exhibition_async(
+                        loop, slots, task['payload']['exhibition_id'], task['payload']['year'], scrape_english
+                    ))
+                    for task in tasks
+                ]
+                for idx, task in enumerate(tasks):
+                    done += 1
+                    print(f"  [{done}/{pending}] Exhibition {task['payload']['exhibition_id']}...", end=' ')
+                    try:
+                        data = futures[idx].result()
+                    except KeyboardInterrupt:
+                        self._keep_fetched(tasks[idx:], futures[idx:], existing)
+                        raise
+                    if data:
+                        self._queue_result(data, stats, task['id'] in existing)
+                    else:
+                        retry = frontier.fail(task['id'], "detail page fetch failed")
+                        print("failed (will retry)" if retry else "failed")
+                        stats['failed'] += 1
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _keep_fetched(self, tasks: list[dict], futures: list, existing: set) -> None:
+        """On interrupt, queue what the workers already fetched so a resume skips it."""
+        for task, future in zip(tasks, futures):
+            if future.done() and not future.cancelled() and not future.exception():
+                data = future.result()
+                if data:
+                    (self._writer.refresh if task['id'] in existing else self._writer.put)(data)
+
+    def _queue_result(self, data: dict, stats: dict, exists: bool = False) -> None:
+        """Hand a scraped exhibition to the writer."""
+        if exists:
+            self._writer.refresh(data)
+            print("queued (refresh)")
+        else:
+            self._writer.put(data)
+            print("queued")
 
 
 def scrape_single_exhibition(exhibition_id: int, year: int, db_path: str = "kob_archive.db"):
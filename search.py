@@ -0,0 +1,200 @@
+"""Full-text search over exhibitions, artists and image alt text.
+
+Two FTS5 tables, both keyed by exhibitions.id, hold the searchable text:
+    exhibitions_fts       titles and descriptions (IS/EN)
+    exhibition_tags_fts   artist names and image alt texts
+
+Triggers on exhibitions, exhibition_artists, artists and images re-index
+an exhibition whenever any of those change, so the index never needs a
+separate sync step. The split keeps that cheap: adding an image or an
+artist link re-tokenizes a few names, not the exhibition's description.
+A search matches when every word is found in either table.
+
+Matching ignores case and accents: the unicode61 tokenizer folds á/é/í/ó/
+ú/ý/ö, and the Icelandic letters it leaves alone (ð, þ, æ) are spelled out
+as d, th and ae both in the index and in queries. "Ásdís" matches "asdis"
+and "Þórdís" matches "thordis".
+"""
+
+import re
+import sqlite3
+
+# bm25 column weights: titles and artists outrank descriptions and alt text
+TEXT_WEIGHTS = (10.0, 10.0, 2.0, 2.0)  # title_is, title_en, description_is, description_en
+TAG_WEIGHTS = (8.0, 1.0)  # artists, alt_text
+
+_FOLDS = (('ð', 'd'), ('Ð', 'd'), ('þ', 'th'), ('Þ', 'th'), ('æ', 'ae'), ('Æ', 'ae'))
+
+
+def fold_text(text: str) -> str:
+    """Spell out ð, þ and æ the way the search index stores them."""
+    for letter, spelled in _FOLDS:
+        text = text.replace(letter, spelled)
+    return text
+
+
+def _fold_sql(expr: str) -> str:
+    for letter, spelled in _FOLDS:
+        expr = f"replace({expr}, '{letter}', '{spelled}')"
+    return expr
+
+
+_TEXT_INDEX_SQL = f"""
+    INSERT INTO exhibitions_fts (rowid, title_is, title_en, description_is, description_en)
+    SELECT
+        e.id,
+        {_fold_sql('e.title_is')},
+        {_fold_sql('e.title_en')},
+        {_fold_sql('e.description_is')},
+        {_fold_sql('e.description_en')}
+    FROM exhibitions e
+"""
+
+_ARTISTS_SQL = """(
+    SELECT group_concat(a.name, ' ') FROM exhibition_artists ea
+    JOIN artists a ON a.id = ea.artist_id
+    WHERE ea.exhibition_id = e.id
+)"""
+
+_ALT_TEXT_SQL = """(
+    SELECT group_concat(i.alt_text, ' ') FROM images i WHERE i.exhibition_id = e.id
+)"""
+
+_TAG_INDEX_SQL = f"""
+    INSERT INTO exhibition_tags_fts (rowid, artists, alt_text)
+    SELECT e.id, {_fold_sql(_ARTISTS_SQL)}, {_fold_sql(_ALT_TEXT_SQL)}
+    FROM exhibitions e
+"""
+
+_INDEXES = {
+    'exhibitions_fts': _TEXT_INDEX_SQL,
+    'exhibition_tags_fts': _TAG_INDEX_SQL,
+}
+
+
+def _reindex_sql(table: str, ids: str) -> str:
+    """Statements re-indexing the exhibitions whose ids `ids` (SQL) yields."""
+    return f"""
+        DELETE FROM {table} WHERE rowid IN ({ids});
+        {_INDEXES[table]} WHERE e.id IN ({ids});
+    """
+
+
+_TEXT_CHANGED = " OR ".join(
+    f"OLD.{column} IS NOT NEW.{column}"
+    for column in ('title_is', 'title_en', 'description_is', 'description_en')
+)
+
+# (trigger name, event, index table, SQL for the exhibitions.id values to re-index)
+_TRIGGERS = (
+    ("exhibitions_fts_ai", "AFTER INSERT ON exhibitions", 'exhibitions_fts', "NEW.id"),
+    ("exhibitions_fts_au", f"AFTER UPDATE ON exhibitions WHEN {_TEXT_CHANGED}",
+     'exhibitions_fts', "NEW.id"),
+    ("exhibitions_fts_ad", "AFTER DELETE ON exhibitions", 'exhibitions_fts', "OLD.id"),
+    ("exhibitions_tags_fts_ad", "AFTER DELETE ON exhibitions", 'exhibition_tags_fts', "OLD.id"),
+    ("exhibition_artists_fts_ai", "AFTER INSERT ON exhibition_artists",
+     'exhibition_tags_fts', "NEW.exhibition_id"),
+    ("exhibition_artists_fts_ad", "AFTER DELETE ON exhibition_artists",
+     'exhibition_tags_fts', "OLD.exhibition_id"),
+    ("artists_fts_au", "AFTER UPDATE OF name ON artists", 'exhibition_tags_fts',
+     "SELECT exhibition_id FROM exhibition_artists WHERE artist_id = NEW.id"),
+    ("images_fts_ai", "AFTER INSERT ON images", 'exhibition_tags_fts', "NEW.exhibition_id"),
+    ("images_fts_au", "AFTER UPDATE OF alt_text, exhibition_id ON images",
+     'exhibition_tags_fts', "OLD.exhibition_id, NEW.exhibition_id"),
+    ("images_fts_ad", "AFTER DELETE ON images", 'exhibition_tags_fts', "OLD.exhibition_id"),
+)
+
+
+def init_search_index(cursor: sqlite3.Cursor) -> bool:
+    """Create the FTS5 tables and their triggers, backfilling a new index.
+
+    Returns False, leaving the schema untouched, when this SQLite build
+    lacks FTS5.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'exhibitions_fts'")
+    exists = cursor.fetchone() is not None
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS exhibitions_fts USING fts5(
+                title_is, title_en, description_is, description_en,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS exhibition_tags_fts USING fts5(
+                artists, alt_text,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search disabled: {e}")
+        return False
+
+    for name, event, table, ids in _TRIGGERS:
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {_reindex_sql(table, ids)} END"
+        )
+
+    if not exists:
+        rebuild_search_index(cursor)
+    return True
+
+
+def rebuild_search_index(cursor: sqlite3.Cursor) -> None:
+    """Re-index every exhibition from scratch."""
+    for table, index_sql in _INDEXES.items():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(index_sql)
+
+
+def query_terms(query: str) -> list[str]:
+    """Split free text into folded FTS5 prefix terms."""
+    return [f'"{term}"*' for term in re.findall(r'\w+', fold_text(query))]
+
+
+def search_exhibitions(conn: sqlite3.Connection, query: str, limit: int = 20) -> list[dict]:
+    """Search exhibitions by free text, best matches first.
+
+    Every word must appear, as a prefix, in the exhibition's titles,
+    descriptions, artist names or image alt texts. Each result has the
+    exhibition's id, year, titles and dates plus its bm25 `rank` (lower
+    is better).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    # Score on any term, then require each term to match in one of the tables
+    params = [' OR '.join(terms), ' OR '.join(terms)]
+    conditions = []
+    if len(terms) > 1:
+        for term in terms:
+            conditions.append("""h.id IN (
+                SELECT rowid FROM exhibitions_fts WHERE exhibitions_fts MATCH ?
+                UNION SELECT rowid FROM exhibition_tags_fts WHERE exhibition_tags_fts MATCH ?
+            )""")
+            params += [term, term]
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT e.exhibition_id, e.year, e.title_is, e.title_en, e.start_date, e.end_date,
+               SUM(h.rank) AS rank
+        FROM (
+            SELECT rowid AS id, bm25(exhibitions_fts, {_weights(TEXT_WEIGHTS)}) AS rank
+            FROM exhibitions_fts WHERE exhibitions_fts MATCH ?
+            UNION ALL
+            SELECT rowid, bm25(exhibition_tags_fts, {_weights(TAG_WEIGHTS)})
+            FROM exhibition_tags_fts WHERE exhibition_tags_fts MATCH ?
+        ) h
+        JOIN exhibitions e ON e.id = h.id
+        {where}
+        GROUP BY h.id
+        ORDER BY rank
+        LIMIT ?
+    """, params + [limit])
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _weights(weights: tuple) -> str:
+    return ', '.join(str(w) for w in weights)
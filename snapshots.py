@@ -0,0 +1,131 @@
+"""Raw HTML snapshot archive for offline re-parsing.
+
+Every page the scraper fetches is kept, zlib-compressed, in a separate
+SQLite file (snapshots.db by default) so that exhibitions can be rebuilt
+from the stored HTML after a parsing fix instead of crawling the site
+again. A page is stored once per distinct body; fetching an unchanged
+page only moves its fetched_at forward.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+SNAPSHOT_DB = "snapshots.db"
+COMPRESS_LEVEL = 6
+COMMIT_EVERY = 50  # snapshots per transaction while scraping
+
+_LATEST_SQL = """
+    SELECT url, body FROM (
+        SELECT url, body, ROW_NUMBER() OVER (
+            PARTITION BY url ORDER BY fetched_at DESC, id DESC
+        ) AS newest
+        FROM snapshots WHERE url LIKE ?
+    ) WHERE newest = 1
+"""
+
+
+class SnapshotStore:
+    """Compressed page bodies keyed by (url, sha256), safe to share across threads."""
+
+    def __init__(self, path: str = SNAPSHOT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at TIMESTAMP NOT NULL,
+                UNIQUE (url, sha256)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_url ON snapshots(url, fetched_at)")
+        self._conn.commit()
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def save(self, url: str, content: bytes) -> None:
+        """Store a fetched page body (raw bytes, as served)."""
+        digest = hashlib.sha256(content).hexdigest()
+        body = zlib.compress(content, COMPRESS_LEVEL)
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO snapshots (url, sha256, size, body, fetched_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url, sha256) DO UPDATE SET fetched_at = excluded.fetched_at
+            """, (url, digest, len(content), body, datetime.now().isoformat()))
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def latest(self, url: str) -> Optional[bytes]:
+        """Return the most recently fetched body for a URL, if any."""
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT body FROM snapshots WHERE url = ?
+                ORDER BY fetched_at DESC, id DESC LIMIT 1
+            """, (url,)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def iter_latest(self, pattern: str) -> Iterator[tuple[str, bytes]]:
+        """Yield (url, compressed body) for the newest snapshot of each URL
+        matching the SQL LIKE `pattern`.
+
+        Bodies stay compressed so they can be handed to worker processes
+        cheaply; use `decompress()` on them.
+        """
+        with self._lock:
+            self._conn.commit()
+            rows = self._conn.execute(_LATEST_SQL, (pattern,)).fetchall()
+        yield from rows
+
+    def exhibition_pages(self) -> dict[int, dict[str, tuple[str, bytes]]]:
+        """Newest archive_view pages by exhibition ID.
+
+        Each entry maps 'is' and, when stored, 'en' to (url, compressed body).
+        """
+        pages: dict[int, dict[str, tuple[str, bytes]]] = {}
+        for url, body in self.iter_latest('%archive_view.php?id=%'):
+            match = re.search(r'archive_view\.php\?id=(\d+)(&lang=en)?$', url)
+            if match:
+                lang = 'en' if match.group(2) else 'is'
+                pages.setdefault(int(match.group(1)), {})[lang] = (url, body)
+        return pages
+
+    def year_pages(self) -> Iterator[tuple[int, bytes]]:
+        """Yield (year, compressed body) for the newest archive_list page of each year."""
+        for url, body in self.iter_latest('%archive_list.php?year=%'):
+            match = re.search(r'archive_list\.php\?year=(\d+)$', url)
+            if match:
+                yield int(match.group(1)), body
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, urls, raw, stored = self._conn.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(size), 0),
+                       COALESCE(SUM(LENGTH(body)), 0)
+                FROM snapshots
+            """).fetchone()
+        return {'snapshots': count, 'urls': urls, 'raw_bytes': raw, 'stored_bytes': stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+def decompress(body: bytes) -> bytes:
+    return zlib.decompress(body)
@@ -0,0 +1,61 @@
+"""Streaming image bodies to disk and into the blob store."""
+
+import hashlib
+
+import pytest
+import requests
+
+from blobstore import BlobStore, stream_to_file
+
+
+class _Response:
+    """Just enough of a streamed requests.Response for the blob store."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.headers = {'Content-Length': str(sum(len(c) for c in chunks))}
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise requests.exceptions.ChunkedEncodingError("connection reset")
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+CHUNKS = [bytes([n]) * 70_000 for n in range(5)]
+BODY = b''.join(CHUNKS)
+
+
+def test_stream_to_file_hashes_and_renames_into_place(tmp_path):
+    path = tmp_path / '2024' / '555' / 'a.jpg'
+    response = _Response(CHUNKS)
+    assert stream_to_file(response, path) == (len(BODY), hashlib.sha256(BODY).hexdigest())
+    assert path.read_bytes() == BODY
+    assert [p.name for p in path.parent.iterdir()] == ['a.jpg']
+    assert response.closed
+
+
+def test_interrupted_stream_leaves_no_file(tmp_path):
+    path = tmp_path / 'a.jpg'
+    response = _Response(CHUNKS, fail_after=3)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        stream_to_file(response, path)
+    assert list(tmp_path.iterdir()) == []
+    assert response.closed
+
+
+def test_ingest_stores_identical_bodies_once(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    digest, size, new = blobs.ingest(_Response(CHUNKS))
+    assert (digest, size, new) == (hashlib.sha256(BODY).hexdigest(), len(BODY), True)
+    assert blobs.ingest(_Response(CHUNKS)) == (digest, size, False)
+
+    assert blobs.blob_path(digest).read_bytes() == BODY
+    assert list((blobs.root / 'tmp').iterdir()) == []
+    blobs.link(digest, tmp_path / '2024' / '555' / 'a.jpg')
+    assert blobs.holds(digest, tmp_path / '2024' / '555' / 'a.jpg')
@@ -0,0 +1,82 @@
+"""The streaming export against the export it replaced."""
+
+import gzip
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from benchmark import legacy_export
+from database import export_to_json, get_connection
+
+ARCHIVE_DB = Path(__file__).resolve().parent.parent / 'kob_archive.db'
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / 'archive.db'
+    shutil.copyfile(ARCHIVE_DB, path)
+    return str(path)
+
+
+def _export(db: str, path: Path, **options) -> list[dict]:
+    conn = get_connection(db)
+    try:
+        count = export_to_json(conn, str(path), **options)
+    finally:
+        conn.close()
+    opener = gzip.open if options.get('compress') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        if options.get('ndjson'):
+            exhibitions = [json.loads(line) for line in f]
+        else:
+            exhibitions = json.load(f)['exhibitions']
+    assert len(exhibitions) == count
+    return exhibitions
+
+
+def test_matches_the_export_before_streaming(db, tmp_path):
+    legacy_export(db, str(tmp_path / 'legacy.json'))
+    with open(tmp_path / 'legacy.json', encoding='utf-8') as f:
+        legacy = json.load(f)['exhibitions']
+    streamed = _export(db, tmp_path / 'export.json')
+
+    assert len(streamed) == len(legacy) > 0
+    # Same sort keys; only ties (same year and start date) may be ordered differently
+    key = lambda ex: (ex['year'], ex['dates']['start'] or '')
+    assert [key(ex) for ex in streamed] == [key(ex) for ex in legacy]
+
+    # Artists are now in page order rather than artist ID order (see export_to_json)
+    by_id = {ex['id']: ex for ex in legacy}
+    for exhibition in streamed:
+        before = by_id[exhibition['id']]
+        assert sorted(exhibition['artists']) == sorted(before['artists'])
+        assert {**exhibition, 'artists': None} == {**before, 'artists': None}
+
+
+def test_artists_follow_page_order(db, tmp_path):
+    conn = get_connection(db)
+    expected = {}
+    for exhibition_id, name in conn.execute("""
+        SELECT e.exhibition_id, a.name
+        FROM exhibition_artists ea
+        JOIN exhibitions e ON e.id = ea.exhibition_id
+        JOIN artists a ON a.id = ea.artist_id
+        ORDER BY ea.exhibition_id, ea.display_order
+    """):
+        expected.setdefault(exhibition_id, []).append(name)
+    conn.close()
+
+    for exhibition in _export(db, tmp_path / 'export.json'):
+        assert exhibition['artists'] == expected.get(exhibition['id'], [])
+
+
+@pytest.mark.parametrize('filename, options', [
+    ('export.json', {'compact': True}),
+    ('export.ndjson', {'ndjson': True}),
+    ('export.ndjson.gz', {'ndjson': True, 'compress': True}),
+    ('export.json.gz', {'compact': True, 'compress': True}),
+])
+def test_output_modes_hold_the_same_exhibitions(db, tmp_path, filename, options):
+    assert _export(db, tmp_path / filename, **options) == _export(db, tmp_path / 'export.json')
@@ -0,0 +1,147 @@
+"""The per-host circuit breaker and Retry-After handling in the fetch layer."""
+
+import threading
+import time
+
+import pytest
+import requests
+
+import fetcher
+from fetcher import BREAKER_THRESHOLD, CircuitBreaker, Fetcher, breaker_for
+from http_cache import ResponseCache
+
+COOLDOWN = 0.2
+
+
+class _Response:
+    def __init__(self, url: str, status: int, headers: dict):
+        self.url = url
+        self.status_code = status
+        self.headers = {'Content-Type': 'text/html', **headers}
+        self.content = b'<html></html>'
+        self.elapsed = None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def close(self):
+        pass
+
+
+class _Session:
+    """Answers from a script of (status, headers) per URL, 200 once it runs out."""
+
+    def __init__(self, script: dict = None):
+        self.script = {url: list(replies) for url, replies in (script or {}).items()}
+        self.sent: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        with self._lock:
+            self.sent.append((url, time.monotonic()))
+            replies = self.script.get(url)
+            status, reply_headers = replies.pop(0) if replies else (200, {})
+        return _Response(url, status, reply_headers)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(fetcher, '_breakers', {})
+
+
+def _wait_until(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker('host', cooldown=COOLDOWN)
+    for _ in range(BREAKER_THRESHOLD - 1):
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_success()
+    for _ in range(BREAKER_THRESHOLD - 1):
+        breaker.record_failure()
+    assert breaker.state == 'closed'  # the success reset the count
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    start = time.monotonic()
+    breaker.before_request()
+    assert time.monotonic() - start >= COOLDOWN * 0.9
+    assert breaker.state == 'half-open'
+
+
+def test_half_open_lets_one_probe_through_and_doubles_cooldown_on_failure():
+    breaker = CircuitBreaker('host', threshold=1, cooldown=COOLDOWN)
+    breaker.record_failure()
+    passed = []
+
+    def request(name):
+        breaker.before_request()
+        passed.append((name, breaker.state))
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: passed)
+    time.sleep(COOLDOWN / 2)
+    assert len(passed) == 1 and passed[0][1] == 'half-open'  # the rest wait for its outcome
+
+    # The probe fails: open again, for twice as long
+    reopened = time.monotonic()
+    breaker.record_failure()
+    assert breaker.state == 'open' and breaker.opened == 2
+    _wait_until(lambda: len(passed) == 2, timeout=COOLDOWN * 4)
+    assert time.monotonic() - reopened >= 2 * COOLDOWN * 0.9
+    time.sleep(COOLDOWN / 2)
+    assert len(passed) == 2
+
+    # This probe succeeds: everyone waiting goes ahead, cooldown back to normal
+    breaker.record_success()
+    for thread in threads:
+        thread.join(timeout=2)
+    assert len(passed) == 5 and breaker.state == 'closed'
+    assert breaker._cooldown == COOLDOWN
+
+
+def test_cache_hits_bypass_an_open_breaker(tmp_path):
+    url = 'http://archive.test/archive_view.php?id=1'
+    session = _Session()
+    cached = Fetcher(session, ResponseCache(str(tmp_path), max_age=3600), max_retries=0)
+    cached.get(url)
+
+    breaker = breaker_for(url)
+    breaker.base_cooldown = breaker._cooldown = 60.0
+    for _ in range(BREAKER_THRESHOLD):
+        breaker.record_failure()
+    assert breaker.state == 'open'
+
+    start = time.monotonic()
+    assert cached.get(url).content == b'<html></html>'
+    assert time.monotonic() - start < 1.0
+    assert len(session.sent) == 1
+    assert breaker.state == 'open'  # a cache hit says nothing about the host
+
+
+def test_retry_after_pauses_every_request_to_the_host():
+    slow = 'http://archive.test/archive_list.php?year=2024'
+    other = 'http://archive.test/archive_view.php?id=1'
+    session = _Session({slow: [(503, {'Retry-After': '1'})]})
+    client = Fetcher(session, max_retries=1)
+
+    worker = threading.Thread(target=client.get, args=(slow,))
+    worker.start()
+    _wait_until(lambda: session.sent)
+    paused_at = session.sent[0][1]
+    time.sleep(0.05)
+    client.get(other)  # a different page, same host: waits out the pause too
+    worker.join()
+
+    sent = dict(session.sent[1:])
+    assert sent[other] - paused_at >= 0.9
+    assert sent[slow] - paused_at >= 0.9
+    assert client.stats['retries'] == 1 and client.stats['failed'] == 0
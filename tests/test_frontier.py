@@ -0,0 +1,121 @@
+"""Leasing, retry and resume in the persistent crawl frontier."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import frontier
+from database import init_database
+from frontier import LEASE_SECONDS, MAX_ATTEMPTS, RETRY_BASE, RETRY_MAX, CrawlFrontier
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'archive.db')
+    init_database(path)
+    return path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """The frontier's view of time.time(), moved forward with advance()."""
+    now = [time.time()]
+    fake = SimpleNamespace(time=lambda: now[0])
+    monkeypatch.setattr(frontier, 'time', fake)
+    fake.advance = lambda seconds: now.__setitem__(0, now[0] + seconds)
+    return fake
+
+
+def _pages(count: int, year: int = 2024) -> list[tuple[str, dict]]:
+    return [(f"archive_view.php?id={n}", {'exhibition_id': n, 'year': year}) for n in range(count)]
+
+
+def test_owners_never_lease_the_same_row(db):
+    with CrawlFrontier(db) as queue:
+        queue.add('exhibition', _pages(200))
+
+    leased = []
+
+    def drain(owner):
+        with CrawlFrontier(db, owner=owner) as queue:
+            while tasks := queue.lease('exhibition', limit=7):
+                leased.extend(task['url'] for task in tasks)
+
+    threads = [threading.Thread(target=drain, args=(f"worker-{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted(url for url, _ in _pages(200))
+
+
+def test_lease_is_held_until_it_expires(db, clock):
+    with CrawlFrontier(db, owner='a') as a, CrawlFrontier(db, owner='b') as b:
+        a.add('exhibition', _pages(3))
+        assert [task['payload']['exhibition_id'] for task in a.lease('exhibition', limit=2)] == [0, 1]
+        assert [task['payload']['exhibition_id'] for task in b.lease('exhibition', limit=5)] == [2]
+        assert b.lease('exhibition') == []
+
+        # a dies; once its leases expire, b picks its rows up
+        clock.advance(LEASE_SECONDS - 1)
+        assert b.lease('exhibition') == []
+        clock.advance(2)
+        assert [task['payload']['exhibition_id'] for task in b.lease('exhibition', limit=5)] == [0, 1, 2]
+        assert a.unfinished(('exhibition',)) == 3
+
+
+def test_failed_rows_back_off_then_give_up(db, clock):
+    with CrawlFrontier(db) as queue:
+        queue.add('exhibition', _pages(1))
+        for attempt in range(MAX_ATTEMPTS):
+            task, = queue.lease('exhibition')
+            assert task['attempts'] == attempt
+            assert queue.fail(task['id'], "HTTP 503") == (attempt < MAX_ATTEMPTS - 1)
+            # Not due again until the backoff, doubled per attempt, has passed
+            delay = min(RETRY_BASE * 2 ** attempt, RETRY_MAX)
+            clock.advance(delay - 1)
+            assert queue.lease('exhibition') == []
+            clock.advance(1)
+        assert queue.lease('exhibition') == []
+        assert queue.failed(('exhibition',)) == 1
+        assert queue.unfinished(('exhibition',)) == 0
+
+        # Queuing it again with reset gives it a fresh set of attempts
+        queue.add('exhibition', _pages(1), reset=('failed',))
+        assert queue.lease('exhibition')[0]['attempts'] == 0
+
+
+def test_release_requeues_without_counting_an_attempt(db):
+    with CrawlFrontier(db, owner='a') as a, CrawlFrontier(db, owner='b') as b:
+        a.add('exhibition', _pages(4))
+        a.lease('exhibition', limit=2)
+        b.lease('exhibition', limit=1)
+        assert a.release() == 2
+        assert [task['attempts'] for task in b.lease('exhibition', limit=5)] == [0, 0, 0]
+        assert a.unfinished(('exhibition',)) == 4
+
+
+def test_complete_queues_children_and_keeps_done_rows_done(db):
+    with CrawlFrontier(db) as queue:
+        queue.add('year', [('archive_list.php?year=2023', {'year': 2023}),
+                           ('archive_list.php?year=2024', {'year': 2024})])
+        first, second = queue.lease('year', limit=2)
+        queue.complete(first['id'], ('exhibition', _pages(3, 2023), ()))
+        queue.complete(second['id'])
+        assert queue.stats() == {'year': {'done': 2}, 'exhibition': {'pending': 3}}
+
+        queue.add('year', [('archive_list.php?year=2023', {'year': 2023})])
+        assert queue.lease('year') == []
+        queue.add('year', [('archive_list.php?year=2023', {'year': 2023})], reset=('done',))
+        assert [task['url'] for task in queue.lease('year')] == ['archive_list.php?year=2023']
+
+
+def test_years_scope_leases_and_counts(db):
+    with CrawlFrontier(db) as queue:
+        queue.add('exhibition', [(f"archive_view.php?id={year}", {'year': year}) for year in range(2003, 2026)])
+        assert queue.unfinished(('exhibition',), years=(2010, 2012)) == 3
+        tasks = queue.lease('exhibition', limit=50, years=(2010, 2012))
+        assert [task['payload']['year'] for task in tasks] == [2010, 2011, 2012]
+        assert queue.unfinished(('exhibition',)) == 23
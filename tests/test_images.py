@@ -0,0 +1,103 @@
+"""Deep verification of downloaded images."""
+
+import hashlib
+import struct
+import zlib
+
+from database import get_connection, init_database
+from images import ImageDownloader, check_image_file
+
+
+def _png() -> bytes:
+    def chunk(kind: bytes, body: bytes) -> bytes:
+        return (struct.pack('>I', len(body)) + kind + body
+                + struct.pack('>I', zlib.crc32(kind + body)))
+    header = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b'\x00\x00')) + chunk(b'IEND', b''))
+
+
+def _gif() -> bytes:
+    return (b'GIF89a' + struct.pack('<HH', 1, 1) + b'\x00\x00\x00'
+            + b'\x2c' + struct.pack('<HHHH', 0, 0, 1, 1) + b'\x00'
+            + b'\x02\x02\x44\x01\x00' + b'\x3b')
+
+
+def _write(path, data: bytes):
+    path.write_bytes(data)
+    return len(data), hashlib.sha256(data).hexdigest()
+
+
+def test_png_with_trailing_bytes_and_matching_hash_is_valid(tmp_path):
+    path = tmp_path / 'a.png'
+    size, digest = _write(path, _png() + b'\x00' * 5000)
+    assert check_image_file(str(path), size, digest) == ('valid', None, size)
+
+
+def test_gif_with_trailing_bytes_and_matching_hash_is_valid(tmp_path):
+    path = tmp_path / 'a.gif'
+    size, digest = _write(path, _gif() + b'trailing metadata' * 4)
+    assert check_image_file(str(path), size, digest) == ('valid', None, size)
+
+
+def test_hash_mismatch_is_corrupt(tmp_path):
+    path = tmp_path / 'a.png'
+    size, _ = _write(path, _png())
+    status, problem, _ = check_image_file(str(path), size, '0' * 64)
+    assert status == 'corrupt'
+    assert problem == 'content hash mismatch'
+
+
+def test_png_with_trailing_bytes_and_no_hash_is_valid(tmp_path):
+    path = tmp_path / 'a.png'
+    size, _ = _write(path, _png() + b'\x00' * 64)
+    assert check_image_file(str(path), size, None)[0] == 'valid'
+
+
+def _add_image(db, path, size, digest):
+    conn = get_connection(db)
+    conn.execute("""
+        INSERT INTO exhibitions (id, exhibition_id, title_is, year, source_url)
+        VALUES (1, 1, 'Sýning', 2020, 'http://example.invalid/1')
+    """)
+    conn.execute("""
+        INSERT INTO images (exhibition_id, filename, original_url, local_path, file_size, content_hash)
+        VALUES (1, ?, ?, ?, ?, ?)
+    """, (path.name, 'http://example.invalid/' + path.name, str(path), size, digest))
+    conn.commit()
+    conn.close()
+
+
+def test_deep_verify_quarantines_structurally_damaged_file(tmp_path):
+    db = str(tmp_path / 'archive.db')
+    init_database(db)
+    images_dir = tmp_path / 'images'
+    path = images_dir / '2020' / 'a.gif'
+    path.parent.mkdir(parents=True)
+    size, _ = _write(path, _gif()[:-1] + b'\x00' * 32)
+    _add_image(db, path, size, None)
+
+    stats = ImageDownloader(db, str(images_dir)).verify_images(deep=True, workers=1)
+
+    assert stats['corrupt'] == 1
+    assert not path.exists()
+    assert (images_dir / 'quarantine' / '2020' / 'a.gif').exists()
+
+
+def test_deep_verify_removes_hash_mismatch(tmp_path):
+    db = str(tmp_path / 'archive.db')
+    init_database(db)
+    images_dir = tmp_path / 'images'
+    path = images_dir / '2020' / 'a.png'
+    path.parent.mkdir(parents=True)
+    size, _ = _write(path, _png())
+    _add_image(db, path, size, '0' * 64)
+
+    stats = ImageDownloader(db, str(images_dir)).verify_images(deep=True, workers=1)
+
+    assert stats['corrupt'] == 1
+    assert not path.exists()
+    assert not (images_dir / 'quarantine').exists()
+    conn = get_connection(db)
+    assert conn.execute("SELECT local_path FROM images").fetchone()[0] is None
+    conn.close()
@@ -0,0 +1,64 @@
+"""The parser backends extract the same data from the same page."""
+
+import pytest
+
+from benchmark import MockArchive
+from parsers import BACKENDS, find_fragment, page_fingerprint, parse_page
+from scrape_highres import HighResScraper
+from scraper import KoBScraper
+
+pytestmark = pytest.mark.skipif('lxml' not in BACKENDS, reason="lxml is not installed")
+
+# Real-world untidiness: unclosed <p> and <li>, entities, a script with
+# markup-like text, an image-less link and a nested arc_view_ element
+MESSY_PAGE = """<html><head><script>if (a < b) { document.write("<img src='x.jpg'>"); }</script></head>
+<body>
+<div class="arc_view_name">Sýning &amp; &quot;verk&quot;</div>
+<div class="arc_view_date">1. mars 2024 &ndash; 4. apríl 2024</div>
+<div class="arc_view_head">Ásdís Sif Gunnarsdóttir og Jón Þór Birgisson</div>
+<div class="arc_view_text"><p>Fyrsta málsgrein<p>Önnur <b>málsgrein</b>
+  <div class="arc_view_caption">Myndatexti</div></div>
+<ul><li><a href="image_view.php?id=7"><img src="thumbs/a.jpg" alt="Verk 1"></a>
+<li><a href="image_view.php?id=8"><img class="img_main" src="thumbs/b.jpg"></a>
+<li><a href="archive_view.php?id=3">Næsta</a></ul>
+</body></html>"""
+
+
+def _pages():
+    archive = MockArchive(scale=0.3)
+    yield archive.year_page(2010)
+    for ex_id in archive.years[2010]:
+        yield archive.exhibition_page(ex_id, english=False)
+        yield archive.exhibition_page(ex_id, english=True)
+        for image_id in archive.image_ids(ex_id)[:2]:
+            yield archive.image_view_page(image_id)
+    yield MESSY_PAGE
+
+
+@pytest.mark.parametrize('html', list(_pages()))
+def test_backends_build_the_same_page(html):
+    stream, tree = parse_page(html, 'html.parser'), parse_page(html, 'lxml')
+    assert tree == stream
+    assert page_fingerprint(tree) == page_fingerprint(stream)
+
+
+def test_backends_extract_the_same_exhibition(tmp_path):
+    url = "https://this.is/klingogbang/archive_view.php?id=1"
+    results = []
+    for backend in ('html.parser', 'lxml'):
+        scraper = KoBScraper(str(tmp_path / 'unused.db'), parser=backend)
+        highres = HighResScraper(str(tmp_path / 'unused.db'), str(tmp_path), parser=backend)
+        page = scraper.parse(MESSY_PAGE)
+        results.append((
+            scraper.extract_exhibition(page, 1, 2024, url),
+            scraper.extract_english(page),
+            highres.extract_gallery_links(page),
+        ))
+    assert results[0] == results[1]
+
+    exhibition, _, links = results[0]
+    assert exhibition['title_is'] == 'Sýning & "verk"'
+    assert exhibition['artists'] == ['Ásdís Sif Gunnarsdóttir', 'Jón Þór Birgisson']
+    assert exhibition['description_is'].count('Fyrsta málsgrein') == 1
+    assert [link['image_view_id'] for link in links] == [7, 8]
+    assert find_fragment(parse_page(MESSY_PAGE), 'arc_view_caption')
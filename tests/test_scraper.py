@@ -0,0 +1,50 @@
+"""Concurrent crawling against the benchmark's local mock site."""
+
+import sqlite3
+import time
+
+import scraper
+from benchmark import MockArchive, MockSite, scraped_rows
+from database import close_shared_connections, init_database
+from scraper import KoBScraper
+
+LATENCY = 0.03  # seconds per request, so the crawl is bound by waiting, as on the real site
+YEARS = (2020, 2022)
+
+
+def _scrape(db_path: str, workers: int) -> float:
+    init_database(db_path)
+    crawler = KoBScraper(db_path, delay=0, workers=workers)
+    start = time.monotonic()
+    stats = crawler.scrape_all_years(*YEARS)
+    wall = time.monotonic() - start
+    close_shared_connections()
+    assert stats['failed'] == 0
+    return wall
+
+
+def _rows(db_path: str) -> tuple:
+    conn = sqlite3.connect(db_path)
+    try:
+        images = sorted(conn.execute("""
+            SELECT e.exhibition_id, i.filename, i.original_url, i.alt_text, i.display_order
+            FROM images i
+            JOIN exhibitions e ON e.id = i.exhibition_id
+        """))
+    finally:
+        conn.close()
+    return (*scraped_rows(db_path), images)
+
+
+def test_workers_scrape_the_same_rows_faster(tmp_path, monkeypatch):
+    with MockSite(MockArchive(scale=0.5), latency=LATENCY) as site:
+        monkeypatch.setattr(scraper, 'BASE_URL', site.base_url)
+        serial = _scrape(str(tmp_path / 'serial.db'), workers=1)
+        concurrent = _scrape(str(tmp_path / 'concurrent.db'), workers=4)
+
+    exhibitions, artists, images = _rows(str(tmp_path / 'serial.db'))
+    assert exhibitions and artists and images
+    assert _rows(str(tmp_path / 'concurrent.db')) == (exhibitions, artists, images)
+    # Three years at scale 0.5 is ~30 requests at 30 ms each; four workers
+    # overlap them, so anything under 60% of the serial time is a real speedup
+    assert concurrent < serial * 0.6
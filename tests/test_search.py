@@ -0,0 +1,110 @@
+"""The FTS5 index: accent folding and triggers keeping it in sync."""
+
+import pytest
+
+from database import get_connection, init_database, insert_exhibitions_batch
+from search import rebuild_search_index, search_exhibitions
+
+
+def _exhibition(exhibition_id: int, title: str, artists: list[str], alt_texts: list[str], **fields) -> dict:
+    return {
+        'exhibition_id': exhibition_id,
+        'title_is': title,
+        'year': 2024,
+        'source_url': f"archive_view.php?id={exhibition_id}",
+        'artists': artists,
+        'images': [
+            {'filename': f"{exhibition_id}_{idx}.jpg", 'original_url': f"files/{exhibition_id}_{idx}.jpg",
+             'alt_text': alt, 'display_order': idx}
+            for idx, alt in enumerate(alt_texts)
+        ],
+        **fields,
+    }
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db = str(tmp_path / 'archive.db')
+    init_database(db)
+    conn = get_connection(db)
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'exhibitions_fts'")
+    if cursor.fetchone() is None:
+        pytest.skip("this SQLite build lacks FTS5")
+    insert_exhibitions_batch(conn, [
+        _exhibition(1, 'Ljós og skuggi', ['Ásdís Sif Gunnarsdóttir'], ['Skúlptúr í rými'],
+                    description_en='Light and shadow'),
+        _exhibition(2, 'Þögn', ['Þórdís Aðalsteinsdóttir', 'Ægir Ragnarsson'], ['Málverk']),
+    ])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _ids(conn, query: str) -> list[int]:
+    return sorted(row['exhibition_id'] for row in search_exhibitions(conn, query))
+
+
+def _index(conn) -> list[tuple]:
+    return [tuple(row) for table in ('exhibitions_fts', 'exhibition_tags_fts')
+            for row in conn.execute(f"SELECT rowid, * FROM {table} ORDER BY rowid")]
+
+
+def _assert_in_sync(conn) -> None:
+    """The trigger-maintained index equals one rebuilt from scratch."""
+    maintained = _index(conn)
+    rebuild_search_index(conn.cursor())
+    assert maintained == _index(conn)
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('asdis', [1]),
+    ('Ásdís', [1]),
+    ('thordis', [2]),
+    ('Þórdís', [2]),
+    ('adalsteinsdottir', [2]),
+    ('aegir', [2]),
+    ('Ægir', [2]),
+    ('thogn', [2]),
+    ('skulptur', [1]),
+    ('light shadow', [1]),
+    ('malverk thogn', [2]),
+    ('malverk asdis', []),
+])
+def test_matching_folds_case_and_icelandic_letters(conn, query, expected):
+    assert _ids(conn, query) == expected
+
+
+def test_exhibition_update_and_delete_reindex(conn):
+    conn.execute("UPDATE exhibitions SET title_is = 'Hljóð' WHERE exhibition_id = 1")
+    assert _ids(conn, 'ljos') == []
+    assert _ids(conn, 'hljod') == [1]
+    _assert_in_sync(conn)
+
+    conn.execute("DELETE FROM images WHERE exhibition_id = (SELECT id FROM exhibitions WHERE exhibition_id = 2)")
+    conn.execute("DELETE FROM exhibition_artists "
+                 "WHERE exhibition_id = (SELECT id FROM exhibitions WHERE exhibition_id = 2)")
+    conn.execute("DELETE FROM exhibitions WHERE exhibition_id = 2")
+    assert _ids(conn, 'thogn') == _ids(conn, 'aegir') == _ids(conn, 'malverk') == []
+    _assert_in_sync(conn)
+
+
+def test_artist_and_image_changes_reindex(conn):
+    conn.execute("UPDATE artists SET name = 'Æsa Þorsteinsdóttir' WHERE name = 'Ásdís Sif Gunnarsdóttir'")
+    assert _ids(conn, 'asdis') == []
+    assert _ids(conn, 'aesa thorsteinsdottir') == [1]
+    _assert_in_sync(conn)
+
+    conn.execute("DELETE FROM exhibition_artists WHERE artist_id = "
+                 "(SELECT id FROM artists WHERE name = 'Ægir Ragnarsson')")
+    assert _ids(conn, 'aegir') == []
+    assert _ids(conn, 'thordis') == [2]
+
+    conn.execute("UPDATE images SET alt_text = 'Gjörningur' WHERE alt_text = 'Málverk'")
+    assert _ids(conn, 'malverk') == []
+    assert _ids(conn, 'gjorningur') == [2]
+
+    conn.execute("UPDATE images SET exhibition_id = (SELECT id FROM exhibitions WHERE exhibition_id = 1) "
+                 "WHERE alt_text = 'Gjörningur'")
+    assert _ids(conn, 'gjorningur') == [1]
+    _assert_in_sync(conn)
@@ -12,11 +12,35 @@ export function getDb(): Database.Database {
     // Try current directory first, then parent directory
     const fs = require('fs');
     const dbLocation = fs.existsSync(dbPath) ? dbPath : parentDbPath;
-    db = new Database(dbLocation, { readonly: true });
+    // The scrapers only use WAL mode while they run and switch back when
+    // they finish (see wal_mode in database.py), so a read-only open needs
+    // no -shm file
+    db = new Database(dbLocation, { readonly: true, fileMustExist: true });
   }
   return db;
 }
 
+// Precomputed list tables built by `python main.py build-readmodel` (see readmodel.py).
+// Without them, or if they were built by another version, queries use the base tables.
+const READ_MODEL_VERSION = 1;
+const EXHIBITION_COLUMNS = `
+  id, exhibition_id, title_is, title_en, start_date, end_date,
+  description_is, description_en, excerpt_is, year, source_url
+`;
+
+// Checked on every call rather than once per process: the scrapers rebuild
+// (or a fresh database lacks) the model while the site is running, and the
+// check is a one-row read.
+function hasReadModel(): boolean {
+  try {
+    const info = getDb().prepare('SELECT version FROM read_model_info LIMIT 1').get() as
+      { version: number } | undefined;
+    return info?.version === READ_MODEL_VERSION;
+  } catch {
+    return false;
+  }
+}
+
 export interface Exhibition {
   id: number;
   exhibition_id: number;
@@ -53,6 +77,11 @@ export interface ExhibitionWithDetails extends Exhibition {
 
 export function getAllExhibitions(): Exhibition[] {
   const db = getDb();
+  if (hasReadModel()) {
+    return db.prepare(`
+      SELECT ${EXHIBITION_COLUMNS} FROM exhibition_list ORDER BY position
+    `).all() as Exhibition[];
+  }
   return db.prepare(`
     SELECT * FROM exhibitions
     ORDER BY year DESC, start_date DESC
@@ -61,6 +90,13 @@ export function getAllExhibitions(): Exhibition[] {
 
 export function getExhibitionsByYear(year: number): Exhibition[] {
   const db = getDb();
+  if (hasReadModel()) {
+    return db.prepare(`
+      SELECT ${EXHIBITION_COLUMNS} FROM exhibition_list
+      WHERE year = ?
+      ORDER BY position
+    `).all(year) as Exhibition[];
+  }
   return db.prepare(`
     SELECT * FROM exhibitions
     WHERE year = ?
@@ -94,6 +130,11 @@ export function getExhibitionById(exhibitionId: number): ExhibitionWithDetails |
 
 export function getExhibitionsWithArtists(): (Exhibition & { artist_names: string })[] {
   const db = getDb();
+  if (hasReadModel()) {
+    return db.prepare(`
+      SELECT ${EXHIBITION_COLUMNS}, artist_names FROM exhibition_list ORDER BY position
+    `).all() as (Exhibition & { artist_names: string })[];
+  }
   return db.prepare(`
     SELECT e.*, GROUP_CONCAT(a.name, ', ') as artist_names
     FROM exhibitions e
@@ -106,6 +147,11 @@ export function getExhibitionsWithArtists(): (Exhibition & { artist_names: strin
 
 export function getAllArtists(): (Artist & { exhibition_count: number })[] {
   const db = getDb();
+  if (hasReadModel()) {
+    return db.prepare(`
+      SELECT id, name, normalized_name, exhibition_count FROM artist_list ORDER BY position
+    `).all() as (Artist & { exhibition_count: number })[];
+  }
   return db.prepare(`
     SELECT a.*, COUNT(ea.exhibition_id) as exhibition_count
     FROM artists a
@@ -117,6 +163,15 @@ export function getAllArtists(): (Artist & { exhibition_count: number })[] {
 
 export function getArtistBySlug(slug: string): Artist | null {
   const db = getDb();
+  if (hasReadModel()) {
+    // Slugs are stored the way slugify() in utils.ts builds them
+    return db.prepare(`
+      SELECT id, name, normalized_name FROM artist_list
+      WHERE slug = ?
+      ORDER BY position
+      LIMIT 1
+    `).get(slug.toLowerCase()) as Artist | null;
+  }
   // Convert slug back to possible name matches
   const searchName = slug.replace(/-/g, ' ');
   return db.prepare(`
@@ -128,6 +183,15 @@ export function getArtistBySlug(slug: string): Artist | null {
 
 export function getExhibitionsByArtist(artistId: number): Exhibition[] {
   const db = getDb();
+  if (hasReadModel()) {
+    return db.prepare(`
+      SELECT ${EXHIBITION_COLUMNS}
+      FROM artist_exhibitions ae
+      JOIN exhibition_list el ON el.position = ae.position
+      WHERE ae.artist_id = ?
+      ORDER BY ae.position
+    `).all(artistId) as Exhibition[];
+  }
   return db.prepare(`
     SELECT e.* FROM exhibitions e
     JOIN exhibition_artists ea ON e.id = ea.exhibition_id
@@ -138,7 +202,9 @@ export function getExhibitionsByArtist(artistId: number): Exhibition[] {
 
 export function getYears(): number[] {
   const db = getDb();
-  const rows = db.prepare(`
+  const rows = db.prepare(hasReadModel() ? `
+    SELECT year FROM year_counts ORDER BY year DESC
+  ` : `
     SELECT DISTINCT year FROM exhibitions ORDER BY year DESC
   `).all() as { year: number }[];
   return rows.map(r => r.year);
@@ -146,16 +212,30 @@ export function getYears(): number[] {
 
 export function getStats() {
   const db = getDb();
+  const years = getYears();
+  const yearRange = years.length > 0 ? `${years[years.length - 1]}-${years[0]}` : 'N/A';
+
+  if (hasReadModel()) {
+    const info = db.prepare(`
+      SELECT exhibitions, artists, images FROM read_model_info
+    `).get() as { exhibitions: number; artists: number; images: number };
+    return {
+      totalExhibitions: info.exhibitions,
+      totalArtists: info.artists,
+      totalImages: info.images,
+      yearRange,
+    };
+  }
+
   const exhibitions = db.prepare('SELECT COUNT(*) as count FROM exhibitions').get() as { count: number };
   const artists = db.prepare('SELECT COUNT(*) as count FROM artists').get() as { count: number };
   const images = db.prepare('SELECT COUNT(*) as count FROM images').get() as { count: number };
-  const years = getYears();
 
   return {
     totalExhibitions: exhibitions.count,
     totalArtists: artists.count,
     totalImages: images.count,
-    yearRange: years.length > 0 ? `${years[years.length - 1]}-${years[0]}` : 'N/A',
+    yearRange,
   };
 }
 
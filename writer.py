@@ -0,0 +1,186 @@
+"""Single-writer persistence pipeline for scraped exhibitions."""
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from database import (
+    KnownKeys,
+    add_year_counts,
+    get_connection,
+    insert_exhibitions_batch,
+    log_scrapes_batch,
+    refresh_exhibition,
+)
+from frontier import complete_urls
+from metrics import RunMetrics
+
+BATCH_SIZE = 25  # exhibitions per transaction
+LOG_BATCH_SIZE = 500  # scraping_log rows per transaction when no exhibitions arrive
+FLUSH_INTERVAL = 2.0  # seconds of queue idleness before a partial batch is committed
+
+_STOP = object()
+
+
+class ExhibitionWriter:
+    """Background thread that owns every scrape write to SQLite.
+
+    Scrapers `put()` new exhibitions, `refresh()` existing ones and `log()`
+    fetch results from any thread; the writer drains the queue and commits
+    once per batch, so the database lock is taken once per N exhibitions
+    instead of once per row.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "kob_archive.db",
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        metrics: Optional[RunMetrics] = None,
+        known: Optional[KnownKeys] = None
+    ):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+        # Kept in sync with the rows this writer inserts
+        self.known = known
+        self.stats = {'success': 0, 'skipped': 0, 'updated': 0}
+        self.saved_ids: dict[int, int] = {}
+        self._queue: queue.Queue = queue.Queue(maxsize=self.batch_size * 4)
+        self._thread = threading.Thread(target=self._run, name="exhibition-writer", daemon=True)
+        self._error: Optional[BaseException] = None
+
+    def __enter__(self) -> "ExhibitionWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def put(self, data: dict) -> None:
+        """Queue a scraped exhibition for saving."""
+        self._check()
+        self._queue.put(('exhibition', data))
+
+    def refresh(self, data: dict) -> None:
+        """Queue a re-scraped existing exhibition for change detection."""
+        self._check()
+        self._queue.put(('refresh', data))
+
+    def log(
+        self,
+        url: str,
+        status: str,
+        error_message: Optional[str] = None,
+        response_code: Optional[int] = None
+    ) -> None:
+        """Queue a scraping_log entry."""
+        self._check()
+        self._queue.put(('log', (url, status, error_message, response_code)))
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        done.wait()
+        self._check()
+
+    def close(self) -> None:
+        """Commit outstanding work and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._check()
+
+    def _check(self) -> None:
+        if self._error:
+            raise RuntimeError("Exhibition writer failed") from self._error
+
+    def _run(self) -> None:
+        conn = get_connection(self.db_path)
+        exhibitions: list[tuple] = []
+        logs: list[tuple] = []
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+
+                waiter = None
+                if item is not None:
+                    kind, payload = item
+                    if kind in ('exhibition', 'refresh'):
+                        exhibitions.append(item)
+                    elif kind == 'log':
+                        logs.append(payload)
+                    else:
+                        waiter = payload
+
+                if (
+                    item is None
+                    or waiter is not None
+                    or len(exhibitions) >= self.batch_size
+                    or len(logs) >= LOG_BATCH_SIZE
+                ):
+                    self._commit(conn, exhibitions, logs)
+                if waiter is not None:
+                    waiter.set()
+
+            self._commit(conn, exhibitions, logs)
+        except BaseException as e:
+            self._error = e
+            # Keep draining so producers never block on a dead writer
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                if item[0] == 'flush':
+                    item[1].set()
+        finally:
+            conn.close()
+
+    def _commit(self, conn, exhibitions: list[tuple], logs: list[tuple]) -> None:
+        """Write the pending batch in a single transaction."""
+        if not exhibitions and not logs:
+            return
+
+        start = time.perf_counter()
+        new = [data for kind, data in exhibitions if kind == 'exhibition']
+        saved = insert_exhibitions_batch(conn, new, self.known) if new else {}
+        # Outcomes by year, for the crawl's year_checkpoints summaries
+        by_year: dict[int, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        credited = set()
+        for kind, data in exhibitions:
+            if kind == 'refresh':
+                outcome = 'updated' if refresh_exhibition(conn, data, known=self.known) else 'skipped'
+            elif data['exhibition_id'] in saved and data['exhibition_id'] not in credited:
+                credited.add(data['exhibition_id'])
+                outcome = 'success'
+            else:
+                outcome = 'skipped'
+            by_year[data['year']][outcome] += 1
+        add_year_counts(conn, by_year)
+        if logs:
+            log_scrapes_batch(conn, logs)
+        # Done in the frontier only together with the data scraped from the page
+        complete_urls(conn, 'exhibition', [data['source_url'] for _, data in exhibitions])
+        conn.commit()
+        if self.metrics:
+            self.metrics.add_time('db_write', time.perf_counter() - start)
+
+        self.saved_ids.update(saved)
+        for counts in by_year.values():
+            for key, count in counts.items():
+                self.stats[key] += count
+        exhibitions.clear()
+        logs.clear()